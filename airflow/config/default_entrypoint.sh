@@ -253,14 +253,16 @@ function check_uid_gid() {
 }
 
 # Used by AIRFLOW__CORE__SQL_ALCHEMY_CONN_CMD to get the backend URI
-#   so it will not be visible in the ECS task/container defs via the console
+#   so it will not be visible in the ECS task/container defs via the console.
+#   Pass a host to connect somewhere else with the same credentials (e.g. a reader)
 function get_db_uri_from_secret {
-    local AIRFLOW_DB_CREDS=$(aws secretsmanager get-secret-value --secret-id $RDS_SECRET_ARN --output json | jq '.SecretString|fromjson')
+    local AIRFLOW_DB_CREDS=$(python -m fairflow_ext.get_secret $RDS_SECRET_ARN)
 
-    local MYSQL_HOST=$(echo $AIRFLOW_DB_CREDS | jq -r '.host')
+    local MYSQL_HOST=${1:-$(echo $AIRFLOW_DB_CREDS | jq -r '.host')}
     local MYSQL_USER=$(echo $AIRFLOW_DB_CREDS | jq -r '.username')
     local MYSQL_PWD=$(echo $AIRFLOW_DB_CREDS | jq -r '.password')
-    local MYSQL_DBNAME=$(echo $AIRFLOW_DB_CREDS | jq -r '.dbname')
+    # A tenant's own database on the shared instance (see MULTI_TENANCY_CONFIG)
+    local MYSQL_DBNAME=${FAIRFLOW_DB_NAME:-$(echo $AIRFLOW_DB_CREDS | jq -r '.dbname')}
     local MYSQL_PORT=$(echo $AIRFLOW_DB_CREDS | jq -r '.port')
 
     local MYSQL_URI="mysql+mysqldb://$MYSQL_USER:$MYSQL_PWD@$MYSQL_HOST:$MYSQL_PORT/$MYSQL_DBNAME"
@@ -296,6 +298,11 @@ readonly CONNECTION_CHECK_SLEEP_TIME
 
 create_system_user_if_missing
 set_pythonpath_for_root_user
+# A tenant's database has to be there before Airflow can connect to it
+#   It's OK to run this more than once, and from every service
+if [[ -n "${FAIRFLOW_DB_NAME=}" ]]; then
+    python -m fairflow_ext.tenant_db "${FAIRFLOW_DB_NAME}"
+fi
 # Get backend conn URIs using secrets
 AIRFLOW__CORE__SQL_ALCHEMY_CONN=$(get_db_uri_from_secret)
 AIRFLOW__CELERY__RESULT_BACKEND=$(get_celery_result_backend_uri)
@@ -350,7 +357,7 @@ fi
 
 # If a private key is supplied, set that up
 if [[ ! -z ${GIT_READ_ONLY_SECRET_ARN} ]]; then
-    aws secretsmanager get-secret-value --secret-id $GIT_READ_ONLY_SECRET_ARN | jq -r .SecretString | tee ~/.ssh/id_rsa > /dev/null
+    python -m fairflow_ext.get_secret $GIT_READ_ONLY_SECRET_ARN | tee ~/.ssh/id_rsa > /dev/null
     chmod 400 ~/.ssh/id_rsa
     eval "$(ssh-agent -s)"
     ssh-add -k ~/.ssh/id_rsa
@@ -366,6 +373,17 @@ if [[ ${AIRFLOW_COMMAND} =~ ^(webserver)$ ]] ; then
     #   It's OK to run this more than once, it will just say "admin already created"
     create_www_user
 
+    # Pools for the External Task tiers, sized from EXTERNAL_TASK_CAPACITY_CONFIG
+    #   It's OK to run this more than once, existing pools are updated
+    python -m fairflow_ext.external_tasks sync-pools || true
+
+    # The DB reader (Aurora's reader endpoint or a read replica, see DB_SIZING_PROFILE),
+    #   the read-only views / API GETs go to it (see fairflow_ext.db_routing)
+    if [[ -n "${FAIRFLOW_DB_READER_HOST=}" ]]; then
+        FAIRFLOW_READER_SQL_ALCHEMY_CONN=$(get_db_uri_from_secret "${FAIRFLOW_DB_READER_HOST}")
+        export FAIRFLOW_READER_SQL_ALCHEMY_CONN
+    fi
+
     if [[ ! -z ${DAG_REPOSITORY} ]]; then
         # Sync the repository to the shared EFS file systems
         #   This is where the DAGs will live
@@ -383,6 +401,47 @@ if [[ ${AIRFLOW_COMMAND} =~ ^(scheduler|celery|worker|flower)$ ]] \
     echo "Got celery backend"
     sleep 15
 fi
+# Low rate py-spy sampling of this container's Airflow process, to catch intermittent
+#   stalls
+#   see: fairflow_ext/profiling.py
+function start_profiling() {
+    if [[ "${FAIRFLOW_CONTINUOUS_PROFILING:-false}" == "true" ]] \
+        && [[ ${AIRFLOW_COMMAND} =~ ^(scheduler|celery|worker)$ ]]; then
+        echo "Starting continuous profiling"
+        python -m fairflow_ext.profiling continuous --pid "${1}" &
+    fi
+}
+
+# The Celery worker isn't exec'd, this shell stays PID 1 to pass ECS' SIGTERM on (a scale-in
+#   or a deployment) as Celery's warm shutdown: stop consuming, put the reserved messages
+#   back on the queue and finish the running tasks, within the container's stop timeout
+#   (WORKER_LIFECYCLE_CONFIG).  Next to it, fairflow_ext.worker_lifecycle keeps the ECS task
+#   protected from scale-in while it runs tasks
+function run_celery_worker() {
+    airflow "${@}" &
+    WORKER_PID=$!
+    trap 'echo "Warm shutdown of the Celery worker"; kill -TERM ${WORKER_PID}' TERM INT
+
+    start_profiling ${WORKER_PID}
+    if [[ "${FAIRFLOW_WORKER_SCALE_IN_PROTECTION:-false}" == "true" ]]; then
+        python -m fairflow_ext.worker_lifecycle --worker-pid ${WORKER_PID} &
+    fi
+
+    # wait returns early when a trapped signal arrives, keep waiting until the worker is done
+    STATUS=0
+    while kill -0 ${WORKER_PID} 2> /dev/null; do
+        wait ${WORKER_PID}
+        STATUS=$?
+    done
+    exit ${STATUS}
+}
+
 # echo "about to exec airflow $@"
 
+if [[ ${AIRFLOW_COMMAND} == "celery" ]] && [[ "${2:-}" == "worker" ]]; then
+    run_celery_worker "${@}"
+fi
+
+# airflow is exec'd, so it keeps this shell's PID
+start_profiling $$
 exec "airflow" "${@}"
\ No newline at end of file
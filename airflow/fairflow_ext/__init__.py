@@ -0,0 +1 @@
+# Custom Airflow extensions shipped in the Fairflow image (on the PYTHONPATH via the Dockerfile)
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from airflow.providers.amazon.aws.secrets.secrets_manager import SecretsManagerBackend
+from airflow.stats import Stats
+
+# Stored for secrets that don't exist, so misses can be cached too
+_MISSING = '__fairflow_missing__'
+
+
+class TTLCache:
+    """ Thread safe LRU cache whose entries expire after a TTL (per entry) """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+
+    def set(self, key: str, value: str, ttl_seconds: float = None) -> None:
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last = False)
+
+
+class CachedSecretsManagerBackend(SecretsManagerBackend):
+    """
+    Secrets Manager backend with a per process LRU + TTL cache in front of GetSecretValue.
+
+    Airflow checks the secrets backend before env vars and the metastore on every
+    Variable.get / connection lookup (including at DAG parse time), so misses are cached
+    too, for negative_ttl_seconds.  If redis_db is set, a second cache tier in the Redis at
+    REDIS_HOST is shared by all the containers.  Hits and misses are sent as
+    fairflow.secrets_cache.* StatsD counters, and kept on the instance as stats
+
+    Configured via AIRFLOW__SECRETS__BACKEND_KWARGS (see SECRETS_CACHE_CONFIG in
+    fairflow/config.py), everything other than the cache settings is passed on to
+    SecretsManagerBackend
+    """
+
+    def __init__(self, ttl_seconds: float = 300, negative_ttl_seconds: float = 60,
+                       max_entries: int = 1024, redis_db: Optional[int] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.cache = TTLCache(max_entries, ttl_seconds)
+        self.redis_db = redis_db
+        self._redis = None
+        self.stats = {'hit': 0, 'negative_hit': 0, 'redis_hit': 0, 'miss': 0}
+
+
+    def _incr(self, stat: str) -> None:
+        self.stats[stat] += 1
+        Stats.incr(f'fairflow.secrets_cache.{stat}')
+
+
+    @property
+    def redis(self):
+        if self.redis_db is None or not os.getenv('REDIS_HOST'):
+            return None
+        if self._redis is None:
+            import redis
+            self._redis = redis.Redis(host = os.environ['REDIS_HOST'], port = 6379,
+                                      db = self.redis_db, socket_timeout = 0.5,
+                                      decode_responses = True)
+        return self._redis
+
+
+    def _get_shared(self, key: str) -> Optional[str]:
+        try:
+            return self.redis.get(key) if self.redis else None
+        except Exception:
+            self.log.warning("Shared secrets cache unavailable, falling back to Secrets Manager",
+                             exc_info = True)
+            return None
+
+
+    def _set_shared(self, key: str, value: str, ttl_seconds: float) -> None:
+        try:
+            if self.redis:
+                self.redis.setex(key, int(ttl_seconds), value)
+        except Exception:
+            self.log.warning("Could not write to the shared secrets cache", exc_info = True)
+
+
+    def _get_secret(self, path_prefix: str, secret_id: str) -> Optional[str]:
+        key = f'fairflow:secrets:{self.build_path(path_prefix, secret_id, self.sep)}'
+
+        value = self.cache.get(key)
+        if value is None:
+            value = self._get_shared(key)
+            if value is not None:
+                self._incr('redis_hit')
+                ttl = self.negative_ttl_seconds if value == _MISSING else None
+                self.cache.set(key, value, ttl)
+        else:
+            self._incr('negative_hit' if value == _MISSING else 'hit')
+
+        if value is None:
+            self._incr('miss')
+            secret = super()._get_secret(path_prefix, secret_id)
+            value = _MISSING if secret is None else secret
+            ttl = self.negative_ttl_seconds if secret is None else self.cache.ttl_seconds
+            self.cache.set(key, value, ttl)
+            self._set_shared(key, value, ttl)
+
+        return None if value == _MISSING else value
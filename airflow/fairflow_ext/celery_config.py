@@ -0,0 +1,17 @@
+"""
+Airflow's default Celery config, with the Worker tuning from CELERY_WORKER_CONFIG in
+fairflow/config.py that Airflow has no [celery] option for.  Used by the Workers through
+AIRFLOW__CELERY__CELERY_CONFIG_OPTIONS = fairflow_ext.celery_config.CELERY_CONFIG
+(concurrency, autoscale, pool and prefetch are plain [celery] options)
+"""
+import os
+
+from airflow.config_templates.default_celery import DEFAULT_CELERY_CONFIG
+
+CELERY_CONFIG = {
+    **DEFAULT_CELERY_CONFIG,
+    'task_acks_late': os.getenv('FAIRFLOW_CELERY_ACKS_LATE', 'true') == 'true',
+}
+
+if os.getenv('FAIRFLOW_CELERY_MAX_TASKS_PER_CHILD'):
+    CELERY_CONFIG['worker_max_tasks_per_child'] = int(os.environ['FAIRFLOW_CELERY_MAX_TASKS_PER_CHILD'])
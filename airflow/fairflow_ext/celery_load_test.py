@@ -0,0 +1,148 @@
+"""
+Synthetic load DAG for comparing CELERY_WORKER_CONFIG settings (prefetch, acks_late,
+autoscale, pool, max_tasks_per_child).  It isn't in the DAGs folder, to run it add a file
+to your DAG repo with
+
+    from fairflow_ext.celery_load_test import dag  # noqa (Airflow DAG)
+
+and trigger celery_load_test, optionally with a conf overriding DEFAULT_CONF, e.g.
+{"long_every": 4, "long_seconds": 120}.  Every long_every-th task is long, the rest short,
+which is where prefetching hurts: short tasks reserved by a Worker wait behind its long ones
+while other Workers are idle.  Each task holds ballast_mib of memory, like a DataFrame.
+
+The report task logs one JSON line: throughput, makespan, queue wait percentiles, tasks and
+busy seconds per Worker (fairness), how much of the Workers' slots were busy, and the pool
+processes' memory (which max_tasks_per_child resets).  Deploy each setting and compare
+"""
+import json
+import os
+import statistics
+import time
+from datetime import datetime
+
+import psutil
+
+from airflow import DAG
+from airflow.models import TaskInstance
+from airflow.operators.python import PythonOperator
+from airflow.utils.session import provide_session
+from airflow.utils.trigger_rule import TriggerRule
+
+# The number of tasks is fixed when the DAG is parsed, the rest can come from the conf
+TASKS = int(os.getenv('FAIRFLOW_LOAD_TEST_TASKS', '64'))
+DEFAULT_CONF = {
+    'short_seconds': 2,
+    'long_seconds': 60,
+    'long_every': 8,
+    'ballast_mib': 50
+}
+MIB = 1024 * 1024
+
+
+def conf_value(dag_run, name: str):
+    return (dag_run.conf or {}).get(name, DEFAULT_CONF[name])
+
+
+def pool_process():
+    # Airflow runs the task in forks (retitled "airflow task supervisor / runner: ...") of
+    #   the Celery pool process that received it
+    return next((parent for parent in psutil.Process().parents()
+                 if not ' '.join(parent.cmdline()).startswith('airflow task')), None)
+
+
+def work(index: int, dag_run = None, **_) -> dict:
+    long_every = conf_value(dag_run, 'long_every')
+    seconds = conf_value(dag_run, 'long_seconds' if long_every and index % long_every == 0
+                                  else 'short_seconds')
+    ballast = bytearray(conf_value(dag_run, 'ballast_mib') * MIB)
+    time.sleep(seconds)
+    pool = pool_process()
+    return {
+        'seconds': seconds,
+        'ballast_mib': len(ballast) // MIB,
+        'pool_pid': pool.pid if pool else None,
+        'pool_rss_mib': round(pool.memory_info().rss / MIB, 1) if pool else None
+    }
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+@provide_session
+def report(dag_run = None, ti = None, session = None, **_) -> dict:
+    task_ids = [f'work_{index:03d}' for index in range(TASKS)]
+    tis = session.query(TaskInstance).filter(
+        TaskInstance.dag_id == dag_run.dag_id,
+        TaskInstance.execution_date == dag_run.execution_date,
+        TaskInstance.task_id.in_(task_ids)
+    ).all()
+    done = [t for t in tis if t.start_date and t.end_date]
+    if not done:
+        raise ValueError('No work task ran')
+    first_queued = min(t.queued_dttm or t.start_date for t in done)
+    last_end = max(t.end_date for t in done)
+    makespan = (last_end - first_queued).total_seconds()
+    waits = [(t.start_date - t.queued_dttm).total_seconds() for t in done if t.queued_dttm]
+
+    workers = {}
+    for t in done:
+        worker = workers.setdefault(t.hostname, {'tasks': 0, 'busy_seconds': 0.0})
+        worker['tasks'] += 1
+        worker['busy_seconds'] += (t.end_date - t.start_date).total_seconds()
+    concurrency = int(os.getenv('AIRFLOW__CELERY__WORKER_CONCURRENCY', '16'))
+
+    results = [result for result in ti.xcom_pull(task_ids = task_ids) or [] if result]
+    pools = {}
+    for result in results:
+        if result['pool_pid']:
+            pools.setdefault(result['pool_pid'], []).append(result['pool_rss_mib'])
+
+    stats = {
+        'tasks': len(done),
+        'failed': len([t for t in tis if t.state != 'success']),
+        'makespan_seconds': round(makespan, 1),
+        'tasks_per_second': round(len(done) / makespan, 3) if makespan else None,
+        'queue_wait_seconds': {
+            'p50': round(percentile(waits, 50), 1),
+            'p95': round(percentile(waits, 95), 1),
+            'max': round(max(waits), 1)
+        } if waits else None,
+        'workers': {hostname: {'tasks': worker['tasks'], 'busy_seconds': round(worker['busy_seconds'], 1)}
+                    for hostname, worker in sorted(workers.items())},
+        # 1.0 is every slot of every Worker that ran something busy from first queued to
+        #   last done.  Low with tasks still waiting means they sat reserved on busy Workers
+        'slot_utilization': round(sum(w['busy_seconds'] for w in workers.values())
+                                  / (len(workers) * concurrency * makespan), 3) if makespan else None,
+        'tasks_per_worker_stdev': round(statistics.pstdev([w['tasks'] for w in workers.values()]), 2),
+        'pool_processes': len(pools),
+        'pool_rss_mib_max': max((max(rss) for rss in pools.values()), default = None),
+        'conf': {name: conf_value(dag_run, name) for name in DEFAULT_CONF},
+        'celery': {name: value for name, value in os.environ.items()
+                   if name.startswith(('AIRFLOW__CELERY__WORKER', 'AIRFLOW__CELERY__POOL', 'FAIRFLOW_CELERY_'))}
+    }
+    print(json.dumps(stats), flush = True)
+    return stats
+
+
+with DAG('celery_load_test',
+         description = 'Synthetic load for comparing Celery Worker settings',
+         start_date = datetime(2021, 8, 1),
+         schedule_interval = None,
+         catchup = False,
+         # Everything at once, so the Workers (and AIRFLOW__CORE__PARALLELISM) are the limit
+         concurrency = TASKS,
+         max_active_runs = 1,
+         tags = ['fairflow', 'benchmark']) as dag:
+
+    work_tasks = [PythonOperator(task_id = f'work_{index:03d}',
+                                 python_callable = work,
+                                 op_kwargs = {'index': index})
+                  for index in range(TASKS)]
+
+    report_task = PythonOperator(task_id = 'report',
+                                 python_callable = report,
+                                 trigger_rule = TriggerRule.ALL_DONE)
+
+    work_tasks >> report_task
@@ -0,0 +1,222 @@
+"""
+Metadata DB maintenance, run on a schedule by the DbMaintenanceConstruct task (from the
+Airflow image, through the entrypoint, so AIRFLOW__CORE__SQL_ALCHEMY_CONN is set)
+
+    python -m fairflow_ext.db_maintenance --retention-days 90 [--dry-run]
+
+For each table, rows older than the retention are archived as zstd Parquet to
+s3://{FAIRFLOW_LOGS_BUCKET}/db-archive[/{FAIRFLOW_TENANT}]/{table}/dt={YYYY-MM-DD}/ and deleted, batch_size rows
+per transaction, so no lock is held for long.  A batch is only deleted once its archive is
+written.  The latest dag run of each DAG and the runs that haven't finished are kept, with
+their task instances, XComs, ..., whatever their age, and so are the task instances that
+haven't finished.  Every table is then ANALYZEd (and optionally OPTIMIZEd, which rebuilds it to give
+the space back).  Row counts and timings are printed as one JSON line per table
+"""
+import io
+import json
+import os
+import time
+import uuid
+from argparse import ArgumentParser
+from collections import defaultdict
+from datetime import date, datetime, timezone, timedelta
+from typing import Any, List
+
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import JSON, MetaData, Table, func, inspect, or_, select, text, tuple_
+
+from airflow import settings
+from airflow.utils.state import State
+
+# A tenant's archives go under a folder of their own in the shared bucket
+ARCHIVE_PREFIX = f"db-archive/{os.environ['FAIRFLOW_TENANT']}" if os.getenv('FAIRFLOW_TENANT') else 'db-archive'
+
+# table -> the column whose age decides when a row goes.  In delete order, the tables
+#   referencing task_instance go before it
+AGE_COLUMNS = {
+    'task_reschedule': 'start_date',
+    'rendered_task_instance_fields': 'execution_date',
+    'task_fail': 'execution_date',
+    'task_instance': 'execution_date',
+    'dag_run': 'execution_date',
+    'xcom': 'timestamp',
+    'log': 'dttm',
+    'job': 'latest_heartbeat',
+    'celery_taskmeta': 'date_done',
+}
+
+# Rows in these states are kept whatever their age.  A task instance with no state (never
+#   scheduled) goes with its run, and whether the run is kept
+UNFINISHED_STATES = sorted(state for state in State.unfinished if state)
+# The tables whose rows belong to a dag run, by (dag_id, execution_date) in this Airflow
+#   version (the log table has them too, but they're often NULL there)
+RUN_TABLES = ['task_reschedule', 'rendered_task_instance_fields', 'task_fail', 'task_instance',
+              'dag_run', 'xcom']
+
+# Parquet types by the reflected column's Python type, anything else (JSON, enums, ...) is
+#   archived as a string, JSON columns as their JSON text
+ARROW_TYPES = {
+    bool: pa.bool_(),
+    int: pa.int64(),
+    float: pa.float64(),
+    str: pa.string(),
+    bytes: pa.binary(),
+    datetime: pa.timestamp('us'),
+    date: pa.date32(),
+}
+
+
+def count(table: Table, condition = None) -> int:
+    query = select([func.count()]).select_from(table)
+    if condition is not None:
+        query = query.where(condition)
+    with settings.engine.connect() as conn:
+        return conn.execute(query).scalar()
+
+
+def arrow_type(column) -> pa.DataType:
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = None
+    if isinstance(column.type, JSON):
+        return pa.string()
+    return ARROW_TYPES.get(python_type, pa.string())
+
+
+def arrow_value(value: Any, column, field_type: pa.DataType) -> Any:
+    """ The value as the column's Parquet type, MySQL hands back JSON as dicts, lists, ... """
+    if value is None:
+        return None
+    if isinstance(column.type, JSON):
+        return json.dumps(value, default = str)
+    if field_type == pa.timestamp('us') and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo = None)
+    if field_type == pa.bool_():
+        return bool(value)
+    if field_type == pa.binary() and isinstance(value, str):
+        return value.encode()
+    if field_type == pa.string() and not isinstance(value, str):
+        return json.dumps(value, default = str) if isinstance(value, (dict, list)) else str(value)
+    return value
+
+
+def to_arrow(table: Table, rows: list) -> pa.Table:
+    # An explicit schema, inferring one fails on JSON columns (empty dicts, or dicts and
+    #   lists in the same column)
+    schema = pa.schema([(column.name, arrow_type(column)) for column in table.columns])
+    return pa.Table.from_pydict({field.name: [arrow_value(row[field.name], table.c[field.name], field.type)
+                                              for row in rows]
+                                 for field in schema}, schema = schema)
+
+
+def archive(s3, bucket: str, table: Table, age_column: str, rows: list,
+            run_id: str, batch: int) -> None:
+    by_date = defaultdict(list)
+    for row in rows:
+        by_date[row[age_column].date().isoformat()].append(row)
+    for day, day_rows in by_date.items():
+        buffer = io.BytesIO()
+        pq.write_table(to_arrow(table, day_rows), buffer, compression = 'zstd')
+        s3.put_object(Bucket = bucket,
+                      Key = f'{ARCHIVE_PREFIX}/{table.name}/dt={day}/{run_id}-{batch:05d}.parquet',
+                      Body = buffer.getvalue())
+
+
+def kept_runs(dag_run: Table):
+    """ (dag_id, execution_date) of the dag runs kept whatever their age """
+    latest = select([dag_run.c.dag_id, func.max(dag_run.c.execution_date)]).group_by(dag_run.c.dag_id)
+    unfinished = select([dag_run.c.dag_id, dag_run.c.execution_date]).where(
+        or_(dag_run.c.state.is_(None), dag_run.c.state.in_(UNFINISHED_STATES)))
+    return latest.union(unfinished)
+
+
+def prune(name: str, cutoff: datetime, batch_size: int, batch_pause_seconds: float,
+          dry_run: bool, s3, bucket: str, run_id: str) -> dict:
+    metadata = MetaData()
+    table = Table(name, metadata, autoload_with = settings.engine)
+    age = table.c[AGE_COLUMNS[name]]
+    primary_key = list(table.primary_key.columns)
+    condition = age < cutoff
+    if name == 'task_instance':
+        condition = condition & or_(table.c.state.is_(None), table.c.state.notin_(UNFINISHED_STATES))
+    # MySQL can't delete from dag_run with a subquery on it, so its delete is by key only
+    delete_condition = condition
+    if name in RUN_TABLES:
+        dag_run = Table('dag_run', metadata, autoload_with = settings.engine)
+        condition = condition & tuple_(table.c.dag_id, table.c.execution_date).notin_(kept_runs(dag_run))
+        if name != 'dag_run':
+            delete_condition = condition
+
+    stats = {'table': name, 'rows_before': count(table), 'expired': count(table, condition),
+             'archived': 0, 'deleted': 0, 'batches': 0}
+    start = time.monotonic()
+    while not dry_run:
+        # Archived before it's deleted, so a failed upload deletes nothing.  The upload is
+        #   outside the delete's transaction, no row locks are held while it runs
+        with settings.engine.connect() as conn:
+            rows = conn.execute(select([table]).where(condition)
+                                .order_by(age).limit(batch_size)).fetchall()
+        if not rows:
+            break
+        archive(s3, bucket, table, age.name, rows, run_id, stats['batches'])
+        stats['archived'] += len(rows)
+        keys = [tuple(row[column.name] for column in primary_key) for row in rows]
+        # The condition again, in case e.g. a task was cleared (its run queued again) since
+        with settings.engine.begin() as conn:
+            stats['deleted'] += conn.execute(table.delete().where(
+                tuple_(*primary_key).in_(keys) & delete_condition)).rowcount
+        stats['batches'] += 1
+        time.sleep(batch_pause_seconds)
+    stats['prune_seconds'] = round(time.monotonic() - start, 2)
+    stats['rows_after'] = count(table)
+    return stats
+
+
+def analyze(name: str, optimize: bool) -> float:
+    if settings.engine.dialect.name != 'mysql':
+        return 0.0
+    start = time.monotonic()
+    with settings.engine.connect() as conn:
+        conn.execute(text(f'ANALYZE TABLE `{name}`')).fetchall()
+        # InnoDB rebuilds the table online, reads and writes carry on meanwhile
+        if optimize:
+            conn.execute(text(f'OPTIMIZE TABLE `{name}`')).fetchall()
+    return round(time.monotonic() - start, 2)
+
+
+def main(tables: List[str], retention_days: int, batch_size: int,
+         batch_pause_seconds: float, optimize: bool, dry_run: bool) -> None:
+    # The metadata DB stores UTC (Airflow sets the MySQL session time zone to +00:00)
+    cutoff = datetime.utcnow() - timedelta(days = retention_days)
+    run_id = f'{datetime.utcnow().strftime("%Y%m%dT%H%M%S")}-{uuid.uuid4().hex[:8]}'
+    s3 = boto3.client('s3')
+    bucket = os.environ['FAIRFLOW_LOGS_BUCKET']
+    existing = set(inspect(settings.engine).get_table_names())
+
+    start = time.monotonic()
+    for name in [name for name in AGE_COLUMNS if name in tables]:
+        if name not in existing:
+            print(json.dumps({'table': name, 'skipped': 'table does not exist'}), flush = True)
+            continue
+        stats = prune(name, cutoff, batch_size, batch_pause_seconds, dry_run, s3, bucket, run_id)
+        if not dry_run:
+            stats['analyze_seconds'] = analyze(name, optimize)
+        print(json.dumps({**stats, 'cutoff': cutoff.isoformat(), 'dry_run': dry_run}), flush = True)
+    print(json.dumps({'total_seconds': round(time.monotonic() - start, 2), 'run_id': run_id}),
+          flush = True)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'Archive and prune old rows from the Airflow metadata DB')
+    parser.add_argument('--retention-days', type = int, required = True)
+    parser.add_argument('--tables', nargs = '+', default = list(AGE_COLUMNS), choices = list(AGE_COLUMNS))
+    parser.add_argument('--batch-size', type = int, default = 1000)
+    parser.add_argument('--batch-pause-seconds', type = float, default = 0.5)
+    parser.add_argument('--optimize', action = 'store_true', help = 'OPTIMIZE TABLE after pruning')
+    parser.add_argument('--dry-run', action = 'store_true', help = 'only count the expired rows')
+    args = parser.parse_args()
+    main(args.tables, args.retention_days, args.batch_size, args.batch_pause_seconds,
+         args.optimize, args.dry_run)
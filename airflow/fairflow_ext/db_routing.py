@@ -0,0 +1,141 @@
+"""
+Send the Webserver's read-only queries to the DB reader (an RDS read replica or Aurora's
+reader endpoint, see DB_READ_ROUTING_CONFIG in fairflow/config.py), so the heavy UI views
+and the REST API polled from CI don't compete with the Scheduler's row-locking writes.
+Installed by webserver_config.py when the entrypoint exported
+FAIRFLOW_READER_SQL_ALCHEMY_CONN
+
+Only requests to READ_ONLY_VIEWS and GETs of the REST API read from the reader, and only
+their plain SELECTs: flushes (e.g. the action log rows, the user's last login),
+UPDATE / DELETE statements and SELECT ... FOR UPDATE still go to the writer.  While the
+reader is more than FAIRFLOW_READER_MAX_LAG_SECONDS behind, or its lag can't be read,
+everything goes to the writer
+"""
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from flask import has_request_context, request
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from airflow import settings
+
+log = logging.getLogger(__name__)
+
+READER_SQL_ALCHEMY_CONN = os.getenv('FAIRFLOW_READER_SQL_ALCHEMY_CONN')
+MAX_LAG_SECONDS = float(os.getenv('FAIRFLOW_READER_MAX_LAG_SECONDS', '5'))
+LAG_CHECK_SECONDS = float(os.getenv('FAIRFLOW_READER_LAG_CHECK_SECONDS', '10'))
+
+# Flask endpoints of the UI views that don't change anything (some of the JSON ones the
+#   home page polls are POSTs)
+READ_ONLY_VIEWS = frozenset({
+    'Airflow.index',
+    'Airflow.dag_stats',
+    'Airflow.task_stats',
+    'Airflow.last_dagruns',
+    'Airflow.blocked',
+    'Airflow.code',
+    'Airflow.dag_details',
+    'Airflow.tree',
+    'Airflow.tree_data',
+    'Airflow.calendar',
+    'Airflow.graph',
+    'Airflow.duration',
+    'Airflow.tries',
+    'Airflow.landing_times',
+    'Airflow.gantt',
+    'Airflow.task_instances',
+    'DagRunModelView.list',
+    'TaskInstanceModelView.list',
+    'TaskRescheduleModelView.list',
+    'JobModelView.list',
+    'LogModelView.list',
+    'SlaMissModelView.list',
+    'XComModelView.list'
+})
+API_PREFIX = '/api/v1/'
+
+
+class Reader:
+    """ The reader's engine and replication lag, per process (gunicorn forks the workers) """
+
+    def __init__(self, conn: str):
+        self.conn = conn
+        self.pid = None
+        self.engine: Optional[Engine] = None
+        self.lag_seconds: Optional[float] = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+
+    def get_engine(self) -> Engine:
+        if self.pid != os.getpid():
+            self.engine = create_engine(self.conn, **settings.prepare_engine_args())
+            self.pid = os.getpid()
+            self.checked_at = 0.0
+        return self.engine
+
+
+    def is_fresh(self) -> bool:
+        # One thread checks at a time, the others go by the last check
+        if time.monotonic() - self.checked_at >= LAG_CHECK_SECONDS and self.lock.acquire(blocking = False):
+            try:
+                self.lag_seconds = self.read_lag_seconds()
+            except Exception:
+                log.warning('Could not read the DB reader lag, reading from the writer', exc_info = True)
+                self.lag_seconds = None
+            finally:
+                self.checked_at = time.monotonic()
+                self.lock.release()
+        return self.lag_seconds is not None and self.lag_seconds <= MAX_LAG_SECONDS
+
+
+    def read_lag_seconds(self) -> Optional[float]:
+        with self.get_engine().connect() as connection:
+            # An RDS MySQL read replica, None while replication is stopped
+            status = connection.execute(text('SHOW REPLICA STATUS')).fetchone()
+            if status is not None:
+                lag = status['Seconds_Behind_Source']
+                return None if lag is None else float(lag)
+            # Aurora's readers, the reader endpoint could be any of them
+            #   see: https://docs.aws.amazon.com/AmazonRDS/latest/AuroraUserGuide/AuroraMySQL.Monitoring.html
+            lag_ms = connection.execute(text(
+                'SELECT MAX(replica_lag_in_milliseconds) FROM information_schema.replica_host_status '
+                "WHERE session_id <> 'MASTER_SESSION_ID'")).scalar()
+            return None if lag_ms is None else lag_ms / 1000
+
+
+READER = Reader(READER_SQL_ALCHEMY_CONN) if READER_SQL_ALCHEMY_CONN else None
+
+
+def is_read_only_request() -> bool:
+    if not has_request_context():
+        return False
+    if request.endpoint in READ_ONLY_VIEWS:
+        return True
+    return request.method in ('GET', 'HEAD') and request.path.startswith(API_PREFIX)
+
+
+class ReaderRoutingSession(Session):
+    """ settings.Session's class in the Webserver, picks the engine per statement """
+
+    def get_bind(self, mapper = None, clause = None, **kwargs):
+        if READER is not None and not self._flushing \
+                and isinstance(clause, Select) and clause._for_update_arg is None \
+                and is_read_only_request() and READER.is_fresh():
+            return READER.get_engine()
+        return super().get_bind(mapper = mapper, clause = clause, **kwargs)
+
+
+def install() -> None:
+    if READER is None:
+        return
+    # The class settings.Session's sessionmaker instantiates (configure() only passes
+    #   keyword arguments to it), so the sessions the Webserver creates from now on route
+    settings.Session.session_factory.class_ = ReaderRoutingSession
+    log.info('Routing read-only Webserver queries to the DB reader (max lag %gs)', MAX_LAG_SECONDS)
@@ -0,0 +1,129 @@
+"""
+Airflow pools for the External Task tiers and an ECS Operator that uses them
+
+The pools come from EXTERNAL_TASK_CAPACITY_CONFIG in fairflow/config.py (through
+FAIRFLOW_EXTERNAL_TASK_POOLS, task definition family -> pool).  The Webserver creates or
+updates them at startup, after the DB upgrade
+
+    python -m fairflow_ext.external_tasks sync-pools
+
+FairflowECSOperator is the ECS Operator, in the pool of its task_definition's tier unless
+a pool is given, and it retries RunTask capacity / throttling errors with jittered
+exponential backoff (FAIRFLOW_ECS_LAUNCH_ATTEMPTS / _BACKOFF_BASE_SECONDS /
+_BACKOFF_MAX_SECONDS) instead of failing the task.  It also passes the task instance's
+AIRFLOW_CTX_* variables (dag_id, run_id, task_id, ...) to the container, which the
+run-scoped outputs of tasks/common/fairflow_io.py are keyed by, e.g. in a DAG
+
+    from fairflow_ext.external_tasks import FairflowECSOperator
+
+    FairflowECSOperator(task_id = 'even_numbers', task_definition = 'BigGuys-FairflowStack', ...)
+"""
+import copy
+import json
+import os
+import random
+import time
+from argparse import ArgumentParser
+
+from botocore.exceptions import ClientError
+
+from airflow.providers.amazon.aws.exceptions import ECSOperatorError
+from airflow.providers.amazon.aws.operators.ecs import ECSOperator
+from airflow.utils.operator_helpers import context_to_airflow_vars
+
+POOLS = json.loads(os.getenv('FAIRFLOW_EXTERNAL_TASK_POOLS', '{}'))
+# Task definition family -> its container, for the DAGs without containerOverrides
+CONTAINERS = json.loads(os.getenv('FAIRFLOW_EXTERNAL_TASK_CONTAINERS', '{}'))
+LAUNCH_ATTEMPTS = int(os.getenv('FAIRFLOW_ECS_LAUNCH_ATTEMPTS', '5'))
+BACKOFF_BASE_SECONDS = float(os.getenv('FAIRFLOW_ECS_BACKOFF_BASE_SECONDS', '2'))
+BACKOFF_MAX_SECONDS = float(os.getenv('FAIRFLOW_ECS_BACKOFF_MAX_SECONDS', '60'))
+
+# RunTask failures (no task was started) worth another try
+#   see: https://docs.aws.amazon.com/AmazonECS/latest/developerguide/api_failures_messages.html
+CAPACITY_FAILURE_REASONS = ('RESOURCE:CPU', 'RESOURCE:MEMORY', 'Capacity is unavailable')
+THROTTLING_ERROR_CODES = ('ThrottlingException', 'LimitExceededException', 'ServerException')
+# The vCPU quota comes back as a ClientException
+QUOTA_ERROR_MESSAGE = 'limit on the number of vCPUs'
+
+
+def family(task_definition: str) -> str:
+    """ The family of a family, family:revision or task definition ARN """
+    return task_definition.split('/')[-1].split(':')[0]
+
+
+def is_capacity_error(error: Exception) -> bool:
+    if isinstance(error, ECSOperatorError):
+        return any(reason in failure.get('reason', '')
+                   for failure in error.failures for reason in CAPACITY_FAILURE_REASONS)
+    if isinstance(error, ClientError):
+        return error.response['Error']['Code'] in THROTTLING_ERROR_CODES \
+            or QUOTA_ERROR_MESSAGE in error.response['Error'].get('Message', '')
+    return False
+
+
+def with_context_env(overrides: dict, container: str, context_env: dict) -> dict:
+    """
+    A copy of the overrides with context_env in the environment of every container
+    override (the DAG's own values win), and one for container if there are none
+    """
+    overrides = copy.deepcopy(overrides or {})
+    container_overrides = overrides.setdefault('containerOverrides', [])
+    if not container_overrides and container:
+        container_overrides.append({'name': container})
+    for container_override in container_overrides:
+        environment = container_override.setdefault('environment', [])
+        names = {variable['name'] for variable in environment}
+        environment.extend({'name': name, 'value': value}
+                           for name, value in context_env.items() if name not in names)
+    return overrides
+
+
+def backoff_seconds(attempt: int) -> float:
+    # Full jitter, so the tasks throttled together don't all come back together
+    #   see: https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+class FairflowECSOperator(ECSOperator):
+    def __init__(self, *, task_definition: str, **kwargs):
+        tier = POOLS.get(family(task_definition))
+        if tier and not kwargs.get('pool'):
+            kwargs['pool'] = tier['pool']
+        super().__init__(task_definition = task_definition, **kwargs)
+
+    def execute(self, context):
+        # After templating, so the rendered overrides are what's extended
+        self.overrides = with_context_env(self.overrides, CONTAINERS.get(family(self.task_definition)),
+                                          context_to_airflow_vars(context, in_env_var_format = True))
+        if not self.overrides['containerOverrides']:
+            self.log.warning('No container to pass the AIRFLOW_CTX_* variables to for %s, '
+                             'add it to the containerOverrides', self.task_definition)
+        return super().execute(context)
+
+    def _start_task(self):
+        for attempt in range(1, LAUNCH_ATTEMPTS + 1):
+            try:
+                return super()._start_task()
+            except (ECSOperatorError, ClientError) as error:
+                if attempt == LAUNCH_ATTEMPTS or not is_capacity_error(error):
+                    raise
+                delay = backoff_seconds(attempt)
+                self.log.warning('RunTask attempt %d of %d: %s, retrying in %.1fs',
+                                 attempt, LAUNCH_ATTEMPTS, getattr(error, 'failures', error), delay)
+                time.sleep(delay)
+
+
+def sync_pools() -> None:
+    # Imported here, the operator is used from DAG files and doesn't need the API
+    from airflow.api.common.experimental.pool import create_pool
+
+    for tier in POOLS.values():
+        pool = create_pool(tier['pool'], tier['slots'], tier['description'])
+        print(json.dumps({'pool': pool.pool, 'slots': pool.slots}), flush = True)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'Airflow pools for the External Task tiers')
+    parser.add_argument('command', choices = ['sync-pools'])
+    args = parser.parse_args()
+    sync_pools()
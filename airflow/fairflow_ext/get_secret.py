@@ -0,0 +1,12 @@
+"""
+Print the SecretString of a Secrets Manager secret, used by default_entrypoint.sh
+
+    python -m fairflow_ext.get_secret $RDS_SECRET_ARN
+"""
+import sys
+
+import boto3
+
+if __name__ == '__main__':
+    response = boto3.client('secretsmanager').get_secret_value(SecretId = sys.argv[1])
+    print(response['SecretString'])
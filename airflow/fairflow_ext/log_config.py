@@ -0,0 +1,20 @@
+"""
+Airflow's default logging config, with the S3 task handler swapped for
+fairflow_ext.s3_chunked_log_handler.S3ChunkedTaskHandler.  Used through
+AIRFLOW__LOGGING__LOGGING_CONFIG_CLASS = fairflow_ext.log_config.LOGGING_CONFIG
+"""
+import os
+from copy import deepcopy
+
+from airflow.config_templates.airflow_local_settings import DEFAULT_LOGGING_CONFIG
+
+LOGGING_CONFIG = deepcopy(DEFAULT_LOGGING_CONFIG)
+
+# Only when remote logging to S3 is on, otherwise keep whatever Airflow picked
+if LOGGING_CONFIG['handlers']['task']['class'].endswith('.S3TaskHandler'):
+    LOGGING_CONFIG['handlers']['task'].update({
+        'class': 'fairflow_ext.s3_chunked_log_handler.S3ChunkedTaskHandler',
+        'chunk_bytes': int(os.getenv('FAIRFLOW_LOG_CHUNK_BYTES', str(1024 * 1024))),
+        'tail_chunks': int(os.getenv('FAIRFLOW_LOG_TAIL_CHUNKS', '1')),
+        'cache_max_bytes': int(os.getenv('FAIRFLOW_LOG_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+    })
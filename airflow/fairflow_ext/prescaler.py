@@ -0,0 +1,162 @@
+"""
+Schedule-aware pre-scaling of the Workers, run every few minutes by the PreScalerConstruct
+task (from the Airflow image, through the entrypoint, so AIRFLOW__CORE__SQL_ALCHEMY_CONN is set)
+
+    python -m fairflow_ext.prescaler --cluster <cluster> --service <worker service> \\
+        --slots-per-worker 4 --min-workers 2 --max-workers 4 [--dry-run]
+
+For every active, unpaused DAG whose next runs are due within --horizon-minutes (from the
+dag table's next_dagrun_create_after and schedule_interval), the slots its last
+--history-runs scheduled runs kept busy, minute by minute from the start of the run, are
+laid over the window at the expected start.  The busiest minute of the sum, plus the tasks
+already queued / running, is the slot demand, and the Workers it needs (within
+--min-workers / --max-workers) are set ahead of time as the Service Auto Scaling minimum.
+The CPU / memory target tracking still scales out further and back in down to it.  The
+service's desired count is left alone, CloudFormation owns it
+
+Cron schedules are read in UTC.  The decision is printed as one JSON line
+"""
+import json
+import math
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import boto3
+from croniter import croniter
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import func
+
+from airflow.models import DagModel, DagRun, TaskInstance
+from airflow.utils import timezone
+from airflow.utils.dates import cron_presets
+from airflow.utils.session import create_session
+from airflow.utils.state import State
+from airflow.utils.types import DagRunType
+
+
+def run_starts(dag: DagModel, until: datetime) -> List[datetime]:
+    """ When the DAG's runs due before until get created """
+    start = dag.next_dagrun_create_after
+    schedule = dag.schedule_interval
+    starts = []
+    while start is not None and start <= until:
+        starts.append(start)
+        if isinstance(schedule, str) and schedule != '@once':
+            start = croniter(cron_presets.get(schedule, schedule), start).get_next(datetime)
+        elif isinstance(schedule, (timedelta, relativedelta)):
+            start = start + schedule
+        else:
+            break
+    return starts
+
+
+def slot_profile(session, dag_id: str, history_runs: int, minutes: int) -> List[float]:
+    """ Busy slots per minute from the start of a run, the most of the last history_runs """
+    runs = session.query(DagRun).filter(
+        DagRun.dag_id == dag_id,
+        DagRun.run_type == DagRunType.SCHEDULED,
+        DagRun.state == State.SUCCESS,
+        DagRun.start_date.isnot(None)
+    ).order_by(DagRun.execution_date.desc()).limit(history_runs).all()
+    profile = [0.0] * minutes
+    for run in runs:
+        tis = session.query(TaskInstance.start_date, TaskInstance.end_date).filter(
+            TaskInstance.dag_id == dag_id,
+            TaskInstance.execution_date == run.execution_date,
+            TaskInstance.start_date.isnot(None),
+            TaskInstance.end_date.isnot(None)
+        ).all()
+        busy = [0.0] * minutes
+        for start, end in tis:
+            # Seconds of each minute bucket the task was running for
+            first = max(0.0, (start - run.start_date).total_seconds())
+            last = min(minutes * 60.0, (end - run.start_date).total_seconds())
+            for bucket in range(int(first // 60), min(minutes, math.ceil(last / 60))):
+                overlap = min(last, (bucket + 1) * 60) - max(first, bucket * 60)
+                busy[bucket] += max(0.0, overlap) / 60
+        profile = [max(a, b) for a, b in zip(profile, busy)]
+    return profile
+
+
+def forecast(horizon_minutes: int, history_runs: int) -> dict:
+    now = timezone.utcnow()
+    until = now + timedelta(minutes = horizon_minutes)
+    demand = [0.0] * horizon_minutes
+    due: Dict[str, int] = defaultdict(int)
+    with create_session() as session:
+        dags = session.query(DagModel).filter(
+            DagModel.is_active == True,  # noqa: E712
+            DagModel.is_paused == False,  # noqa: E712
+            DagModel.next_dagrun_create_after <= until
+        ).all()
+        for dag in dags:
+            starts = run_starts(dag, until)
+            if not starts:
+                continue
+            profile = slot_profile(session, dag.dag_id, history_runs, horizon_minutes)
+            for start in starts:
+                # Runs overdue (the Scheduler hasn't got to them yet) start now
+                offset = max(0, int((start - now).total_seconds() // 60))
+                for minute in range(offset, horizon_minutes):
+                    demand[minute] += profile[minute - offset]
+                due[dag.dag_id] += 1
+        in_flight = session.query(func.count()).select_from(TaskInstance).filter(
+            TaskInstance.state.in_([State.QUEUED, State.RUNNING])
+        ).scalar()
+    peak = max(demand, default = 0.0)
+    return {
+        'runs_due': dict(due),
+        'forecast_peak_slots': round(peak, 2),
+        'forecast_peak_in_minutes': demand.index(peak) if peak else None,
+        'in_flight_tasks': in_flight
+    }
+
+
+def apply(cluster: str, service: str, workers: int) -> dict:
+    autoscaling = boto3.client('application-autoscaling')
+    resource_id = f'service/{cluster}/{service}'
+    target = autoscaling.describe_scalable_targets(
+        ServiceNamespace = 'ecs', ResourceIds = [resource_id],
+        ScalableDimension = 'ecs:service:DesiredCount'
+    )['ScalableTargets'][0]
+    # Past the target's maximum it would be rejected, the CDK config is the cap
+    workers = min(workers, target['MaxCapacity'])
+    if workers != target['MinCapacity']:
+        autoscaling.register_scalable_target(
+            ServiceNamespace = 'ecs', ResourceId = resource_id,
+            ScalableDimension = 'ecs:service:DesiredCount',
+            MinCapacity = workers, MaxCapacity = target['MaxCapacity']
+        )
+    return {'previous': target['MinCapacity'], 'set': workers}
+
+
+def main(cluster: str, service: str, horizon_minutes: int, history_runs: int,
+         slots_per_worker: int, min_workers: int, max_workers: int, dry_run: bool) -> None:
+    start = time.monotonic()
+    decision = forecast(horizon_minutes, history_runs)
+    slots = decision['forecast_peak_slots'] + decision['in_flight_tasks']
+    workers = max(min_workers, min(max_workers, math.ceil(slots / slots_per_worker)))
+    decision.update({'workers': workers, 'dry_run': dry_run})
+    if not dry_run:
+        decision['min-capacity'] = apply(cluster, service, workers)
+    decision['seconds'] = round(time.monotonic() - start, 2)
+    print(json.dumps(decision), flush = True)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'Scale the Workers ahead of the scheduled DAG runs')
+    parser.add_argument('--cluster', required = True)
+    parser.add_argument('--service', required = True, help = 'the Worker ECS service name')
+    parser.add_argument('--horizon-minutes', type = int, default = 15)
+    parser.add_argument('--history-runs', type = int, default = 5)
+    parser.add_argument('--slots-per-worker', type = int, required = True,
+                        help = 'Celery worker concurrency')
+    parser.add_argument('--min-workers', type = int, required = True)
+    parser.add_argument('--max-workers', type = int, required = True)
+    parser.add_argument('--dry-run', action = 'store_true', help = 'only print the decision')
+    args = parser.parse_args()
+    main(args.cluster, args.service, args.horizon_minutes, args.history_runs,
+         args.slots_per_worker, args.min_workers, args.max_workers, args.dry_run)
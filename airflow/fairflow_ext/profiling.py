@@ -0,0 +1,76 @@
+"""
+Capture py-spy profiles of the Airflow process in this container and upload them to the
+logs bucket, under s3://{FAIRFLOW_LOGS_BUCKET}/profiles[/{FAIRFLOW_TENANT}]/{service}/{hostname}/
+
+One off, e.g. through ECS Exec while the scheduler is slow:
+
+    python -m fairflow_ext.profiling record --duration 60 --format speedscope
+
+Continuously at a low sample rate (started by the entrypoint when
+FAIRFLOW_CONTINUOUS_PROFILING is true) to catch intermittent stalls:
+
+    python -m fairflow_ext.profiling continuous --pid 1
+"""
+import os
+import socket
+import subprocess
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import boto3
+
+EXTENSIONS = {'speedscope': 'speedscope.json', 'flamegraph': 'svg', 'raw': 'txt'}
+
+
+def record(pid: int, duration: int, rate: int, output_format: str) -> str:
+    output = os.path.join(tempfile.gettempdir(),
+                          f'{time.strftime("%Y%m%dT%H%M%S")}.{EXTENSIONS[output_format]}')
+    # --nonblocking doesn't pause the target while sampling, so the profile costs the
+    #   scheduler / worker next to nothing (at the price of some inconsistent stacks)
+    subprocess.run(['py-spy', 'record',
+                    '--pid', str(pid),
+                    '--duration', str(duration),
+                    '--rate', str(rate),
+                    '--format', output_format,
+                    '--output', output,
+                    '--subprocesses',
+                    '--nonblocking'],
+                   check = True)
+    return output
+
+
+def upload(path: str, service: str) -> str:
+    tenant = f"{os.environ['FAIRFLOW_TENANT']}/" if os.getenv('FAIRFLOW_TENANT') else ''
+    key = f'profiles/{tenant}{service}/{socket.gethostname()}/{os.path.basename(path)}'
+    boto3.client('s3').upload_file(path, os.environ['FAIRFLOW_LOGS_BUCKET'], key)
+    os.remove(path)
+    return f's3://{os.environ["FAIRFLOW_LOGS_BUCKET"]}/{key}'
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'py-spy profiles of the Airflow process in this container')
+    parser.add_argument('mode', choices = ['record', 'continuous'])
+    # The entrypoint execs airflow, so it's PID 1 in the container
+    parser.add_argument('--pid', type = int, default = 1)
+    parser.add_argument('--service', default = os.getenv('FAIRFLOW_SERVICE', 'airflow'))
+    parser.add_argument('--format', choices = list(EXTENSIONS), default = 'speedscope')
+    parser.add_argument('--duration', type = int,
+                        default = int(os.getenv('FAIRFLOW_PROFILING_DURATION_SECONDS', '60')))
+    parser.add_argument('--rate', type = int, default = None,
+                        help = 'samples per second, default 100 (record) or '
+                               'FAIRFLOW_PROFILING_RATE_HZ (continuous)')
+    args = parser.parse_args()
+
+    if args.mode == 'record':
+        print(upload(record(args.pid, args.duration, args.rate or 100, args.format), args.service))
+    else:
+        rate = args.rate or int(os.getenv('FAIRFLOW_PROFILING_RATE_HZ', '5'))
+        while True:
+            try:
+                print(upload(record(args.pid, args.duration, rate, args.format), args.service),
+                      flush = True)
+            except Exception as e:
+                # Never let the profiler take anything down, just try again next window
+                print(f'Profiling failed: {e}', flush = True)
+                time.sleep(args.duration)
@@ -0,0 +1,196 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import List, Optional
+
+from airflow.providers.amazon.aws.log.s3_task_handler import S3TaskHandler
+from airflow.configuration import conf
+
+INDEX_NAME = 'index.json'
+
+
+class ChunkCache:
+    """
+    On-disk LRU cache of log chunks, shared by the processes on the host (e.g. the
+    Webserver's gunicorn workers).  Chunks never change once written, so there is
+    nothing to invalidate, only evict by last use (mtime) past max_bytes
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok = True)
+
+
+    def _path(self, key: str) -> str:
+        # Named by the key's hash, long dag / task / run ids make keys longer than a file
+        #   name can be (255 bytes)
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest())
+
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return data
+
+
+    def set(self, key: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir = self.directory, prefix = '.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self._path(key))
+        self._evict()
+
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if not entry.name.startswith('.tmp-'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+class S3ChunkedTaskHandler(S3TaskHandler):
+    """
+    S3 task log handler that writes each log as gzipped chunks of chunk_bytes (uncompressed)
+    plus an index, instead of one plain text object:
+
+        {s3_log_folder}/{log path}/index.json
+        {s3_log_folder}/{log path}/00000.log.gz, 00001.log.gz, ...
+
+    Appending (e.g. a rescheduled sensor reusing its try number) only adds chunks and
+    rewrites the index, rather than downloading and re-uploading the whole log.
+
+    The log view reads the index and the last tail_chunks chunks' worth, so it costs the same
+    however long the log is.  Reading further is a range read by chunk, pass
+    metadata = {"offset": <chunk>} to /get_logs_with_metadata, and downloading the log
+    streams it one chunk at a time.  Chunks are kept in a ChunkCache on the Webserver.
+    Logs written before this handler (plain objects, no index) are read as before
+
+    Configured in fairflow_ext.log_config (see TASK_LOG_CONFIG in fairflow/config.py)
+    """
+
+    def __init__(self, base_log_folder: str, s3_log_folder: str, filename_template: str,
+                       chunk_bytes: int = 1024 * 1024, tail_chunks: int = 1,
+                       cache_dir: str = None, cache_max_bytes: int = 256 * 1024 * 1024):
+        super().__init__(base_log_folder, s3_log_folder, filename_template)
+        self.chunk_bytes = chunk_bytes
+        self.tail_chunks = tail_chunks
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), 'fairflow-log-cache')
+        self.cache_max_bytes = cache_max_bytes
+        self._cache = None
+
+
+    @property
+    def cache(self) -> ChunkCache:
+        # Created on first read, the workers only ever write
+        if self._cache is None:
+            self._cache = ChunkCache(self.cache_dir, self.cache_max_bytes)
+        return self._cache
+
+
+    def _bucket_and_prefix(self, remote_loc: str):
+        return self.hook.parse_s3_url(remote_loc.rstrip('/') + '/')
+
+
+    def _read_index(self, remote_loc: str) -> Optional[List[dict]]:
+        bucket, prefix = self._bucket_and_prefix(remote_loc)
+        if not self.hook.check_for_key(prefix + INDEX_NAME, bucket):
+            return None
+        return json.loads(self.hook.read_key(prefix + INDEX_NAME, bucket))['chunks']
+
+
+    def _read_chunk(self, remote_loc: str, chunk: dict) -> str:
+        bucket, prefix = self._bucket_and_prefix(remote_loc)
+        key = prefix + chunk['key']
+        data = self.cache.get(key)
+        if data is None:
+            data = self.hook.get_key(key, bucket).get()['Body'].read()
+            self.cache.set(key, data)
+        return gzip.decompress(data).decode('utf-8', errors = 'replace')
+
+
+    def s3_write(self, log: str, remote_log_location: str, append: bool = True):
+        bucket, prefix = self._bucket_and_prefix(remote_log_location)
+        encrypt = conf.getboolean('logging', 'ENCRYPT_S3_LOGS')
+        try:
+            chunks = (self._read_index(remote_log_location) or []) if append else []
+            data = log.encode('utf-8')
+            offset = chunks[-1]['offset'] + chunks[-1]['size'] if chunks else 0
+            start = 0
+            while start < len(data):
+                # Split on a line boundary where there is one, so chunks stand on their own
+                end = start + self.chunk_bytes
+                if end < len(data):
+                    newline = data.rfind(b'\n', start, end)
+                    end = newline + 1 if newline > start else end
+                body = data[start:end]
+                start = end
+                chunk = {'key': f'{len(chunks):05d}.log.gz', 'offset': offset, 'size': len(body)}
+                self.hook.load_bytes(gzip.compress(body, compresslevel = 6), key = prefix + chunk['key'],
+                                     bucket_name = bucket, replace = True, encrypt = encrypt)
+                chunks.append(chunk)
+                offset += len(body)
+            # Written last, so readers never see a chunk that isn't uploaded yet
+            self.hook.load_string(json.dumps({'chunks': chunks}), key = prefix + INDEX_NAME,
+                                  bucket_name = bucket, replace = True, encrypt = encrypt)
+        except Exception:
+            self.log.exception('Could not write logs to %s', remote_log_location)
+
+
+    def _read(self, ti, try_number, metadata = None):
+        metadata = metadata or {}
+        remote_loc = os.path.join(self.remote_base, self._render_filename(ti, try_number))
+        try:
+            chunks = self._read_index(remote_loc)
+        except Exception as error:
+            self.log.exception('Failed to read the remote log index for %s', remote_loc)
+            return f'*** Failed to read the remote log index for {remote_loc}.\n{error}\n', \
+                   {'end_of_log': True}
+        if chunks is None:
+            # Not written yet (falls back to the worker) or written before chunking
+            return super()._read(ti, try_number, metadata)
+        if not chunks:
+            return f'*** Remote log {remote_loc} is empty\n', {'end_of_log': True}
+
+        total = chunks[-1]['offset'] + chunks[-1]['size']
+        if 'offset' in metadata or metadata.get('download_logs'):
+            # One chunk per call, the UI / download keep asking until end_of_log
+            index = int(metadata.get('offset', 0))
+            if index >= len(chunks):
+                return '', {'offset': index, 'end_of_log': True}
+            log = self._read_chunk(remote_loc, chunks[index])
+            if index == 0 and not metadata.get('download_logs'):
+                log = f'*** Reading remote log from {remote_loc} ({total} bytes, ' \
+                      f'{len(chunks)} chunks)\n' + log
+            return log, {'offset': index + 1, 'end_of_log': index + 1 >= len(chunks)}
+
+        # At least tail_chunks full chunks worth, appends can leave a short last chunk
+        tail = []
+        while len(tail) < len(chunks) and sum(c['size'] for c in tail) < self.tail_chunks * self.chunk_bytes:
+            tail.insert(0, chunks[-len(tail) - 1])
+        log = f'*** Reading remote log from {remote_loc}\n'
+        if len(tail) < len(chunks):
+            log += f'*** Showing the last {total - tail[0]["offset"]} of {total} bytes, ' \
+                   f'download the log for all of it\n'
+        log += ''.join(self._read_chunk(remote_loc, chunk) for chunk in tail)
+        return log, {'end_of_log': True}
@@ -0,0 +1,44 @@
+"""
+Create a tenant's database on the shared RDS instance if it isn't there yet (see
+MULTI_TENANCY_CONFIG in fairflow/config.py), used by default_entrypoint.sh before it waits
+for the DB.  Connects with the instance's credentials from RDS_SECRET_ARN
+
+    python -m fairflow_ext.tenant_db $FAIRFLOW_DB_NAME
+"""
+import json
+import os
+import re
+import sys
+import time
+
+import boto3
+import MySQLdb
+
+ATTEMPTS = int(os.getenv('CONNECTION_CHECK_MAX_COUNT', '5')) or 1
+PAUSE_SECONDS = float(os.getenv('CONNECTION_CHECK_SLEEP_TIME', '3'))
+
+
+def create_database(name: str) -> None:
+    # Only ever a TenantConfig name with a prefix, but it goes into the statement as is
+    if not re.fullmatch(r'\w+', name):
+        raise ValueError(f'Not a database name: {name!r}')
+    creds = json.loads(boto3.client('secretsmanager')
+                       .get_secret_value(SecretId = os.environ['RDS_SECRET_ARN'])['SecretString'])
+    for attempt in range(1, ATTEMPTS + 1):
+        try:
+            connection = MySQLdb.connect(host = creds['host'], port = int(creds['port']),
+                                         user = creds['username'], passwd = creds['password'])
+            break
+        except MySQLdb.OperationalError:
+            if attempt == ATTEMPTS:
+                raise
+            time.sleep(PAUSE_SECONDS)
+    try:
+        # The instance's default character set / collation, like the database RDS created
+        connection.cursor().execute(f'CREATE DATABASE IF NOT EXISTS `{name}`')
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    create_database(sys.argv[1])
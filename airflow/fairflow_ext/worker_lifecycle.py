@@ -0,0 +1,93 @@
+"""
+ECS task scale-in protection for a Celery Worker while it runs Airflow tasks, started next
+to the worker by run_celery_worker in default_entrypoint.sh
+
+    python -m fairflow_ext.worker_lifecycle --worker-pid <pid>
+
+Every FAIRFLOW_WORKER_PROTECTION_POLL_SECONDS the worker's running tasks are counted (the
+"airflow task supervisor" processes Airflow forks per task below it).  While there are
+any, the task is protected through the ECS agent, so Service Auto Scaling scales in idle
+Workers instead and deployments leave it running until it's done.  The protection is
+renewed before it expires, so a Worker that hangs doesn't keep it for more than
+FAIRFLOW_WORKER_PROTECTION_EXPIRES_MINUTES.  Exits (unprotected) with the worker
+"""
+import json
+import os
+import time
+from argparse import ArgumentParser
+from urllib.request import Request, urlopen
+
+import psutil
+
+TASK_PROCESS_TITLE = 'airflow task supervisor'
+
+
+def running_tasks(worker: psutil.Process) -> int:
+    count = 0
+    for process in worker.children(recursive = True):
+        try:
+            if ' '.join(process.cmdline()).startswith(TASK_PROCESS_TITLE):
+                count += 1
+        except psutil.Error:
+            # Finished while we were looking
+            pass
+    return count
+
+
+def alive(worker: psutil.Process) -> bool:
+    try:
+        return worker.status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+def set_protection(enabled: bool, expires_in_minutes: int) -> None:
+    body = {'ProtectionEnabled': enabled}
+    if enabled:
+        body['ExpiresInMinutes'] = expires_in_minutes
+    request = Request(f'{os.environ["ECS_AGENT_URI"]}/task-protection/v1/state',
+                      data = json.dumps(body).encode(), method = 'PUT',
+                      headers = {'Content-Type': 'application/json'})
+    with urlopen(request, timeout = 10) as response:
+        result = json.load(response)
+    if 'failure' in result or 'error' in result:
+        raise RuntimeError(f'Could not update the task protection: {result}')
+
+
+def main(worker_pid: int, expires_in_minutes: int, poll_seconds: float) -> None:
+    worker = psutil.Process(worker_pid)
+    protected_until = None
+    while alive(worker):
+        try:
+            active = running_tasks(worker)
+            # Renewed half way, a poll or a slow agent call can't let it lapse mid-task
+            if active and (protected_until is None or time.monotonic() > protected_until - expires_in_minutes * 30):
+                set_protection(True, expires_in_minutes)
+                if protected_until is None:
+                    print(f'Protected from scale-in, {active} task(s) running', flush = True)
+                protected_until = time.monotonic() + expires_in_minutes * 60
+            elif not active and protected_until is not None:
+                set_protection(False, expires_in_minutes)
+                print('Idle, no longer protected from scale-in', flush = True)
+                protected_until = None
+        except (OSError, psutil.Error, RuntimeError) as error:
+            # Try again next poll, the worker carries on either way
+            print(f'Task protection: {error}', flush = True)
+        time.sleep(poll_seconds)
+    if protected_until is not None:
+        try:
+            set_protection(False, expires_in_minutes)
+        except (OSError, RuntimeError) as error:
+            # The container is on its way out, protection stops counting with the task anyway
+            print(f'Task protection: {error}', flush = True)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'Scale-in protection for a Celery Worker while it runs tasks')
+    parser.add_argument('--worker-pid', type = int, required = True)
+    parser.add_argument('--expires-in-minutes', type = int,
+                        default = int(os.getenv('FAIRFLOW_WORKER_PROTECTION_EXPIRES_MINUTES', '60')))
+    parser.add_argument('--poll-seconds', type = float,
+                        default = float(os.getenv('FAIRFLOW_WORKER_PROTECTION_POLL_SECONDS', '10')))
+    args = parser.parse_args()
+    main(args.worker_pid, args.expires_in_minutes, args.poll_seconds)
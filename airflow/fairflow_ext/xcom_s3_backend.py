@@ -0,0 +1,105 @@
+import gzip
+import io
+import json
+import os
+import pickle
+import uuid
+from typing import Any
+
+from airflow.configuration import conf
+from airflow.models.xcom import BaseXCom
+
+# Set by FairflowConstruct, see XCOM_BACKEND_CONFIG in fairflow/config.py
+XCOM_BUCKET = os.getenv('FAIRFLOW_XCOM_BUCKET')
+XCOM_THRESHOLD_BYTES = int(os.getenv('FAIRFLOW_XCOM_THRESHOLD_BYTES', '65536'))
+# A tenant's values under a prefix of their own in the shared bucket
+KEY_PREFIX = f"{os.environ['FAIRFLOW_TENANT']}/" if os.getenv('FAIRFLOW_TENANT') else ''
+REFERENCE_PREFIX = 'fairflow-xcom-s3://'
+
+
+def _current_run_prefix() -> str:
+    # In Airflow 2.1 serialize_value only gets the value, so look the run up from the
+    #   context of the task that is pushing it
+    try:
+        from airflow.operators.python import get_current_context
+        context = get_current_context()
+        return f"{context['dag'].dag_id}/{context['run_id']}/{context['task'].task_id}"
+    except Exception:
+        return 'no-context'
+
+
+def _s3_client():
+    from airflow.providers.amazon.aws.hooks.s3 import S3Hook
+    return S3Hook(aws_conn_id = 'aws_default').get_conn()
+
+
+def _is_dataframe(value: Any) -> bool:
+    try:
+        import pandas as pd
+    except ImportError:
+        return False
+    return isinstance(value, pd.DataFrame)
+
+
+class S3XComBackend(BaseXCom):
+    """
+    XCom backend that keeps small values in the metadata DB as usual, but writes values
+    larger than FAIRFLOW_XCOM_THRESHOLD_BYTES (and all DataFrames) to the XCom bucket, under
+    {dag_id}/{run_id}/{task_id}/, and only stores a reference in the xcom table.
+
+    DataFrames are written as zstd compressed Parquet, everything else as gzipped JSON (or
+    gzipped pickle when core.enable_xcom_pickling is on and the value isn't JSON serializable)
+    """
+
+    @staticmethod
+    def serialize_value(value: Any, **kwargs):
+        if XCOM_BUCKET is None:
+            return BaseXCom.serialize_value(value)
+
+        if _is_dataframe(value):
+            buffer = io.BytesIO()
+            value.to_parquet(buffer, engine = 'pyarrow', compression = 'zstd')
+            return S3XComBackend._offload(buffer.getvalue(), 'parquet')
+
+        try:
+            payload = json.dumps(value).encode('UTF-8')
+            extension = 'json.gz'
+        except (TypeError, ValueError):
+            if not conf.getboolean('core', 'enable_xcom_pickling'):
+                # Let Airflow raise its usual error about non JSON serializable values
+                return BaseXCom.serialize_value(value)
+            payload = pickle.dumps(value)
+            extension = 'pkl.gz'
+
+        if len(payload) <= XCOM_THRESHOLD_BYTES:
+            return BaseXCom.serialize_value(value)
+        return S3XComBackend._offload(gzip.compress(payload), extension)
+
+
+    @staticmethod
+    def _offload(data: bytes, extension: str):
+        key = f'{KEY_PREFIX}{_current_run_prefix()}/{uuid.uuid4().hex}.{extension}'
+        _s3_client().put_object(Bucket = XCOM_BUCKET, Key = key, Body = data)
+        return BaseXCom.serialize_value(f'{REFERENCE_PREFIX}{XCOM_BUCKET}/{key}')
+
+
+    @staticmethod
+    def deserialize_value(result) -> Any:
+        value = BaseXCom.deserialize_value(result)
+        if not (isinstance(value, str) and value.startswith(REFERENCE_PREFIX)):
+            return value
+
+        bucket, key = value[len(REFERENCE_PREFIX):].split('/', 1)
+        data = _s3_client().get_object(Bucket = bucket, Key = key)['Body'].read()
+        if key.endswith('.parquet'):
+            import pandas as pd
+            return pd.read_parquet(io.BytesIO(data), engine = 'pyarrow')
+        if key.endswith('.pkl.gz'):
+            return pickle.loads(gzip.decompress(data))
+        return json.loads(gzip.decompress(data).decode('UTF-8'))
+
+
+    def orm_deserialize_value(self) -> Any:
+        # Used by the webserver when listing XComs, show the reference instead of
+        #   downloading every offloaded value
+        return BaseXCom.deserialize_value(self)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# fairflow_ext is importable from $AIRFLOW_HOME in the image (PYTHONPATH), the airflow folder here
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
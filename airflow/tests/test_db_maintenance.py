@@ -0,0 +1,124 @@
+"""
+fairflow_ext.db_maintenance on rows shaped like the metadata DB's, run with the Airflow
+image's Python packages
+
+    cd airflow && python -m pytest tests
+"""
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pq = pytest.importorskip('pyarrow.parquet')
+pytest.importorskip('airflow')
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, create_engine
+from sqlalchemy.dialects import mysql
+
+from fairflow_ext import db_maintenance
+
+NOW = datetime(2021, 8, 1)
+OLD = NOW - timedelta(days = 120)
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes) -> None:
+        self.objects[Key] = Body
+
+
+def read_archives(s3: FakeS3) -> list:
+    return [row for body in s3.objects.values() for row in pq.read_table(io.BytesIO(body)).to_pylist()]
+
+
+def test_archive_mysql_json_and_blob_columns():
+    # As reflected from MySQL: JSON comes back as dicts / lists / strings, pickles as bytes
+    table = Table('rendered_task_instance_fields', MetaData(),
+        Column('dag_id', mysql.VARCHAR(250), primary_key = True),
+        Column('task_id', mysql.VARCHAR(250), primary_key = True),
+        Column('execution_date', mysql.TIMESTAMP(fsp = 6), primary_key = True),
+        Column('rendered_fields', mysql.JSON),
+        Column('k8s_pod_yaml', mysql.JSON),
+        Column('executor_config', mysql.BLOB),
+        Column('duration', Float),
+        Column('external_trigger', mysql.TINYINT(1))
+    )
+    rows = [
+        {'dag_id': 'a', 'task_id': 't1', 'execution_date': OLD, 'rendered_fields': {},
+         'k8s_pod_yaml': None, 'executor_config': b'\x80\x04}\x94.', 'duration': 1.5,
+         'external_trigger': 0},
+        {'dag_id': 'a', 'task_id': 't2', 'execution_date': OLD.replace(tzinfo = timezone.utc),
+         'rendered_fields': {'bash_command': 'echo 1', 'env': [1, {'a': None}]},
+         'k8s_pod_yaml': [], 'executor_config': None, 'duration': None, 'external_trigger': 1},
+        {'dag_id': 'a', 'task_id': 't3', 'execution_date': OLD, 'rendered_fields': 'templated',
+         'k8s_pod_yaml': {}, 'executor_config': b'', 'duration': 2, 'external_trigger': None},
+    ]
+    s3 = FakeS3()
+    db_maintenance.archive(s3, 'bucket', table, 'execution_date', rows, 'run', 0)
+
+    assert list(s3.objects) == [f'{db_maintenance.ARCHIVE_PREFIX}/rendered_task_instance_fields/'
+                                f'dt={OLD.date().isoformat()}/run-00000.parquet']
+    archived = read_archives(s3)
+    assert [row['rendered_fields'] for row in archived] == \
+        ['{}', '{"bash_command": "echo 1", "env": [1, {"a": null}]}', '"templated"']
+    assert [row['k8s_pod_yaml'] for row in archived] == [None, '[]', '{}']
+    assert [row['executor_config'] for row in archived] == [b'\x80\x04}\x94.', None, b'']
+    assert [row['execution_date'] for row in archived] == [OLD] * 3
+
+
+@pytest.fixture
+def metadata_db(monkeypatch):
+    engine = create_engine('sqlite://')
+    metadata = MetaData()
+    dag_run = Table('dag_run', metadata,
+        Column('id', Integer, primary_key = True),
+        Column('dag_id', String(250)),
+        Column('execution_date', mysql.DATETIME),
+        Column('state', String(50))
+    )
+    task_instance = Table('task_instance', metadata,
+        Column('task_id', String(250), primary_key = True),
+        Column('dag_id', String(250), primary_key = True),
+        Column('execution_date', mysql.DATETIME, primary_key = True),
+        Column('state', String(20))
+    )
+    metadata.create_all(engine)
+    runs = [
+        # dag_id, days old, run state, task state
+        ('finished', 200, 'success', 'success'),
+        ('finished', 150, 'failed', 'running'),
+        ('finished', 100, 'success', None),
+        ('latest_is_old', 300, 'success', 'success'),
+        ('latest_is_old', 200, 'success', 'success'),
+        ('unfinished', 200, 'running', 'success'),
+        ('unfinished', 1, 'success', 'success'),
+    ]
+    with engine.begin() as conn:
+        for index, (dag_id, days, run_state, task_state) in enumerate(runs):
+            execution_date = NOW - timedelta(days = days)
+            conn.execute(dag_run.insert(), id = index, dag_id = dag_id,
+                         execution_date = execution_date, state = run_state)
+            conn.execute(task_instance.insert(), task_id = 't', dag_id = dag_id,
+                         execution_date = execution_date, state = task_state)
+    monkeypatch.setattr(db_maintenance.settings, 'engine', engine, raising = False)
+    return engine
+
+
+def test_prune_keeps_latest_and_unfinished_runs_with_their_task_instances(metadata_db):
+    s3 = FakeS3()
+    for name in ('task_instance', 'dag_run'):
+        db_maintenance.prune(name, NOW - timedelta(days = 90), batch_size = 2, batch_pause_seconds = 0,
+                             dry_run = False, s3 = s3, bucket = 'bucket', run_id = 'run')
+
+    with metadata_db.connect() as conn:
+        runs = conn.execute('SELECT dag_id, state FROM dag_run ORDER BY id').fetchall()
+        task_instances = conn.execute('SELECT dag_id, state FROM task_instance ORDER BY dag_id, execution_date').fetchall()
+    # The old finished runs go, the latest run of a DAG and the running one stay
+    assert runs == [('finished', 'success'), ('latest_is_old', 'success'),
+                    ('unfinished', 'running'), ('unfinished', 'success')]
+    # A running task instance stays even though its run is old and finished
+    assert task_instances == [('finished', 'running'), ('finished', None), ('latest_is_old', 'success'),
+                              ('unfinished', 'success'), ('unfinished', 'success')]
+    assert len(read_archives(s3)) == 5
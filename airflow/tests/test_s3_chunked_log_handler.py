@@ -0,0 +1,130 @@
+"""
+fairflow_ext.s3_chunked_log_handler against an in-memory S3 hook
+
+    cd airflow && python -m pytest tests
+"""
+import gzip
+import hashlib
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('airflow')
+
+from fairflow_ext.s3_chunked_log_handler import INDEX_NAME, S3ChunkedTaskHandler
+
+TI = SimpleNamespace(dag_id = 'dag', task_id = 'task', execution_date = datetime(2021, 8, 1))
+REMOTE_LOC = 's3://bucket/logs/dag/task/2021-08-01T00:00:00/1.log'
+PREFIX = 'logs/dag/task/2021-08-01T00:00:00/1.log/'
+# 40 lines of 9 bytes, 11 lines fit a 100 byte chunk
+LOG = ''.join(f'line {i:03d}\n' for i in range(40))
+
+
+class FakeS3Hook:
+    """ The S3Hook methods the handlers use, with keys given in full (s3://) or by bucket """
+
+    def __init__(self):
+        self.objects = {}
+        self.get_key_calls = 0
+
+    @staticmethod
+    def parse_s3_url(url: str):
+        bucket, _, key = url[len('s3://'):].partition('/')
+        return bucket, key
+
+    def _locate(self, key: str, bucket_name: str = None):
+        return self.parse_s3_url(key) if bucket_name is None else (bucket_name, key)
+
+    def check_for_key(self, key: str, bucket_name: str = None) -> bool:
+        return self._locate(key, bucket_name) in self.objects
+
+    def read_key(self, key: str, bucket_name: str = None) -> str:
+        return self.objects[self._locate(key, bucket_name)].decode('utf-8')
+
+    def get_key(self, key: str, bucket_name: str = None):
+        self.get_key_calls += 1
+        body = self.objects[self._locate(key, bucket_name)]
+        return SimpleNamespace(get = lambda: {'Body': SimpleNamespace(read = lambda: body)})
+
+    def load_bytes(self, bytes_data: bytes, key: str, bucket_name: str = None, replace: bool = False,
+                   encrypt: bool = False) -> None:
+        self.objects[self._locate(key, bucket_name)] = bytes_data
+
+    def load_string(self, string_data: str, key: str, bucket_name: str = None, replace: bool = False,
+                    encrypt: bool = False) -> None:
+        self.objects[self._locate(key, bucket_name)] = string_data.encode('utf-8')
+
+
+@pytest.fixture
+def handler(tmp_path):
+    handler = S3ChunkedTaskHandler(str(tmp_path / 'logs'), 's3://bucket/logs',
+                                   '{dag_id}/{task_id}/{execution_date}/{try_number}.log',
+                                   chunk_bytes = 100, tail_chunks = 1, cache_dir = str(tmp_path / 'cache'))
+    handler.hook = FakeS3Hook()
+    return handler
+
+
+def chunk_text(hook: FakeS3Hook, key: str) -> str:
+    return gzip.decompress(hook.objects[('bucket', PREFIX + key)]).decode('utf-8')
+
+
+def test_write_splits_into_chunks_on_line_boundaries(handler):
+    handler.s3_write(LOG, REMOTE_LOC)
+
+    index = handler._read_index(REMOTE_LOC)
+    assert index == [
+        {'key': '00000.log.gz', 'offset': 0, 'size': 99},
+        {'key': '00001.log.gz', 'offset': 99, 'size': 99},
+        {'key': '00002.log.gz', 'offset': 198, 'size': 99},
+        {'key': '00003.log.gz', 'offset': 297, 'size': 63},
+    ]
+    assert sorted(key for _, key in handler.hook.objects) == \
+        [PREFIX + chunk['key'] for chunk in index] + [PREFIX + INDEX_NAME]
+    texts = [chunk_text(handler.hook, chunk['key']) for chunk in index]
+    assert ''.join(texts) == LOG
+    assert all(text.endswith('\n') for text in texts)
+
+    # Appending only adds chunks after the last one
+    handler.s3_write('line 040\n', REMOTE_LOC)
+    assert handler._read_index(REMOTE_LOC)[4:] == [{'key': '00004.log.gz', 'offset': 360, 'size': 9}]
+    assert chunk_text(handler.hook, '00000.log.gz') == texts[0]
+
+
+def test_tail_view_spans_the_chunk_boundary(handler):
+    handler.s3_write(LOG, REMOTE_LOC)
+
+    log, metadata = handler._read(TI, 1)
+    # The last chunk is short, so the one before it is shown too
+    assert log.startswith(f'*** Reading remote log from {REMOTE_LOC}\n'
+                          '*** Showing the last 162 of 360 bytes, download the log for all of it\n')
+    assert log.endswith(LOG[198:])
+    assert 'line 021' not in log
+    assert metadata == {'end_of_log': True}
+
+    # Further back it reads one chunk per call
+    log, metadata = handler._read(TI, 1, {'offset': 3})
+    assert log == LOG[297:]
+    assert metadata == {'offset': 4, 'end_of_log': True}
+
+
+def test_log_without_index_is_read_as_a_plain_object(handler):
+    handler.hook.load_string('written before chunking\n', key = REMOTE_LOC)
+
+    log, metadata = handler._read(TI, 1)
+    assert log == f'*** Reading remote log from {REMOTE_LOC}.\nwritten before chunking\n\n'
+    assert metadata == {'end_of_log': True}
+
+
+def test_chunks_are_read_from_the_cache(handler):
+    handler.s3_write(LOG, REMOTE_LOC)
+    first, _ = handler._read(TI, 1)
+    assert handler.hook.get_key_calls == 2
+
+    # Named by the hash of the chunk's key
+    assert sorted(os.listdir(handler.cache_dir)) == \
+        sorted(hashlib.sha256(f'{PREFIX}{key}'.encode()).hexdigest() for key in ('00002.log.gz', '00003.log.gz'))
+    second, _ = handler._read(TI, 1)
+    assert second == first
+    assert handler.hook.get_key_calls == 2
@@ -0,0 +1,20 @@
+"""
+Configuration for the Airflow webserver, Airflow's default plus the DB reader routing.
+Copied to $AIRFLOW_HOME, where Airflow reads it when the Webserver app is created
+"""
+import os
+
+from flask_appbuilder.security.manager import AUTH_DB
+
+from fairflow_ext import db_routing
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+# Flask-WTF flag for CSRF
+WTF_CSRF_ENABLED = True
+
+# The authentication type, users and passwords in the metadata DB
+AUTH_TYPE = AUTH_DB
+
+# Read-only views and REST API GETs from the DB reader, when there is one
+db_routing.install()
@@ -1,26 +1,57 @@
 #!/usr/bin/env python3
 import os
+from dataclasses import replace
 
 # For consistency with TypeScript code, `cdk` is the preferred import name for
 #   the CDK's core module
 from aws_cdk import core as cdk
-from fairflow.fairflow_stack import FairflowStack
+from fairflow.fairflow_stack import (
+    FairflowNetworkStack,
+    FairflowDataStack,
+    FairflowStack
+)
+from fairflow.config import MULTI_TENANCY_CONFIG
+from fairflow.constructs.contruct_properties import FairflowConstructProps
 
 app = cdk.App()
-FairflowStack(app, "FairflowStack",
-    # If you don't specify 'env', this stack will be environment-agnostic.
-    # Account/Region-dependent features and context lookups will not work,
-    # but a single synthesized template can be deployed anywhere.
+# If you don't specify 'env', the stacks will be environment-agnostic.
+# Account/Region-dependent features and context lookups will not work,
+# but a single synthesized template can be deployed anywhere.
+
+# Specialize the stacks for the AWS Account and Region that are implied
+#   by the current CLI configuration
+env = cdk.Environment(account=os.getenv('CDK_DEFAULT_ACCOUNT'), region=os.getenv('CDK_DEFAULT_REGION'))
 
-    # Specialize this stack for the AWS Account and Region that are implied
-    #   by the current CLI configuration
-    env=cdk.Environment(account=os.getenv('CDK_DEFAULT_ACCOUNT'), region=os.getenv('CDK_DEFAULT_REGION')),
+# Uncomment the next line if you know exactly what Account and Region you
+# want to deploy the stacks to. */
+#env=core.Environment(account='123456789012', region='us-east-1'),
 
-    # Uncomment the next line if you know exactly what Account and Region you
-    # want to deploy the stack to. */
-    #env=core.Environment(account='123456789012', region='us-east-1'),
+# For more information, see https://docs.aws.amazon.com/cdk/latest/guide/environments.html
 
-    # For more information, see https://docs.aws.amazon.com/cdk/latest/guide/environments.html
+# VPC, ECS Cluster, Security Group -> S3 / EFS / RDS / Redis / secrets -> Airflow services,
+#   cdk deploy --all deploys them in that order.  The compute stack (FairflowStack) can be
+#   deployed on its own after that, without touching the data
+network_stack = FairflowNetworkStack(app, "FairflowNetworkStack", env=env)
+props = FairflowConstructProps(
+    vpc_props = network_stack.vpc_props,
+    cluster = network_stack.cluster,
+    highly_available = False,
+    enable_autoscaling = False
 )
+data_stack = FairflowDataStack(app, "FairflowDataStack", props, env=env)
+
+# One compute stack per tenant sharing the network / data stacks, see README -> Multi-Tenancy
+if MULTI_TENANCY_CONFIG.tenants:
+    for tenant in MULTI_TENANCY_CONFIG.tenants:
+        FairflowStack(app, f"FairflowStack-{tenant.name}", replace(props, tenant=tenant), data_stack.data, env=env)
+else:
+    FairflowStack(app, "FairflowStack", props, data_stack.data, env=env)
+
+# cdk synth -c image_report=true builds the Airflow image and reports its size and estimated
+#   pull time against the Dockerfile at image_report_baseline (default the merge-base with
+#   the main branch), needs docker
+if app.node.try_get_context('image_report'):
+    from helpers.image_report import report
+    report('./airflow', baseline_ref = app.node.try_get_context('image_report_baseline'))
 
 app.synth()
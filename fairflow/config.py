@@ -1,10 +1,13 @@
-from typing import List
+import re
+from typing import Dict, List
 from dataclasses import dataclass
 
 from aws_cdk import (
     core as cdk,
     aws_ec2 as ec2,
-    aws_ecs as ecs
+    aws_ecs as ecs,
+    aws_efs as efs,
+    aws_events as events
 )
 from jsii import Number
 
@@ -15,6 +18,25 @@ class AutoScalingConfig:
     cpu_usage_percent: Number = None
     mem_usage_percent: Number = None
 
+@dataclass(frozen=True)
+class LoggingConfig:
+    # non-blocking buffers the container's output in memory (dropping lines
+    #   when full) instead of stalling its writes while CloudWatch Logs is slow
+    #   see: https://aws.amazon.com/blogs/containers/preventing-log-loss-with-non-blocking-mode-in-the-awslogs-container-log-driver/
+    mode: ecs.AwsLogDriverMode
+    max_buffer_size_mib: Number
+    # A line matching this starts a new log event, and the lines after it that don't are
+    #   appended to it, e.g. r'^\[\d{4}-\d{2}-\d{2}' keeps Airflow tracebacks in one event
+    multiline_pattern: str = None
+    # Ship through a FireLens (Fluent Bit) sidecar, which buffers and batches the
+    #   container's output to CloudWatch Logs.  max_buffer_size_mib is then the buffer
+    #   between the container and the sidecar
+    firelens: bool = False
+
+    def __post_init__(self):
+        if self.firelens and self.multiline_pattern:
+            raise ValueError('multiline_pattern is only supported with the awslogs driver')
+
 @dataclass(frozen=True)
 class ContainerConfig:
     name: str
@@ -22,6 +44,7 @@ class ContainerConfig:
     command: List[str]
     entry_point: List[str]
     health_check: ecs.HealthCheck
+    logging: LoggingConfig
 
 @dataclass(frozen=True)
 class TaskConfig:
@@ -29,16 +52,378 @@ class TaskConfig:
     memory_limit_mib: Number
 
 
+@dataclass(frozen=True)
+class ExternalTaskCapacityConfig:
+    # The account's Fargate On-Demand vCPU quota in the region (Service Quotas L-3032A538)
+    #   see: https://docs.aws.amazon.com/AmazonECS/latest/developerguide/service-quotas.html
+    fargate_vcpu_quota: Number
+    # The part of the quota External Tasks can use, the rest is left for the Airflow
+    #   services (and anything else running on Fargate in the account)
+    external_task_share: float
+    # Each tier's part of the External Task vCPU, its Airflow pool gets as many slots as
+    #   tasks of its size fit in that.  Tiers left out get no pool (default_pool)
+    tier_shares: Dict[str, float]
+    # Jittered exponential backoff of RunTask capacity / throttling errors
+    launch_attempts: int = 5
+    backoff_base_seconds: Number = 2
+    backoff_max_seconds: Number = 60
+
+    def __post_init__(self):
+        if not 0 < self.external_task_share <= 1:
+            raise ValueError('external_task_share must be more than 0 and at most 1')
+        if sum(self.tier_shares.values()) > 1:
+            raise ValueError('tier_shares must add up to 1 or less')
+        if self.launch_attempts < 1:
+            raise ValueError('launch_attempts must be at least 1')
+
+@dataclass(frozen=True)
+class DbSizingProfile:
+    # 'mysql' for an RDS MySQL 8 instance, or 'aurora-mysql' for an Aurora MySQL 3 (MySQL 8
+    #   compatible) cluster, whose reader endpoint is handed to the Webserver
+    engine: str
+    instance_type: ec2.InstanceType
+    # RDS MySQL only, Aurora storage grows by itself.  gp2 IOPS scale with the volume
+    #   (3 per GB), gp3 starts at 3000 IOPS / 125 MiB/s however small it is
+    #   see: https://docs.aws.amazon.com/AmazonRDS/latest/UserGuide/CHAP_Storage.html
+    storage_type: str = 'gp2'
+    allocated_storage_in_gb: Number = 20
+    # Provisioned IOPS / throughput, io1 or gp3 from 400 GB (below that gp3 is fixed at the baseline)
+    iops: Number = None
+    storage_throughput_mibps: Number = None
+    # Aurora readers, on top of the writer.  When highly available there's at least one
+    #   (in another AZ), as the failover target
+    aurora_readers: Number = 0
+    # RDS MySQL only, a read replica of the instance the Webserver reads from (see
+    #   DB_READ_ROUTING_CONFIG), Aurora has the reader endpoint for that
+    read_replica: bool = False
+    # Custom DB parameter group, None keeps the engine defaults
+    parameters: Dict[str, str] = None
+    performance_insights: bool = False
+
+    def __post_init__(self):
+        if self.engine not in ('mysql', 'aurora-mysql'):
+            raise ValueError(f'Unknown DB engine: {self.engine}')
+        if self.storage_type not in ('gp2', 'gp3', 'io1'):
+            raise ValueError(f'Unknown DB storage type: {self.storage_type}')
+        if self.storage_type == 'io1' and not self.iops:
+            raise ValueError('iops is required with io1 storage')
+        if self.storage_type == 'gp2' and (self.iops or self.storage_throughput_mibps):
+            raise ValueError('gp2 storage has no provisioned IOPS / throughput, use gp3 or io1')
+        if self.storage_type == 'gp3' and (self.iops or self.storage_throughput_mibps) \
+                and self.allocated_storage_in_gb < 400:
+            raise ValueError('gp3 IOPS / throughput can only be provisioned from 400 GB')
+        if self.read_replica and self.engine != 'mysql':
+            raise ValueError('read_replica is for RDS MySQL, use aurora_readers with Aurora')
+
+@dataclass(frozen=True)
+class DbReadRoutingConfig:
+    # Send the Webserver's read-only views and REST API GETs to the reader (the read
+    #   replica or Aurora's reader endpoint) when there is one, see fairflow_ext.db_routing
+    enabled: bool
+    # Back to the writer while the reader is further behind than this.  What those pages
+    #   show can be this stale, e.g. a task state right after clearing it
+    max_lag_seconds: Number
+    # How often each Webserver process checks the reader's lag
+    lag_check_seconds: Number
+
 @dataclass(frozen=True)
 class MySQLConfig:
     instance_name: str
     db_name: str
     port: Number
     master_username: str
-    instance_type: ec2.InstanceType
-    allocated_storage_in_gb: Number
     backup_retention_in_days: cdk.Duration
+    sizing: DbSizingProfile
+
+@dataclass(frozen=True)
+class RetentionConfig:
+    retention_in_days: Number
+    schedule: events.Schedule
+
+@dataclass(frozen=True)
+class DbMaintenanceConfig:
+    # Metadata DB rows older than retention_in_days are archived to S3 and deleted, on schedule
+    retention: RetentionConfig
+    # Rows per archive / delete transaction, small batches keep row locks short
+    batch_size: Number
+    # Pause between batches, so the Scheduler's own queries get a look in
+    batch_pause_seconds: Number
+    # OPTIMIZE TABLE as well as ANALYZE TABLE after pruning, to give the space back
+    optimize: bool
+
+@dataclass(frozen=True)
+class EfsConfig:
+    performance_mode: efs.PerformanceMode = efs.PerformanceMode.GENERAL_PURPOSE
+    # 'bursting', 'provisioned' or 'elastic'
+    #   see: https://docs.aws.amazon.com/efs/latest/ug/performance.html#throughput-modes
+    throughput_mode: str = 'bursting'
+    # Only used (and required) with the provisioned throughput mode
+    provisioned_throughput_mib_per_second: Number = None
+
+    def __post_init__(self):
+        if self.throughput_mode not in ('bursting', 'provisioned', 'elastic'):
+            raise ValueError(f'Unknown EFS throughput mode: {self.throughput_mode}')
+        if self.throughput_mode == 'provisioned' and not self.provisioned_throughput_mib_per_second:
+            raise ValueError('provisioned_throughput_mib_per_second is required in provisioned mode')
+        if self.throughput_mode == 'elastic' and self.performance_mode != efs.PerformanceMode.GENERAL_PURPOSE:
+            raise ValueError('Elastic throughput is only supported with the General Purpose performance mode')
+
+@dataclass(frozen=True)
+class SharedStorageConfig:
+    dags: EfsConfig
+    # None keeps the External Task data on the DAGs file system (shared burst credits),
+    #   otherwise it gets its own file system with these settings
+    external_tasks: EfsConfig = None
+
+@dataclass(frozen=True)
+class XComBackendConfig:
+    # Values bigger than this (and all DataFrames) are written to S3 instead of the metadata DB
+    threshold_bytes: Number
+    # Lifecycle expiry of the offloaded values in the XCom bucket
+    expiration_in_days: Number
+
+@dataclass(frozen=True)
+class TaskLogConfig:
+    # Task logs are written to S3 gzipped, in chunks of this many (uncompressed) bytes
+    chunk_bytes: Number
+    # How much (in chunks) of the end of a log the log view shows, download gets it all
+    tail_chunks: Number
+    # On-disk LRU cache of log chunks on the Webserver
+    cache_max_mib: Number
+    # logs/ moves to S3 Intelligent-Tiering after this many days (still instantly
+    #   readable from the UI), and is deleted after expiration_in_days (None keeps it)
+    intelligent_tiering_after_days: Number
+    expiration_in_days: Number = None
+
+@dataclass(frozen=True)
+class SecretsCacheConfig:
+    # Secret names have to start with airflow- to be readable (see PolicyConstruct)
+    connections_prefix: str
+    variables_prefix: str
+    ttl_seconds: Number
+    # Misses are cached too, Airflow asks the backend first for every lookup
+    negative_ttl_seconds: Number
+    max_entries: Number
+    # Redis DB index (on REDIS_HOST) for a cache shared by all containers,
+    #   None for per process caching only.  DB 0 is the Celery broker
+    redis_db: Number = None
+
+@dataclass(frozen=True)
+class CeleryWorkerConfig:
+    # Pool processes per Worker, the most when autoscaling the pool
+    concurrency: Number
+    # Grow / shrink the pool between this and concurrency with the queue (prefork only),
+    #   None for a fixed pool of concurrency processes
+    autoscale_min: Number = None
+    # Messages each pool process reserves on top of the one it runs.  Reserved tasks wait
+    #   behind a long task on a busy Worker while other Workers sit idle, so 1 (Airflow's
+    #   default) spreads the load best
+    prefetch_multiplier: Number = 1
+    # Ack once the task finishes instead of when it's received, so the tasks of a Worker
+    #   that dies (e.g. scaled in) are redelivered after the broker's visibility timeout
+    acks_late: bool = True
+    # 'prefork', 'threads' or 'solo'
+    pool: str = 'prefork'
+    # Replace a pool process after this many tasks (prefork only).  Airflow runs each task
+    #   in a fork of the pool process, so every task inherits whatever the pool process
+    #   has built up, None keeps them for the life of the Worker
+    max_tasks_per_child: Number = None
+
+    def __post_init__(self):
+        if self.pool not in ('prefork', 'threads', 'solo'):
+            raise ValueError(f'Unknown Celery pool: {self.pool}')
+        if self.pool != 'prefork' and (self.autoscale_min is not None or self.max_tasks_per_child):
+            raise ValueError('autoscale_min and max_tasks_per_child need the prefork pool')
+        if self.autoscale_min is not None and self.autoscale_min > self.concurrency:
+            raise ValueError('autoscale_min has to be at most concurrency')
 
+@dataclass(frozen=True)
+class WorkerLifecycleConfig:
+    # Time between ECS's SIGTERM and SIGKILL, for Celery's warm shutdown to finish the
+    #   running tasks (120 is the most Fargate allows)
+    stop_timeout_seconds: Number
+    # Protect a Worker's ECS task from scale-in, and from being stopped by a deployment,
+    #   while it runs Airflow tasks
+    #   see: https://docs.aws.amazon.com/AmazonECS/latest/developerguide/task-scale-in-protection.html
+    scale_in_protection: bool
+    # Renewed while tasks run, so it only lapses this long after a Worker stops renewing it
+    protection_expires_in_minutes: Number
+    # How often the Worker's running tasks are counted
+    protection_poll_seconds: Number
+    # Deployments start the new Workers first (max) and only then stop the old ones, which
+    #   are protected until their running tasks are done
+    min_healthy_percent: Number
+    max_healthy_percent: Number
+    # Stop and roll back a deployment whose Workers keep failing to start
+    circuit_breaker_rollback: bool
+
+    def __post_init__(self):
+        if not 0 < self.stop_timeout_seconds <= 120:
+            raise ValueError('Fargate stop timeouts are between 1 and 120 seconds')
+        if not 1 <= self.protection_expires_in_minutes <= 2880:
+            raise ValueError('Task protection expires in 1 to 2880 minutes')
+
+@dataclass(frozen=True)
+class PreScalingConfig:
+    # Scale the Workers ahead of the scheduled DAG runs, from their history in the metadata DB.
+    #   Raises the autoscaling minimum, so it needs enable_autoscaling (see app.py)
+    enabled: bool
+    schedule: events.Schedule
+    # How far ahead to forecast, at least the schedule's interval plus the time for this
+    #   task and then a Worker to start
+    horizon_minutes: Number
+    # The busiest of each DAG's last history_runs scheduled runs is its forecast
+    history_runs: Number
+
+@dataclass(frozen=True)
+class RedisBrokerConfig:
+    # ElastiCache node type, when highly available
+    node_type: str
+    # Fargate task size otherwise
+    task: TaskConfig
+    # Fargate only, leave room below the task memory for the connections' buffers and a
+    #   fork if snapshots / AOF rewrites are on.  ElastiCache sets maxmemory from the
+    #   node type and keeps reserved_memory_percent of it back for the same reasons
+    maxmemory_mib: Number
+    reserved_memory_percent: Number = 25
+    # noeviction makes a full broker refuse new messages (the Scheduler fails those task
+    #   tries, which then go through their retries) rather than silently drop queued ones.  volatile-lru would only evict keys
+    #   with a TTL, like the SECRETS_CACHE_CONFIG entries when they share this Redis
+    maxmemory_policy: str = 'noeviction'
+    # Fargate only.  The task's storage goes with it, so persistence only survives a
+    #   redis-server restart.  ElastiCache doesn't support AOF, its replica is the copy
+    appendonly: bool = False
+    # Background RDB snapshots fork Redis and can stall it under load, off when False
+    snapshots: bool = False
+    # Fargate only, threads for socket reads / writes, only worth it from 4 vCPUs
+    #   (ElastiCache does this on its own for nodes with 4+ vCPUs)
+    io_threads: Number = 1
+
+    def __post_init__(self):
+        if self.maxmemory_mib >= self.task.memory_limit_mib:
+            raise ValueError('maxmemory_mib has to leave room in the Redis task memory')
+
+@dataclass(frozen=True)
+class MetricsConfig:
+    # CloudWatch namespace the StatsD sidecars publish Airflow's metrics to
+    namespace: str
+    statsd_prefix: str
+    # Alarm when the scheduler heartbeats less than this often in 5 minutes
+    min_scheduler_heartbeats: Number
+    # Alarm when the p99 scheduler loop duration (ms) goes above this
+    max_scheduler_loop_duration_ms: Number
+    # The StatsD sidecar's CloudWatch agent image, a fixed version so replacing a task
+    #   doesn't pick up a new agent
+    #   see: https://gallery.ecr.aws/cloudwatch-agent/cloudwatch-agent
+    agent_image: str
+
+@dataclass(frozen=True)
+class ProfilingConfig:
+    # ECS Exec into the Scheduler / Worker containers, to run fairflow_ext.profiling on demand
+    enable_execute_command: bool
+    # Always sample the Scheduler / Worker with py-spy at a low rate, uploading one
+    #   profile per window to the logs bucket
+    continuous: bool
+    continuous_rate_hz: Number
+    continuous_window_seconds: Number
+
+@dataclass(frozen=True)
+class VpcEndpointsConfig:
+    # S3 gateway endpoint (free)
+    s3_gateway: bool
+    # ECR api/dkr, CloudWatch Logs / Metrics, Secrets Manager, ECS and STS interface
+    #   endpoints (charged per AZ-hour and per GB, but skip the NAT gateways)
+    interface_endpoints: bool
+
+@dataclass(frozen=True)
+class LazyLoadingConfig:
+    # Image assets to SOCI index after they're published (helpers/soci_index.py), so
+    #   Fargate starts the containers while the layers stream in
+    airflow_image: bool
+    external_tasks: bool
+    # Layers smaller than this are pulled whole before the container starts
+    min_layer_size_mib: Number
+
+@dataclass(frozen=True)
+class TenantConfig:
+    # An Airflow environment of its own (compute stack, database, Redis DB, EFS access
+    #   points) on the shared network / data stacks.  Lowercase letters and digits, it
+    #   goes into the stack, database, secret and S3 key names
+    name: str
+    # Its Celery broker's Redis DB index, 0 - 15 (the databases of the default Redis config)
+    redis_db: Number
+    # Its budget of the shared capacity: Workers at most (autoscaling / pre-scaling),
+    #   task instances running at once, and share of the External Task vCPU (its pools)
+    max_workers: Number
+    parallelism: Number
+    external_task_vcpu_share: float
+    # Its DAGs, synced into its own DAGs access point (the DAG_REPOSITORY of the single
+    #   FairflowStack), and the ARN of the secret with the repo's read-only deploy key
+    #   when it's private (see README -> Secrets)
+    dag_repository: str
+    git_read_only_secret_arn: str = None
+
+    def __post_init__(self):
+        if not re.fullmatch(r'[a-z][a-z0-9]{0,15}', self.name):
+            raise ValueError(f'Tenant name {self.name!r} has to be 1 - 16 lowercase letters / digits')
+        if not 0 <= self.redis_db <= 15:
+            raise ValueError('redis_db is a Redis DB index, 0 - 15')
+        if not 0 < self.external_task_vcpu_share <= 1:
+            raise ValueError('external_task_vcpu_share is a fraction of the External Task vCPU')
+        if not self.dag_repository:
+            raise ValueError(f'Tenant {self.name!r} needs a dag_repository')
+
+@dataclass(frozen=True)
+class MultiTenancyConfig:
+    # One compute stack per tenant, sharing the network / data stacks.  Empty for the
+    #   single FairflowStack
+    tenants: List[TenantConfig]
+    # Run the Workers on FARGATE_SPOT past worker_on_demand_base tasks on FARGATE.  The
+    #   Spot interruption is a SIGTERM 2 minutes ahead, the same warm shutdown as a scale-in
+    spot_workers: bool
+    worker_on_demand_base: Number = 1
+
+    def __post_init__(self):
+        names = [tenant.name for tenant in self.tenants]
+        if len(set(names)) < len(names):
+            raise ValueError('Tenant names have to be unique')
+        redis_dbs = [tenant.redis_db for tenant in self.tenants]
+        if len(set(redis_dbs)) < len(redis_dbs):
+            raise ValueError('Tenants need a Redis DB index each')
+        # The shared secrets cache is on the same Redis (SECRETS_CACHE_CONFIG is set first)
+        if SECRETS_CACHE_CONFIG.redis_db is not None and SECRETS_CACHE_CONFIG.redis_db in redis_dbs:
+            raise ValueError(f'Redis DB {SECRETS_CACHE_CONFIG.redis_db} is the secrets cache\'s, '
+                             'pick another redis_db for the tenant')
+        if sum(tenant.external_task_vcpu_share for tenant in self.tenants) > 1:
+            raise ValueError('The tenants\' external_task_vcpu_share add up to more than 1')
+
+
+# Lazy loading (SOCI) of the Airflow and External Task images, see README -> Docker Builds
+LAZY_LOADING_CONFIG = LazyLoadingConfig(
+    airflow_image = False,
+    external_tasks = True,
+    min_layer_size_mib = 10
+)
+
+# Keep AWS API / ECR / S3 traffic from the private subnets off the NAT gateways
+VPC_ENDPOINTS_CONFIG = VpcEndpointsConfig(
+    s3_gateway = True,
+    interface_endpoints = False
+)
+
+# Container log drivers (see LoggingConstruct).  Non-blocking, so e.g. the scheduler loop
+#   never waits on the CloudWatch Logs API
+SERVICE_LOGGING_CONFIG = LoggingConfig(
+    mode = ecs.AwsLogDriverMode.NON_BLOCKING,
+    max_buffer_size_mib = 25
+)
+
+EXTERNAL_TASK_LOGGING_CONFIG = LoggingConfig(
+    mode = ecs.AwsLogDriverMode.NON_BLOCKING,
+    max_buffer_size_mib = 25,
+    # e.g. the even / odd number tasks log a line per number
+    # firelens = True
+)
 
 # Webserver Task and Container Configs
 WEBSERVER_TASK_CONFIG = TaskConfig(
@@ -51,7 +436,8 @@ WEBSERVER_CONFIG = ContainerConfig(
     container_port = 8080,
     entry_point = ['/default_entrypoint.sh'],
     command = ['webserver'],
-    health_check = None
+    health_check = None,
+    logging = SERVICE_LOGGING_CONFIG
 )
 
 FLOWER_CONFIG = ContainerConfig(
@@ -59,7 +445,8 @@ FLOWER_CONFIG = ContainerConfig(
     container_port = 5555,
     entry_point = ['/default_entrypoint.sh'],
     command = ['celery', 'flower'],
-    health_check = None
+    health_check = None,
+    logging = SERVICE_LOGGING_CONFIG
 )
 
 # Worker Task, Container and Autoscaling Configs
@@ -73,7 +460,29 @@ WORKER_CONFIG = ContainerConfig(
     container_port = 8793,
     entry_point = ['/default_entrypoint.sh'],
     command = ['celery', 'worker'],
-    health_check = None
+    health_check = None,
+    logging = SERVICE_LOGGING_CONFIG
+)
+
+# Consider the resources you expect tasks to need and the WORKER_TASK_CONFIG size.  If you
+#   set autoscaling to a high number, you may need to adjust AIRFLOW__CORE__PARALLELISM.
+#   Compare settings with the fairflow_ext.celery_load_test DAG (see README -> Worker Construct)
+CELERY_WORKER_CONFIG = CeleryWorkerConfig(
+    concurrency = 4,
+    prefetch_multiplier = 1,
+    acks_late = True,
+    pool = 'prefork',
+    max_tasks_per_child = 100
+)
+
+WORKER_LIFECYCLE_CONFIG = WorkerLifecycleConfig(
+    stop_timeout_seconds = 120,
+    scale_in_protection = True,
+    protection_expires_in_minutes = 60,
+    protection_poll_seconds = 10,
+    min_healthy_percent = 100,
+    max_healthy_percent = 200,
+    circuit_breaker_rollback = True
 )
 
 WORKER_AUTOSCALING_CONFIG = AutoScalingConfig(
@@ -100,7 +509,14 @@ REDIS_CONFIG = ContainerConfig(
                     timeout = cdk.Duration.seconds(30),
                     retries = 5,
                     start_period = cdk.Duration.seconds(30)
-                )
+                ),
+    logging = SERVICE_LOGGING_CONFIG
+)
+
+REDIS_BROKER_CONFIG = RedisBrokerConfig(
+    node_type = 'cache.t3.micro',
+    task = REDIS_TASK_CONFIG,
+    maxmemory_mib = 768
 )
 
 # Scheduler Task and Container configs
@@ -120,18 +536,240 @@ SCHEDULER_CONFIG = ContainerConfig(
                     timeout = cdk.Duration.seconds(10),
                     retries = 5,
                     start_period = cdk.Duration.seconds(30),
-                )
+                ),
+    logging = SERVICE_LOGGING_CONFIG
+)
+
+# py-spy profiling of the Scheduler(s) and Worker(s), see README -> Scheduler Construct
+PROFILING_CONFIG = ProfilingConfig(
+    enable_execute_command = False,
+    continuous = False,
+    continuous_rate_hz = 5,
+    continuous_window_seconds = 300
 )
 
+# StatsD -> CloudWatch sidecar added to the Webserver, Scheduler and Worker tasks
+STATSD_SIDECAR_CONFIG = ContainerConfig(
+    name = 'StatsdSidecarContainer',
+    container_port = 8125,
+    entry_point = None,
+    command = None,
+    health_check = None,
+    logging = SERVICE_LOGGING_CONFIG
+)
+
+METRICS_CONFIG = MetricsConfig(
+    namespace = 'Fairflow',
+    statsd_prefix = 'airflow',
+    # the scheduler heartbeats every 5 seconds by default
+    min_scheduler_heartbeats = 30,
+    max_scheduler_loop_duration_ms = 10000,
+    agent_image = 'public.ecr.aws/cloudwatch-agent/cloudwatch-agent:1.247350.0b251780'
+)
+
+# Airflow's metadata DB is small, hot, and takes a constant stream of short transactions
+AIRFLOW_DB_PARAMETERS = {
+    # The engine default, spelled out to tune.  The metadata tables stay in memory for a
+    #   long time (see DB_MAINTENANCE_CONFIG for keeping them small)
+    'innodb_buffer_pool_size': '{DBInstanceClassMemory*3/4}',
+    # Every Scheduler, Worker process and Webserver gunicorn worker keeps its own
+    #   SQLAlchemy pool, the memory based default runs out when Workers scale out
+    'max_connections': '1000',
+    # 1 flushes the redo log on every commit.  2 flushes once a second, so a crash of the
+    #   instance can lose the last second of commits, but the Scheduler's many small
+    #   transactions wait a lot less for the disk.  On Aurora MySQL 3 this is a cluster
+    #   parameter and also needs innodb_trx_commit_allow_data_loss = 1
+    'innodb_flush_log_at_trx_commit': '1',
+}
+
+DB_SIZING_PROFILES = {
+    # Minimum spec, fine to try things out, but runs out of CPU credits and gp2 IOPS
+    #   under sustained scheduling (micro doesn't support encryption at rest)
+    'small': DbSizingProfile(
+        engine = 'mysql',
+        instance_type = ec2.InstanceType.of(ec2.InstanceClass.BURSTABLE2,
+                                            ec2.InstanceSize.SMALL),
+        storage_type = 'gp2',
+        # 20 is minimum
+        allocated_storage_in_gb = 20
+    ),
+    # Non-burstable, with gp3's 3000 IOPS baseline from the smallest volume
+    'medium': DbSizingProfile(
+        engine = 'mysql',
+        instance_type = ec2.InstanceType.of(ec2.InstanceClass.STANDARD6_GRAVITON,
+                                            ec2.InstanceSize.LARGE),
+        storage_type = 'gp3',
+        allocated_storage_in_gb = 100,
+        parameters = AIRFLOW_DB_PARAMETERS,
+        performance_insights = True
+    ),
+    # Aurora, with a reader for the Webserver
+    'large': DbSizingProfile(
+        engine = 'aurora-mysql',
+        instance_type = ec2.InstanceType.of(ec2.InstanceClass.MEMORY6_GRAVITON,
+                                            ec2.InstanceSize.LARGE),
+        aurora_readers = 1,
+        parameters = AIRFLOW_DB_PARAMETERS,
+        performance_insights = True
+    ),
+}
+# Changing the engine replaces the database, migrate the metadata first
+DB_SIZING_PROFILE = 'small'
+
 DEFAULT_DB_CONFIG = MySQLConfig(
     instance_name = 'fargate-airflow',
     db_name = 'airflow',
     port = 3306,
     master_username = 'airflow',
-    # Micro doesn't support encryption at rest
-    instance_type = ec2.InstanceType.of(ec2.InstanceClass.BURSTABLE2,
-                                        ec2.InstanceSize.SMALL),
-    # 20 is minimum
-    allocated_storage_in_gb = 20,
-    backup_retention_in_days = cdk.Duration.days(7)
-)
\ No newline at end of file
+    backup_retention_in_days = cdk.Duration.days(7),
+    sizing = DB_SIZING_PROFILES[DB_SIZING_PROFILE]
+)
+
+DB_READ_ROUTING_CONFIG = DbReadRoutingConfig(
+    enabled = True,
+    max_lag_seconds = 5,
+    lag_check_seconds = 10
+)
+
+# DAG parsing (/shared-dags) and External Task data (/shared-volume).  Size these from
+#   the efs_benchmark_task report (see README -> External Tasks)
+SHARED_STORAGE_CONFIG = SharedStorageConfig(
+    dags = EfsConfig(),
+    # e.g. to stop heavy External Tasks from draining the DAGs burst credits
+    # external_tasks = EfsConfig(throughput_mode = 'elastic')
+    external_tasks = None
+)
+
+# External Task sizes (see ExternalDagTasks).  Like the service configs above, these
+#   can be sized from Container Insights data with helpers/rightsizing.py
+BIG_TASK_CONFIG = TaskConfig(
+    cpu = 1024,
+    memory_limit_mib = 2048
+)
+
+LITTLE_TASK_CONFIG = TaskConfig(
+    cpu = 256,
+    memory_limit_mib = 512
+)
+
+EFS_BENCHMARK_TASK_CONFIG = TaskConfig(
+    cpu = 1024,
+    memory_limit_mib = 2048
+)
+
+CLEANUP_TASK_CONFIG = TaskConfig(
+    cpu = 256,
+    memory_limit_mib = 512
+)
+
+# Airflow pools for the External Task tiers (see ExternalDagTasks), so DAGs queue their
+#   ECS Operator tasks in the Scheduler instead of failing on Fargate's vCPU quota and
+#   RunTask throttling.  e.g. 64 vCPU * 0.75 * 0.5 / 1 vCPU = 24 big tasks at a time
+EXTERNAL_TASK_CAPACITY_CONFIG = ExternalTaskCapacityConfig(
+    fargate_vcpu_quota = 64,
+    external_task_share = 0.75,
+    tier_shares = {
+        'big_task': 0.5,
+        'little_task': 0.4,
+        'efs_benchmark_task': 0.1
+    }
+)
+
+# S3 backed XComs (see airflow/fairflow_ext/xcom_s3_backend.py)
+XCOM_BACKEND_CONFIG = XComBackendConfig(
+    threshold_bytes = 64 * 1024,
+    expiration_in_days = 14
+)
+
+# Compressed, chunked S3 task logs (see airflow/fairflow_ext/s3_chunked_log_handler.py)
+TASK_LOG_CONFIG = TaskLogConfig(
+    chunk_bytes = 1024 * 1024,
+    tail_chunks = 1,
+    cache_max_mib = 256,
+    intelligent_tiering_after_days = 30,
+    expiration_in_days = None
+)
+
+# Caching Secrets Manager backend (see airflow/fairflow_ext/cached_secrets_backend.py)
+#   e.g. the connection my_db is read from the secret airflow-connections/my_db
+SECRETS_CACHE_CONFIG = SecretsCacheConfig(
+    connections_prefix = 'airflow-connections',
+    variables_prefix = 'airflow-variables',
+    ttl_seconds = 300,
+    negative_ttl_seconds = 60,
+    max_entries = 1024,
+    redis_db = None
+)
+
+# Run-scoped External Task outputs on the shared volume
+#   (/shared-volume/runs/{dag_id}/{run_id}/{task_id}) older than this are removed
+#   by the scheduled cleanup task, daily at 03:00 UTC
+EXTERNAL_OUTPUT_RETENTION_CONFIG = RetentionConfig(
+    retention_in_days = 7,
+    schedule = events.Schedule.cron(minute = '0', hour = '3')
+)
+
+# Scheduled metadata DB pruning (see airflow/fairflow_ext/db_maintenance.py), daily at
+#   04:30 UTC.  Archives go to s3://{logs bucket}/db-archive/{table}/dt={date}/
+DB_MAINTENANCE_CONFIG = DbMaintenanceConfig(
+    retention = RetentionConfig(
+        retention_in_days = 90,
+        schedule = events.Schedule.cron(minute = '30', hour = '4')
+    ),
+    batch_size = 1000,
+    batch_pause_seconds = 0.5,
+    optimize = True
+)
+
+DB_MAINTENANCE_TASK_CONFIG = TaskConfig(
+    cpu = 512,
+    memory_limit_mib = 1024
+)
+
+DB_MAINTENANCE_CONTAINER_CONFIG = ContainerConfig(
+    name = 'DbMaintenanceContainer',
+    container_port = None,
+    entry_point = ['/default_entrypoint.sh'],
+    command = ['python', '-m', 'fairflow_ext.db_maintenance',
+               '--retention-days', str(DB_MAINTENANCE_CONFIG.retention.retention_in_days),
+               '--batch-size', str(DB_MAINTENANCE_CONFIG.batch_size),
+               '--batch-pause-seconds', str(DB_MAINTENANCE_CONFIG.batch_pause_seconds)] +
+              (['--optimize'] if DB_MAINTENANCE_CONFIG.optimize else []),
+    health_check = None,
+    logging = SERVICE_LOGGING_CONFIG
+)
+
+PRESCALING_CONFIG = PreScalingConfig(
+    enabled = False,
+    schedule = events.Schedule.rate(cdk.Duration.minutes(5)),
+    horizon_minutes = 15,
+    history_runs = 5
+)
+
+PRESCALING_TASK_CONFIG = TaskConfig(
+    cpu = 256,
+    memory_limit_mib = 512
+)
+
+# The cluster, Worker service and Worker counts are appended by the PreScalerConstruct
+PRESCALING_CONTAINER_CONFIG = ContainerConfig(
+    name = 'PreScalerContainer',
+    container_port = None,
+    entry_point = ['/default_entrypoint.sh'],
+    command = ['python', '-m', 'fairflow_ext.prescaler',
+               '--horizon-minutes', str(PRESCALING_CONFIG.horizon_minutes),
+               '--history-runs', str(PRESCALING_CONFIG.history_runs),
+               '--slots-per-worker', str(CELERY_WORKER_CONFIG.concurrency)],
+    health_check = None,
+    logging = SERVICE_LOGGING_CONFIG
+)
+
+# Tenants sharing the network / data stacks, see README -> Multi-Tenancy, e.g.
+#   tenants = [TenantConfig(name = 'analytics', redis_db = 1, max_workers = 4,
+#                           parallelism = 16, external_task_vcpu_share = .5,
+#                           dag_repository = 'git@github.com:my-org/analytics-dags.git',
+#                           git_read_only_secret_arn = 'arn:aws:secretsmanager:...'), ...]
+MULTI_TENANCY_CONFIG = MultiTenancyConfig(
+    tenants = [],
+    spot_workers = False
+)
@@ -8,7 +8,10 @@ from aws_cdk import (
     aws_secretsmanager as secrets,
 )
 from jsii import Number
+from fairflow.config import TenantConfig
 from fairflow.constructs.policies import PolicyConstruct
+from fairflow.constructs.metrics_construct import MetricsConstruct
+from fairflow.constructs.logging_construct import LoggingConstruct
 
 
 @dataclass(frozen=True)
@@ -23,6 +26,8 @@ class FairflowConstructProps:
     cluster: ecs.ICluster
     highly_available: bool
     enable_autoscaling: bool
+    # One of MULTI_TENANCY_CONFIG.tenants, None for the single FairflowStack
+    tenant: TenantConfig = None
 
 
 @dataclass(frozen=True)
@@ -31,20 +36,22 @@ class FairflowChildConstructProps:
     cluster: ecs.ICluster
     env_vars: Mapping[str, str]
     secret_env_vars: Mapping[str, secrets.Secret]
-    logging: ecs.AwsLogDriver
+    logging: LoggingConstruct
     airflow_image: ecr_assets.DockerImageAsset
     shared_volume: ecs.Volume
     mounting_point: ecs.MountPoint
     policies: PolicyConstruct
+    metrics: MetricsConstruct
     highly_available: bool
     enable_autoscaling: bool
+    tenant: TenantConfig = None
 
 
 @dataclass(frozen=True)
 class RedisConstructProps:
     vpc_props: VpcProps
     cluster: ecs.ICluster
-    logging: ecs.AwsLogDriver
+    logging: LoggingConstruct
     highly_available: bool
 
 
@@ -53,6 +60,8 @@ class RedisConstructProps:
 class ContainerInfo:
     name: str
     asset_dir: str
+    # Relative to asset_dir, for images that share a build context (e.g. ./tasks/common)
+    dockerfile: str = None
 
 
 @dataclass(frozen=True)
@@ -61,6 +70,11 @@ class ExternalTaskProps:
     container_info: ContainerInfo
     cpu: Number
     memory_limit_mib: Number
-    logging: ecs.LogDriver
+    logging: LoggingConstruct
     shared_volume: ecs.Volume
-    mounting_point: ecs.MountPoint
\ No newline at end of file
+    mounting_point: ecs.MountPoint
+    # Fargate ephemeral storage (21 - 200 GiB), default is 20 GiB
+    ephemeral_storage_gib: Number = None
+    # Container path of a local scratch bind mount on the ephemeral storage,
+    #   exposed to the task as FAIRFLOW_SCRATCH_DIR
+    scratch_path: str = None
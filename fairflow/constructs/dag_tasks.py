@@ -1,23 +1,45 @@
-from typing import List
+import json
+from typing import Dict, List
 from aws_cdk import (
     core as cdk,
+    aws_ec2 as ec2,
     aws_ecs as ecs,
     aws_logs as logs,
+    aws_events as events,
+    aws_events_targets as targets,
 )
 
+from fairflow.config import (
+    BIG_TASK_CONFIG,
+    CLEANUP_TASK_CONFIG,
+    EFS_BENCHMARK_TASK_CONFIG,
+    EXTERNAL_OUTPUT_RETENTION_CONFIG,
+    EXTERNAL_TASK_CAPACITY_CONFIG,
+    LITTLE_TASK_CONFIG
+)
 from fairflow.constructs.contruct_properties import (
     ExternalTaskProps,
     ContainerInfo,
+    VpcProps,
 )
+from fairflow.constructs.logging_construct import LoggingConstruct
 from fairflow.constructs.task_construct import ExternalTaskDefinition
 
 class ExternalDagTasks(cdk.Construct):
     def __init__(self, scope: cdk.Construct, id: str,
                        shared_volume: ecs.Volume,
-                       mounting_point: ecs.MountPoint):
+                       mounting_point: ecs.MountPoint,
+                       cluster: ecs.ICluster,
+                       vpc_props: VpcProps,
+                       vcpu_share: float = 1):
         super().__init__(scope, id)
+        self.shared_volume = shared_volume
+        # This environment's share of the External Task vCPU, less than all of it for a tenant
+        self.vcpu_share = vcpu_share
+        self.mounting_point = mounting_point
 
-        self.container_logging = ecs.AwsLogDriver(
+        # Driver mode / buffering (or FireLens) from EXTERNAL_TASK_LOGGING_CONFIG
+        self.container_logging = LoggingConstruct(self, 'FairflowExternalTaskLogging',
             stream_prefix = 'FairflowExternalTask',
             log_group = logs.LogGroup(self, 'FairflowExternalTaskLogs',
                 log_group_name = f'FairflowExternalTaskLogs-{cdk.Stack.of(self).stack_name}',
@@ -30,19 +52,26 @@ class ExternalDagTasks(cdk.Construct):
         #   use the  ECSOperator and some environment variables we passed to Airflow about what
         #   cluster, security group, and (private) subnets to launch these tasks in
 
+        # All task images are built from ./tasks so they can share ./tasks/common
+        #   (e.g. the run-scoped output helpers in fairflow_io.py)
+
         # Task with more resources allocated
         self.big_task = ExternalTaskDefinition(self, 'FairflowBigTask',
             ExternalTaskProps(
                 container_info = ContainerInfo(
-                    asset_dir = './tasks/big_task',
+                    asset_dir = './tasks',
+                    dockerfile = 'big_task/Dockerfile',
                     name = 'BigTaskContainer'
                 ),
-                cpu = 1024,
-                memory_limit_mib = 2048,
+                cpu = BIG_TASK_CONFIG.cpu,
+                memory_limit_mib = BIG_TASK_CONFIG.memory_limit_mib,
                 task_family_name = f'BigGuys-{cdk.Stack.of(self).stack_name}',
                 logging = self.container_logging,
                 shared_volume = shared_volume,
-                mounting_point = mounting_point
+                mounting_point = mounting_point,
+                # Local scratch for intermediate data, only final outputs go to EFS
+                ephemeral_storage_gib = 50,
+                scratch_path = '/scratch'
             )
         )
 
@@ -50,11 +79,12 @@ class ExternalDagTasks(cdk.Construct):
         self.little_task = ExternalTaskDefinition(self, 'FairflowLittleTask',
             ExternalTaskProps(
                 container_info = ContainerInfo(
-                    asset_dir = './tasks/little_task',
+                    asset_dir = './tasks',
+                    dockerfile = 'little_task/Dockerfile',
                     name = f'LittleTaskContainer'
                 ),
-                cpu = 256,
-                memory_limit_mib = 512,
+                cpu = LITTLE_TASK_CONFIG.cpu,
+                memory_limit_mib = LITTLE_TASK_CONFIG.memory_limit_mib,
                 task_family_name = f'LittleGuys-{cdk.Stack.of(self).stack_name}',
                 logging = self.container_logging,
                 shared_volume = shared_volume,
@@ -62,10 +92,104 @@ class ExternalDagTasks(cdk.Construct):
             )
         )
 
+        # Measures sequential / random throughput and metadata ops on the External Task
+        #   mount, to size SHARED_STORAGE_CONFIG in the config from real numbers
+        self.efs_benchmark_task = ExternalTaskDefinition(self, 'FairflowEfsBenchmarkTask',
+            ExternalTaskProps(
+                container_info = ContainerInfo(
+                    asset_dir = './tasks',
+                    dockerfile = 'efs_benchmark_task/Dockerfile',
+                    name = 'EfsBenchmarkTaskContainer'
+                ),
+                cpu = EFS_BENCHMARK_TASK_CONFIG.cpu,
+                memory_limit_mib = EFS_BENCHMARK_TASK_CONFIG.memory_limit_mib,
+                task_family_name = f'EfsBenchmark-{cdk.Stack.of(self).stack_name}',
+                logging = self.container_logging,
+                shared_volume = shared_volume,
+                mounting_point = mounting_point
+            )
+        )
+
+        # Removes expired run directories from the shared volume.  This one isn't launched
+        #   by a DAG, it runs on a schedule straight from EventBridge
+        self.cleanup_task = ExternalTaskDefinition(self, 'FairflowCleanupTask',
+            ExternalTaskProps(
+                container_info = ContainerInfo(
+                    asset_dir = './tasks',
+                    dockerfile = 'cleanup_task/Dockerfile',
+                    name = 'CleanupTaskContainer'
+                ),
+                cpu = CLEANUP_TASK_CONFIG.cpu,
+                memory_limit_mib = CLEANUP_TASK_CONFIG.memory_limit_mib,
+                task_family_name = f'Cleanup-{cdk.Stack.of(self).stack_name}',
+                logging = self.container_logging,
+                shared_volume = shared_volume,
+                mounting_point = mounting_point
+            )
+        )
+        self.schedule_cleanup(cluster, vpc_props)
+
+        # One Airflow pool per tier launched from DAGs, sized to its share of the Fargate
+        #   vCPU quota.  Created / updated by the Webserver at startup
+        #   (see airflow/fairflow_ext/external_tasks.py)
+        self.pools: Dict[str, dict] = {}
+        self.add_pool('big_task', self.big_task, BIG_TASK_CONFIG.cpu)
+        self.add_pool('little_task', self.little_task, LITTLE_TASK_CONFIG.cpu)
+        self.add_pool('efs_benchmark_task', self.efs_benchmark_task, EFS_BENCHMARK_TASK_CONFIG.cpu)
+
+        # The container FairflowECSOperator passes the task instance's AIRFLOW_CTX_* to, by
+        #   family, when the DAG doesn't override any (see airflow/fairflow_ext/external_tasks.py)
+        self.containers = {task.worker_task.family: task.container.container_name
+                           for task in [self.big_task, self.little_task, self.efs_benchmark_task]}
+
+        self.env_vars = {
+            'FAIRFLOW_EXTERNAL_TASK_POOLS': json.dumps(self.pools),
+            'FAIRFLOW_EXTERNAL_TASK_CONTAINERS': json.dumps(self.containers),
+            'FAIRFLOW_ECS_LAUNCH_ATTEMPTS': str(EXTERNAL_TASK_CAPACITY_CONFIG.launch_attempts),
+            'FAIRFLOW_ECS_BACKOFF_BASE_SECONDS': str(EXTERNAL_TASK_CAPACITY_CONFIG.backoff_base_seconds),
+            'FAIRFLOW_ECS_BACKOFF_MAX_SECONDS': str(EXTERNAL_TASK_CAPACITY_CONFIG.backoff_max_seconds)
+        }
+
+
+    def add_pool(self, tier: str, task: ExternalTaskDefinition, cpu: int) -> None:
+        share = EXTERNAL_TASK_CAPACITY_CONFIG.tier_shares.get(tier)
+        if share is None:
+            return
+        vcpu = EXTERNAL_TASK_CAPACITY_CONFIG.fargate_vcpu_quota \
+               * EXTERNAL_TASK_CAPACITY_CONFIG.external_task_share * self.vcpu_share * share
+        # Keyed by the family, which is what the DAGs pass as the task_definition
+        self.pools[task.worker_task.family] = {
+            'pool': f'fairflow_{tier}',
+            'slots': max(1, int(vcpu // (cpu / 1024))),
+            'description': f'{tier} External Tasks, {vcpu:g} vCPU of the Fargate quota'
+        }
+
+
+    def schedule_cleanup(self, cluster: ecs.ICluster, vpc_props: VpcProps) -> None:
+        events.Rule(self, 'FairflowCleanupSchedule',
+            description = 'Remove expired External Task outputs from the shared volume',
+            schedule = EXTERNAL_OUTPUT_RETENTION_CONFIG.schedule,
+            targets = [targets.EcsTask(
+                cluster = cluster,
+                task_definition = self.cleanup_task.worker_task,
+                platform_version = ecs.FargatePlatformVersion.VERSION1_4,
+                security_groups = [vpc_props.default_vpc_security_group],
+                subnet_selection = ec2.SubnetSelection(subnets = vpc_props.vpc.private_subnets),
+                container_overrides = [targets.ContainerOverride(
+                    container_name = self.cleanup_task.container.container_name,
+                    environment = [targets.TaskEnvironmentVariable(
+                        name = 'RETENTION_DAYS',
+                        value = str(EXTERNAL_OUTPUT_RETENTION_CONFIG.retention_in_days)
+                    )]
+                )]
+            )]
+        )
+
 
     def get_external_task_arns(self) -> List[str]:
         external_task_arns: List[str] = []
-        for task in [self.big_task, self.little_task]:
+        for task in [self.big_task, self.little_task,
+                     self.efs_benchmark_task, self.cleanup_task]:
             external_task_arns.append(task.worker_task.task_definition_arn)
 
-        return external_task_arns
\ No newline at end of file
+        return external_task_arns
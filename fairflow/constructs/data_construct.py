@@ -0,0 +1,102 @@
+from aws_cdk import (
+    core as cdk,
+    aws_s3 as s3,
+    aws_logs as logs
+)
+from fairflow.config import (
+    TASK_LOG_CONFIG,
+    XCOM_BACKEND_CONFIG
+)
+from fairflow.constructs.efs_construct import EfsConstruct
+from fairflow.constructs.rds_construct import RDSConstruct
+from fairflow.constructs.secrets_construct import SecretsConstruct
+from fairflow.constructs.redis_construct import RedisConstruct
+from fairflow.constructs.logging_construct import LoggingConstruct
+
+from fairflow.constructs.contruct_properties import (
+    FairflowConstructProps,
+    RedisConstructProps
+)
+
+class FairflowDataConstruct(cdk.Construct):
+    """
+    The stateful resources Airflow runs against: the S3 buckets, EFS, the metadata DB,
+    Redis and the imported secrets.  They live in their own stack, so the compute stack
+    can be redeployed (or torn down) without touching them
+    """
+
+    def __init__(self, scope: cdk.Construct, id: str, props: FairflowConstructProps):
+        super().__init__(scope, id)
+
+        # Used for Airflow Worker logs
+        #   see: https://airflow.apache.org/docs/apache-airflow/stable/production-deployment.html#logging
+        self.s3_logs_bucket = s3.Bucket(self, 'FairflowWorkerLogsS3Bucket',
+            # comment these two lines out and uncomment retain if you want to
+            #   retain the worker logs
+            auto_delete_objects = True,
+            removal_policy = cdk.RemovalPolicy.DESTROY,
+            # removal_policy = cdk.RemovalPolicy.RETAIN
+            # Task logs are rarely read after the first few days.  Intelligent-Tiering
+            #   rather than IA / Glacier, so old logs still open instantly in the UI
+            #   see: https://docs.aws.amazon.com/AmazonS3/latest/userguide/intelligent-tiering-overview.html
+            lifecycle_rules = [s3.LifecycleRule(
+                prefix = 'logs/',
+                transitions = [s3.Transition(
+                    storage_class = s3.StorageClass.INTELLIGENT_TIERING,
+                    transition_after = cdk.Duration.days(TASK_LOG_CONFIG.intelligent_tiering_after_days)
+                )],
+                expiration = cdk.Duration.days(TASK_LOG_CONFIG.expiration_in_days)
+                    if TASK_LOG_CONFIG.expiration_in_days else None
+            )]
+        )
+        cdk.CfnOutput(self, 'FairflowWorkerLogsS3BucketName',
+            value = self.s3_logs_bucket.bucket_name,
+            description = "S3 Bucket where Worker execution logs will go"
+        )
+
+        # Large XCom values (e.g. DataFrames) are offloaded here instead of bloating the
+        #   xcom table in the metadata DB, see airflow/fairflow_ext/xcom_s3_backend.py
+        self.s3_xcom_bucket = s3.Bucket(self, 'FairflowXComS3Bucket',
+            auto_delete_objects = True,
+            removal_policy = cdk.RemovalPolicy.DESTROY,
+            lifecycle_rules = [s3.LifecycleRule(
+                expiration = cdk.Duration.days(XCOM_BACKEND_CONFIG.expiration_in_days)
+            )]
+        )
+        cdk.CfnOutput(self, 'FairflowXComS3BucketName',
+            value = self.s3_xcom_bucket.bucket_name,
+            description = "S3 Bucket where large XCom values will go"
+        )
+
+        # Create a shared EFS (so Webserver, Scheduler and Worker are looking at synchronized DAGs)
+        #       see: https://airflow.apache.org/docs/apache-airflow/stable/production-deployment.html#multi-node-cluster
+        #            about synchronizing DAGs
+        self.efs_construct = EfsConstruct(self, 'FairflowEFSConstruct', vpc_props = props.vpc_props)
+        # Create the airflow meta database (or cluster if highly available)
+        #       see: https://airflow.apache.org/docs/apache-airflow/stable/concepts/scheduler.html#database-requirements
+        #            about High Availability requirements
+        self.rds_construct = RDSConstruct(self, 'FairflowRdsMySQL8',
+            vpc_props = props.vpc_props,
+            highly_available = props.highly_available
+        )
+        # Manually created secrets
+        #       see: https://docs.aws.amazon.com/cdk/api/latest/docs/aws-secretsmanager-readme.html
+        #            about why we need to manually create some secrets outside CDK and import them
+        self.secrets_construct = SecretsConstruct(self, 'SecretsConstruct')
+
+        # Cloudwatch logging driver for the Redis container, when it runs on Fargate
+        cloudwatch_logging = LoggingConstruct(self, 'FairflowContainerLogging',
+            stream_prefix = 'Fairflow',
+            log_retention =  logs.RetentionDays.ONE_MONTH
+        )
+
+        # Redis (Job Queue Broker).  We'll either use a Fargate service or AWS Elasticache
+        #   depending on the highly available flag
+        self.redis_construct = RedisConstruct(self, 'RedisConstruct',
+                RedisConstructProps(
+                    vpc_props = props.vpc_props,
+                    cluster = props.cluster,
+                    logging = cloudwatch_logging,
+                    highly_available = props.highly_available
+                )
+            )
@@ -0,0 +1,51 @@
+from aws_cdk import (
+    core as cdk,
+    aws_ec2 as ec2,
+    aws_ecs as ecs,
+    aws_events as events,
+    aws_events_targets as targets,
+)
+
+from fairflow.constructs.contruct_properties import FairflowChildConstructProps
+from fairflow.config import (
+    DB_MAINTENANCE_CONFIG,
+    DB_MAINTENANCE_CONTAINER_CONFIG,
+    DB_MAINTENANCE_TASK_CONFIG
+)
+
+class DbMaintenanceConstruct(cdk.Construct):
+    def __init__(self, scope: cdk.Construct, id: str, props: FairflowChildConstructProps):
+        super().__init__(scope, id)
+
+        # Nothing else ever prunes the metadata DB (task_instance, dag_run, log, xcom, job,
+        #   celery_taskmeta ...), and the Scheduler / UI queries slow down as they grow.
+        #   Runs fairflow_ext.db_maintenance from the Airflow image, off-peak
+        self.maintenance_task = ecs.FargateTaskDefinition(self, 'DbMaintenanceTask',
+            cpu = DB_MAINTENANCE_TASK_CONFIG.cpu,
+            memory_limit_mib = DB_MAINTENANCE_TASK_CONFIG.memory_limit_mib,
+            family = f'FairflowDbMaintenance-{cdk.Stack.of(self).stack_name}'
+        )
+        # RDS secret and (archive) logs bucket access
+        props.policies.attach_policies(self.maintenance_task.task_role)
+
+        self.maintenance_task.add_container(DB_MAINTENANCE_CONTAINER_CONFIG.name,
+            container_name = DB_MAINTENANCE_CONTAINER_CONFIG.name,
+            image = ecs.ContainerImage.from_docker_image_asset(props.airflow_image),
+            logging = props.logging.driver(self.maintenance_task, DB_MAINTENANCE_CONTAINER_CONFIG.logging),
+            environment = props.env_vars,
+            secrets = props.secret_env_vars,
+            entry_point = DB_MAINTENANCE_CONTAINER_CONFIG.entry_point,
+            command = DB_MAINTENANCE_CONTAINER_CONFIG.command
+        )
+
+        self.schedule = events.Rule(self, 'DbMaintenanceSchedule',
+            description = 'Archive and prune old rows from the Airflow metadata DB',
+            schedule = DB_MAINTENANCE_CONFIG.retention.schedule,
+            targets = [targets.EcsTask(
+                cluster = props.cluster,
+                task_definition = self.maintenance_task,
+                platform_version = ecs.FargatePlatformVersion.VERSION1_4,
+                security_groups = [props.vpc_props.default_vpc_security_group],
+                subnet_selection = ec2.SubnetSelection(subnets = props.vpc_props.vpc.private_subnets)
+            )]
+        )
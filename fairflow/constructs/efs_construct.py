@@ -1,99 +1,154 @@
+from typing import Tuple
+
 from aws_cdk import (
     core as cdk,
     aws_efs as efs,
     aws_ecs as ecs
 )
+from fairflow.config import (
+    EfsConfig,
+    SHARED_STORAGE_CONFIG
+)
 from fairflow.constructs.contruct_properties import VpcProps
 
 class EfsConstruct(cdk.Construct):
     def __init__(self, scope: cdk.Construct, id: str, vpc_props: VpcProps):
         super().__init__(scope, id)
 
-        shared_fs = efs.FileSystem(self, 'SharedEFS',
-            vpc = vpc_props.vpc,
-            security_group = vpc_props.default_vpc_security_group,
-            removal_policy = cdk.RemovalPolicy.DESTROY
-        )
-        shared_fs.connections.allow_default_port_from(
-            other = vpc_props.default_vpc_security_group,
-            description = 'EFS Ingress'
-        )
+        shared_fs = self.create_file_system('SharedEFS', vpc_props, SHARED_STORAGE_CONFIG.dags)
         self.file_system_arn = shared_fs.file_system_arn
         cdk.CfnOutput(self, 'EfsFileSystemArn',
             value = shared_fs.file_system_arn,
             description = 'Shared EFS ARN'
         )
 
+        # Optionally put the External Task data on its own file system, so a heavy
+        #   External Task can't use up the burst credits / throughput DAG parsing needs
+        if SHARED_STORAGE_CONFIG.external_tasks:
+            external_task_fs = self.create_file_system('ExternalTaskEFS', vpc_props,
+                                                       SHARED_STORAGE_CONFIG.external_tasks)
+            cdk.CfnOutput(self, 'EfsExternalFileSystemId',
+                value = external_task_fs.file_system_id,
+                description = "External Task EFS File System ID"
+            )
+        else:
+            external_task_fs = shared_fs
+        self.external_task_file_system_arn = external_task_fs.file_system_arn
+
+        self.shared_fs = shared_fs
+        self.external_task_fs = external_task_fs
+
         # See README -> EFS Construct for more details about this
-        access_point = shared_fs.add_access_point('DagsAccessPoint',
+        access_point = self.dags_access_point(shared_fs, '/fairflow')
+        external_task_access_point = self.external_task_access_point(external_task_fs, '/fairflow-external')
+        self.shared_volume = self.volume('fairflow', shared_fs, access_point)
+        self.shared_external_task_volume = self.volume('fairflow-external', external_task_fs,
+                                                       external_task_access_point)
+
+        self.mounting_point = ecs.MountPoint(
+            container_path = '/shared-dags',
+            read_only = False,
+            source_volume = self.shared_volume.name
+        )
+
+        self.external_task_mounting_point = ecs.MountPoint(
+            container_path = '/shared-volume',
+            read_only = False,
+            source_volume = self.shared_external_task_volume.name
+        )
+
+        cdk.CfnOutput(self, 'EfsFileSystemId',
+            value = shared_fs.file_system_id,
+            description = "EFS File System ID"
+        )
+        cdk.CfnOutput(self, 'EfsAccessPointId',
+            value = access_point.access_point_id,
+            description = "EFS Access Point ID"
+        )
+        cdk.CfnOutput(self, 'EfsExternalAccessPointId',
+            value = external_task_access_point.access_point_id,
+            description = "EFS Access Point ID"
+        )
+
+
+    def tenant_volumes(self, scope: cdk.Construct, tenant: str) -> Tuple[ecs.Volume, ecs.Volume]:
+        """
+        The shared and External Task volumes of a tenant, on access points of its own
+        (created in scope, its compute stack) so it only sees its own DAGs and outputs.
+        Their names, and so the mounting points, are the same as the default ones
+        """
+        return (
+            self.volume('fairflow', self.shared_fs,
+                        self.dags_access_point(scope, f'/fairflow-{tenant}')),
+            self.volume('fairflow-external', self.external_task_fs,
+                        self.external_task_access_point(scope, f'/fairflow-external-{tenant}'))
+        )
+
+
+    def dags_access_point(self, scope: cdk.Construct, path: str) -> efs.AccessPoint:
+        return efs.AccessPoint(scope, 'DagsAccessPoint',
+            file_system = self.shared_fs,
             create_acl = efs.Acl(
                 owner_gid = '0',
                 owner_uid = '50000',
                 permissions = '755'
             ),
-            path = "/fairflow",
+            path = path,
             posix_user = efs.PosixUser(
                 gid = '0',
                 uid = '50000'
             )
         )
 
+
+    def external_task_access_point(self, scope: cdk.Construct, path: str) -> efs.AccessPoint:
         # The Docker assets under the ./tasks folder are defaulting to the
         #   normal root user uid=0, gid=0, and they also have no need for the
         #   DAG definitions because they are self-contained Docker images,
         #   so I'm configuring another access point
-        external_task_access_point = shared_fs.add_access_point('ExternalTaskAccessPoint',
+        return efs.AccessPoint(scope, 'ExternalTaskAccessPoint',
+            file_system = self.external_task_fs,
             create_acl = efs.Acl(
                 owner_gid = '0',
                 owner_uid = '0',
                 permissions = '755'
             ),
-            path = "/fairflow-external",
+            path = path
         )
 
-        self.shared_volume = ecs.Volume(
-            name = 'fairflow',
-            efs_volume_configuration = ecs.EfsVolumeConfiguration(
-                file_system_id = shared_fs.file_system_id,
-                authorization_config = ecs.AuthorizationConfig(
-                    access_point_id = access_point.access_point_id,
-                ),
-                transit_encryption = 'ENABLED'
-            )
-        )
 
-        self.shared_external_task_volume = ecs.Volume(
-            name = 'fairflow-external',
+    def volume(self, name: str, file_system: efs.IFileSystem, access_point: efs.IAccessPoint) -> ecs.Volume:
+        return ecs.Volume(
+            name = name,
             efs_volume_configuration = ecs.EfsVolumeConfiguration(
-                file_system_id = shared_fs.file_system_id,
+                file_system_id = file_system.file_system_id,
                 authorization_config = ecs.AuthorizationConfig(
-                    access_point_id = external_task_access_point.access_point_id,
+                    access_point_id = access_point.access_point_id,
                 ),
                 transit_encryption = 'ENABLED'
             )
         )
 
-        self.mounting_point = ecs.MountPoint(
-            container_path = '/shared-dags',
-            read_only = False,
-            source_volume = self.shared_volume.name
-        )
 
-        self.external_task_mounting_point = ecs.MountPoint(
-            container_path = '/shared-volume',
-            read_only = False,
-            source_volume = self.shared_external_task_volume.name
+    def create_file_system(self, id: str, vpc_props: VpcProps, config: EfsConfig) -> efs.FileSystem:
+        file_system = efs.FileSystem(self, id,
+            vpc = vpc_props.vpc,
+            security_group = vpc_props.default_vpc_security_group,
+            removal_policy = cdk.RemovalPolicy.DESTROY,
+            performance_mode = config.performance_mode,
+            throughput_mode = efs.ThroughputMode.PROVISIONED \
+                if config.throughput_mode == 'provisioned' else efs.ThroughputMode.BURSTING,
+            provisioned_throughput_per_second = cdk.Size.mebibytes(
+                config.provisioned_throughput_mib_per_second) \
+                if config.throughput_mode == 'provisioned' else None
         )
+        # Elastic throughput isn't in this CDK version's ThroughputMode enum yet
+        #   see: https://docs.aws.amazon.com/efs/latest/ug/performance.html#elastic
+        if config.throughput_mode == 'elastic':
+            file_system.node.default_child.add_property_override('ThroughputMode', 'elastic')
 
-        cdk.CfnOutput(self, 'EfsFileSystemId',
-            value = shared_fs.file_system_id,
-            description = "EFS File System ID"
-        )
-        cdk.CfnOutput(self, 'EfsAccessPointId',
-            value = access_point.access_point_id,
-            description = "EFS Access Point ID"
+        file_system.connections.allow_default_port_from(
+            other = vpc_props.default_vpc_security_group,
+            description = 'EFS Ingress'
         )
-        cdk.CfnOutput(self, 'EfsExternalAccessPointId',
-            value = external_task_access_point.access_point_id,
-            description = "EFS Access Point ID"
-        )
\ No newline at end of file
+        return file_system
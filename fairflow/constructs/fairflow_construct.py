@@ -1,77 +1,84 @@
 import os
+import json
 from aws_cdk import (
     core as cdk,
-    aws_ecs as ecs,
-    aws_s3 as s3,
-    aws_logs as logs,
-    aws_ecr_assets as ecr_assets
+    aws_logs as logs
 )
-from fairflow.constructs.efs_construct import EfsConstruct
-from fairflow.constructs.rds_construct import RDSConstruct
-from fairflow.constructs.secrets_construct import SecretsConstruct
-from fairflow.constructs.redis_construct import RedisConstruct
+from fairflow.config import (
+    DB_READ_ROUTING_CONFIG,
+    LAZY_LOADING_CONFIG,
+    METRICS_CONFIG,
+    PRESCALING_CONFIG,
+    SECRETS_CACHE_CONFIG,
+    TASK_LOG_CONFIG,
+    WORKER_AUTOSCALING_CONFIG,
+    XCOM_BACKEND_CONFIG
+)
+from fairflow.constructs.data_construct import FairflowDataConstruct
 from fairflow.constructs.dag_tasks import ExternalDagTasks
 from fairflow.constructs.policies import PolicyConstruct
+from fairflow.constructs.metrics_construct import MetricsConstruct
+from fairflow.constructs.logging_construct import LoggingConstruct
+from fairflow.constructs.lazy_loading import mark_for_soci_index
+from fairflow.constructs.image_assets import docker_image_asset
 from fairflow.constructs.webserver_construct import WebserverConstruct
 from fairflow.constructs.worker_construct import WorkerConstruct
 from fairflow.constructs.scheduler_construct import SchedulerConstruct
+from fairflow.constructs.db_maintenance_construct import DbMaintenanceConstruct
+from fairflow.constructs.prescaler_construct import PreScalerConstruct
 
 from fairflow.constructs.contruct_properties import (
     FairflowConstructProps,
-    FairflowChildConstructProps,
-    RedisConstructProps
+    FairflowChildConstructProps
 )
 
 class FairflowConstruct(cdk.Construct):
-    def __init__(self, scope: cdk.Construct, id: str, props: FairflowConstructProps):
+    def __init__(self, scope: cdk.Construct, id: str, props: FairflowConstructProps,
+                       data: FairflowDataConstruct):
         super().__init__(scope, id)
 
-        # Used for Airflow Worker logs
-        #   see: https://airflow.apache.org/docs/apache-airflow/stable/production-deployment.html#logging
-        s3_logs_bucket = s3.Bucket(self, 'FairflowWorkerLogsS3Bucket',
-            # comment these two lines out and uncomment retain if you want to
-            #   retain the worker logs
-            auto_delete_objects = True,
-            removal_policy = cdk.RemovalPolicy.DESTROY,
-            # removal_policy = cdk.RemovalPolicy.RETAIN
-        )
-        cdk.CfnOutput(self, 'FairflowWorkerLogsS3BucketName',
-            value = s3_logs_bucket.bucket_name,
-            description = "S3 Bucket where Worker execution logs will go"
-        )
+        # S3 buckets, EFS, the metadata DB, Redis and secrets, from the data stack
+        s3_logs_bucket = data.s3_logs_bucket
+        s3_xcom_bucket = data.s3_xcom_bucket
+        efs_construct = data.efs_construct
+        rds_construct = data.rds_construct
+        secrets_construct = data.secrets_construct
+        redis_construct = data.redis_construct
 
-        # Create a shared EFS (so Webserver, Scheduler and Worker are looking at synchronized DAGs)
-        #       see: https://airflow.apache.org/docs/apache-airflow/stable/production-deployment.html#multi-node-cluster
-        #            about synchronizing DAGs
-        efs_construct = EfsConstruct(self, 'FairflowEFSConstruct', vpc_props = props.vpc_props)
-        # Create the airflow meta database (or cluster if highly available)
-        #       see: https://airflow.apache.org/docs/apache-airflow/stable/concepts/scheduler.html#database-requirements
-        #            about High Availability requirements
-        rds_construct = RDSConstruct(self, 'FairflowRdsMySQL8',
-            vpc_props = props.vpc_props,
-            highly_available = props.highly_available
-        )
-        # Manually created secrets
-        #       see: https://docs.aws.amazon.com/cdk/api/latest/docs/aws-secretsmanager-readme.html
-        #            about why we need to manually create some secrets outside CDK and import them
-        secrets_construct = SecretsConstruct(self, 'SecretsConstruct')
+        # A tenant shares those with the other tenants, with its own database, Redis DB,
+        #   EFS access points, key prefixes and budget (see MULTI_TENANCY_CONFIG)
+        tenant = props.tenant
+        if tenant:
+            shared_volume, external_task_volume = efs_construct.tenant_volumes(self, tenant.name)
+        else:
+            shared_volume = efs_construct.shared_volume
+            external_task_volume = efs_construct.shared_external_task_volume
+        secrets_prefix = f'{tenant.name}/' if tenant else ''
 
         # Cloudwatch logging driver for the containers (separate from s3 logging for Worker logs)
-        cloudwatch_logging = ecs.AwsLogDriver(
+        #   each container's driver mode / buffering comes from its ContainerConfig.logging
+        cloudwatch_logging = LoggingConstruct(self, 'FairflowContainerLogging',
             stream_prefix = 'Fairflow',
             log_retention =  logs.RetentionDays.ONE_MONTH
         )
 
-        # Redis (Job Queue Broker).  We'll either use a Fargate service or AWS Elasticache
-        #   depending on the highly available flag
-        redis_construct = RedisConstruct(self, 'RedisConstruct',
-                RedisConstructProps(
-                    vpc_props = props.vpc_props,
-                    cluster = props.cluster,
-                    logging = cloudwatch_logging,
-                    highly_available = props.highly_available
-                )
-            )
+        # StatsD sidecars, CloudWatch dashboard and alarms for the Airflow services
+        metrics_construct = MetricsConstruct(self, 'FairflowMetrics',
+            namespace = f'{METRICS_CONFIG.namespace}/{tenant.name}' if tenant else METRICS_CONFIG.namespace
+        )
+
+        # Create Task Definitions for on-demand Fargate tasks, invoked via ECS Operators
+        external_dag_tasks = ExternalDagTasks(self, 'ExternalDagTasksConstruct',
+            shared_volume = external_task_volume,
+            mounting_point = efs_construct.external_task_mounting_point,
+            cluster = props.cluster,
+            vpc_props = props.vpc_props,
+            vcpu_share = tenant.external_task_vcpu_share if tenant else 1
+        )
+
+        # A tenant's own DAGs, or the environment's repository
+        dag_repository = tenant.dag_repository if tenant else os.getenv('DAG_REPOSITORY')
+        git_secret_arn = tenant.git_read_only_secret_arn if tenant else os.getenv('GIT_READ_ONLY_SECRET_ARN')
 
         # see: https://airflow.apache.org/docs/apache-airflow/stable/configurations-ref.html
         #   we only need to worry about env vars we want to explictily override from the defaults
@@ -84,7 +91,7 @@ class FairflowConstruct(cdk.Construct):
             #  This will likely need to be adjusted for specific use cases
             #  e.g. if we can autoscale to 4 workers and each worker can have 4 tasks max, then 16 is good
             #       if we are using a small worker and farming tasks externally via ECS Operator, it could be much higher
-            'AIRFLOW__CORE__PARALLELISM': '16',
+            'AIRFLOW__CORE__PARALLELISM': str(tenant.parallelism) if tenant else '16',
             #  Overridable in DAGs.  Max tasks allowed to run concurrently within a DAG
             'AIRFLOW__CORE__DAG_CONCURRENCY': '4',
             #  Overridable in DAGs.  Can multiple of a DAG run at the same time
@@ -95,22 +102,42 @@ class FairflowConstruct(cdk.Construct):
             'AIRFLOW__CORE__LOAD_EXAMPLES': 'true',
             # 'AIRFLOW__CELERY__BROKER_URL': 'sqs://',
             # 'AIRFLOW__CELERY__BROKER_URL': f'redis://:@{redis_construct.redis_host}:6379/0',
-            'AIRFLOW__CELERY__BROKER_URL': f'redis://:@{redis_construct.redis_host}:6379/0',
+            'AIRFLOW__CELERY__BROKER_URL': f'redis://:@{redis_construct.redis_host}:6379/{tenant.redis_db if tenant else 0}',
 
             # 'AIRFLOW__CELERY__RESULT_BACKEND': '',  # Set in webserver_entry.sh
             # This should be set to the longest expected SLA of all DAGs
             'AIRFLOW__CELERY_BROKER_TRANSPORT_OPTIONS__VISIBILITY_TIMEOUT': '1800',
-            # Consider the resources you expect tasks to need, the sizing of the Fargate tasks
-            #   in the configs.  If you set autoscaling to a high number, you may need to adjust
-            #   the PARALLELISM number above
-            'AIRFLOW__CELERY__WORKER_CONCURRENCY': '4',
+            # AIRFLOW__CELERY__WORKER_CONCURRENCY etc... come from CELERY_WORKER_CONFIG,
+            #   set in the WorkerConstruct
             'AIRFLOW__LOGGING__REMOTE_LOGGING': 'true',
-            'AIRFLOW__LOGGING__REMOTE_BASE_LOG_FOLDER': f's3://{s3_logs_bucket.bucket_name}/logs',
+            'AIRFLOW__LOGGING__REMOTE_BASE_LOG_FOLDER': f's3://{s3_logs_bucket.bucket_name}/logs' +
+                                                        (f'/{tenant.name}' if tenant else ''),
             'AIRFLOW__LOGGING__REMOTE_LOG_CONN_ID': 'aws_default',
+            # Gzipped, chunked task logs with a tail / range read log view
+            #   see: airflow/fairflow_ext/s3_chunked_log_handler.py
+            'AIRFLOW__LOGGING__LOGGING_CONFIG_CLASS': 'fairflow_ext.log_config.LOGGING_CONFIG',
+            'FAIRFLOW_LOG_CHUNK_BYTES': str(TASK_LOG_CONFIG.chunk_bytes),
+            'FAIRFLOW_LOG_TAIL_CHUNKS': str(TASK_LOG_CONFIG.tail_chunks),
+            'FAIRFLOW_LOG_CACHE_MAX_BYTES': str(TASK_LOG_CONFIG.cache_max_mib * 1024 * 1024),
+            # Also where fairflow_ext.profiling uploads py-spy profiles
+            'FAIRFLOW_LOGS_BUCKET': s3_logs_bucket.bucket_name,
             'AIRFLOW__LOGGING__ENCRYPT_S3_LOGS': 'false',
             'AIRFLOW__API__AUTH_BACKEND': 'airflow.api.auth.backend.basic_auth',
             'AIRFLOW__SCHEDULER__CATCHUP_BY_DEFAULT': 'false',
             'AIRFLOW__WEBSERVER__DAG_DEFAULT_VIEW': 'graph',
+            'AIRFLOW__CORE__XCOM_BACKEND': 'fairflow_ext.xcom_s3_backend.S3XComBackend',
+            # Connections / Variables from Secrets Manager, with a TTL cache so DAG parsing
+            #   doesn't call GetSecretValue for every lookup
+            'AIRFLOW__SECRETS__BACKEND': 'fairflow_ext.cached_secrets_backend.CachedSecretsManagerBackend',
+            'AIRFLOW__SECRETS__BACKEND_KWARGS': json.dumps({
+                'connections_prefix': f'{secrets_prefix}{SECRETS_CACHE_CONFIG.connections_prefix}',
+                'variables_prefix': f'{secrets_prefix}{SECRETS_CACHE_CONFIG.variables_prefix}',
+                'config_prefix': None,
+                'ttl_seconds': SECRETS_CACHE_CONFIG.ttl_seconds,
+                'negative_ttl_seconds': SECRETS_CACHE_CONFIG.negative_ttl_seconds,
+                'max_entries': SECRETS_CACHE_CONFIG.max_entries,
+                'redis_db': SECRETS_CACHE_CONFIG.redis_db
+            }),
             # *********
             # Additional Env Vars
             # *********
@@ -122,10 +149,10 @@ class FairflowConstruct(cdk.Construct):
             'AIRFLOW_CONN_AWS_DEFAULT': 'aws://',
             # Used by default aws connection / boto3
             'AWS_DEFAULT_REGION': props.vpc_props.vpc.env.region,
-            'DAG_REPOSITORY': os.getenv('DAG_REPOSITORY'),
+            'DAG_REPOSITORY': dag_repository,
             # If your repo needs SSH access, keep it in secrets and supply the key
             #   see: https://docs.github.com/en/developers/overview/managing-deploy-keys#deploy-keys
-            'GIT_READ_ONLY_SECRET_ARN': os.getenv('GIT_READ_ONLY_SECRET_ARN', ''),
+            'GIT_READ_ONLY_SECRET_ARN': git_secret_arn or '',
             # REDIS_HOST is defined via Cloud Map Service Discovery config when not
             #   highly available, or else is the primary endpoint of the aws elasticache
             #   deployment
@@ -134,11 +161,28 @@ class FairflowConstruct(cdk.Construct):
             #    the AIRFLOW__CORE__SQL_ALCHEMY_CONN without exposing the secret to the
             #    ECS container console
             'RDS_SECRET_ARN': rds_construct.backend_secret.secret_arn,
+            # The Webserver's read-only connection when the DB has a reader (Aurora or a
+            #   read replica), see fairflow_ext.db_routing
+            **({
+                'FAIRFLOW_DB_READER_HOST': rds_construct.reader_host,
+                'FAIRFLOW_READER_MAX_LAG_SECONDS': str(DB_READ_ROUTING_CONFIG.max_lag_seconds),
+                'FAIRFLOW_READER_LAG_CHECK_SECONDS': str(DB_READ_ROUTING_CONFIG.lag_check_seconds)
+            } if rds_construct.reader_host and DB_READ_ROUTING_CONFIG.enabled else {}),
             # These are used when we use the ECS Operator Type to say where
             #   to launch on-demand tasks
             'CLUSTER': props.cluster.cluster_name,
             'SECURITY_GROUP': props.vpc_props.default_vpc_security_group.security_group_id,
-            'SUBNETS': ','.join(subnet.subnet_id for subnet in props.vpc_props.vpc.private_subnets)
+            'SUBNETS': ','.join(subnet.subnet_id for subnet in props.vpc_props.vpc.private_subnets),
+            # A tenant's database on the shared RDS (created by the default_entrypoint), and
+            #   prefix of its keys in the shared S3 buckets
+            **({'FAIRFLOW_TENANT': tenant.name, 'FAIRFLOW_DB_NAME': f'airflow_{tenant.name}'} if tenant else {}),
+            # The External Task pools and RunTask backoff (see fairflow_ext.external_tasks)
+            **external_dag_tasks.env_vars,
+            # Used by the S3 XCom backend
+            'FAIRFLOW_XCOM_BUCKET': s3_xcom_bucket.bucket_name,
+            'FAIRFLOW_XCOM_THRESHOLD_BYTES': str(XCOM_BACKEND_CONFIG.threshold_bytes),
+            # AIRFLOW__METRICS__* pointing Airflow at the StatsD sidecar
+            **metrics_construct.env_vars
         }
 
         # Using secret env vars so they can't be seen in the ECS console task definittions -> containers
@@ -150,25 +194,24 @@ class FairflowConstruct(cdk.Construct):
         }
 
         # Build Airflow Docker Image from Dockerfile
-        airflow_image_asset = ecr_assets.DockerImageAsset(self, 'AirflowBuildImage',
-            directory = './airflow'
-        )
-
-        # Create Task Definitions for on-demand Fargate tasks, invoked via ECS Operators
-        external_dag_tasks = ExternalDagTasks(self, 'ExternalDagTasksConstruct',
-            shared_volume = efs_construct.shared_external_task_volume,
-            mounting_point = efs_construct.external_task_mounting_point
-        )
+        airflow_image_asset = docker_image_asset(self, directory = './airflow')
+        if LAZY_LOADING_CONFIG.airflow_image:
+            mark_for_soci_index(airflow_image_asset)
 
         # Policies to use
         policies = PolicyConstruct(self, 'FairflowTaskPolicies',
             efs_arn = efs_construct.file_system_arn,
+            external_task_efs_arn = efs_construct.external_task_file_system_arn,
             s3_logs_bucket_arn = s3_logs_bucket.bucket_arn,
+            s3_xcom_bucket_arn = s3_xcom_bucket.bucket_arn,
+            metrics_namespace = metrics_construct.namespace,
             rds_secret_arn = rds_construct.backend_secret.secret_arn,
             cluster_arn = props.cluster.cluster_arn,
             external_task_arns = external_dag_tasks.get_external_task_arns(),
             external_tasks_log_group_arn = \
-                external_dag_tasks.container_logging.log_group.log_group_arn
+                external_dag_tasks.container_logging.log_group.log_group_arn,
+            secret_name_pattern = f'{secrets_prefix}*' if tenant else 'airflow-*',
+            secret_arns = [git_secret_arn] if tenant and git_secret_arn else []
         )
 
         # Common args for child constructs
@@ -179,16 +222,18 @@ class FairflowConstruct(cdk.Construct):
             secret_env_vars = SECRET_ENV_VAR,
             logging = cloudwatch_logging,
             airflow_image = airflow_image_asset,
-            shared_volume = efs_construct.shared_volume,
+            shared_volume = shared_volume,
             mounting_point = efs_construct.mounting_point,
             policies = policies,
+            metrics = metrics_construct,
             highly_available = props.highly_available,
-            enable_autoscaling = props.enable_autoscaling
+            enable_autoscaling = props.enable_autoscaling,
+            tenant = tenant
         )
 
         # Adding an explicit dependency so these wait until the DB backend is ready
         webserver_construct = WebserverConstruct(self, 'WebserverConstruct', child_props)
-        webserver_construct.webserver_service.node.add_dependency(rds_construct.rds_instance)
+        webserver_construct.webserver_service.node.add_dependency(rds_construct.database)
 
         # The webserver handles db initialization and DAG repo syncing, so wait for that to boot up
         #   these also depend on redis so wait for that to pop up too
@@ -204,3 +249,19 @@ class FairflowConstruct(cdk.Construct):
         worker_construct.worker_service.node.add_dependency(
             redis_construct.dynamic_dependency)
 
+
+        # Scales the Workers ahead of the scheduled DAG runs, never below what the service
+        #   scales in to otherwise
+        if PRESCALING_CONFIG.enabled:
+            prescaler_construct = PreScalerConstruct(self, 'PreScalerConstruct', child_props,
+                worker_service = worker_construct.worker_service,
+                min_workers = min(WORKER_AUTOSCALING_CONFIG.min_task_count, worker_construct.max_workers),
+                max_workers = worker_construct.max_workers
+            )
+            prescaler_construct.schedule.node.add_dependency(
+                webserver_construct.webserver_service)
+
+        # Scheduled archive / prune of the metadata DB, once the webserver has initialized it
+        db_maintenance_construct = DbMaintenanceConstruct(self, 'DbMaintenanceConstruct', child_props)
+        db_maintenance_construct.schedule.node.add_dependency(
+            webserver_construct.webserver_service)
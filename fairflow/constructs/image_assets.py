@@ -0,0 +1,39 @@
+import hashlib
+import os
+from typing import List
+
+from aws_cdk import (
+    core as cdk,
+    aws_ecr_assets as ecr_assets
+)
+
+# Directories of a shared build context (e.g. ./tasks) that every image in it copies,
+#   besides the one its Dockerfile is in
+SHARED_CONTEXT_DIRS = ['common']
+
+
+def docker_image_asset(scope: cdk.Construct, directory: str, file: str = None) -> ecr_assets.DockerImageAsset:
+    """
+    The image asset of a Dockerfile, one per stack whichever construct asks for it.  Every
+    asset fingerprints (hashes) and stages its whole directory at synth time, so with a
+    shared context the other images' directories are excluded: they'd be hashed and copied
+    for nothing, and a change to one image would change (rebuild) all of them
+    """
+    exclude: List[str] = []
+    if file and os.path.dirname(file):
+        keep = SHARED_CONTEXT_DIRS + [os.path.dirname(file)]
+        exclude = sorted(name for name in os.listdir(directory)
+                         if os.path.isdir(os.path.join(directory, name)) and name not in keep)
+
+    # The same build inputs are the same image, so the asset is found by them
+    stack = cdk.Stack.of(scope)
+    build = '\n'.join([os.path.normpath(directory), file or 'Dockerfile', *exclude])
+    id = f'ImageAsset-{hashlib.sha256(build.encode()).hexdigest()[:16]}'
+    asset = stack.node.try_find_child(id)
+    if asset is None:
+        asset = ecr_assets.DockerImageAsset(stack, id,
+            directory = directory,
+            file = file,
+            exclude = exclude
+        )
+    return asset
@@ -0,0 +1,23 @@
+from aws_cdk import (
+    core as cdk,
+    aws_ecr_assets as ecr_assets
+)
+
+from fairflow.config import LAZY_LOADING_CONFIG
+
+# Fargate lazy loads an image when there is a SOCI index for it in the same ECR repository
+#   see: https://docs.aws.amazon.com/AmazonECS/latest/developerguide/container-considerations.html#fargate-tasks-soci-images
+# CDK publishes the image assets as is, so we only mark them here (in the cloud assembly
+#   metadata) and helpers/soci_index.py builds and pushes the indexes after cdk deploy
+SOCI_INDEX_METADATA = 'fairflow:soci-index'
+
+
+def mark_for_soci_index(asset: ecr_assets.DockerImageAsset) -> None:
+    # Image assets are shared (see image_assets.py), so the mark is a child construct that
+    #   exists once per asset
+    if asset.node.try_find_child('SociIndex') is not None:
+        return
+    cdk.Construct(asset, 'SociIndex').node.add_metadata(SOCI_INDEX_METADATA, {
+        'imageTag': asset.asset_hash,
+        'minLayerSizeMiB': LAZY_LOADING_CONFIG.min_layer_size_mib
+    })
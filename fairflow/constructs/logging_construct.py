@@ -0,0 +1,89 @@
+from aws_cdk import (
+    core as cdk,
+    aws_ecs as ecs,
+    aws_logs as logs
+)
+
+from fairflow.config import LoggingConfig
+
+MIB = 1024 * 1024
+
+
+class BufferedAwsLogDriver(ecs.LogDriver):
+    """ AwsLogDriver plus the max-buffer-size option (not exposed in this CDK version) """
+
+    def __init__(self, max_buffer_size_mib: int, **aws_log_driver_props):
+        super().__init__()
+        self.max_buffer_size_mib = max_buffer_size_mib
+        self.aws_log_driver = ecs.AwsLogDriver(**aws_log_driver_props)
+
+
+    def bind(self, scope: cdk.Construct, container_definition: ecs.ContainerDefinition) -> ecs.LogDriverConfig:
+        config = self.aws_log_driver.bind(scope, container_definition)
+        return ecs.LogDriverConfig(
+            log_driver = config.log_driver,
+            options = {**config.options, 'max-buffer-size': f'{self.max_buffer_size_mib}m'}
+        )
+
+
+class LoggingConstruct(cdk.Construct):
+    """
+    Log drivers for the containers, from their LoggingConfig.  Without a log_group, every
+    container gets its own (like a plain AwsLogDriver), and FireLens containers share one
+    """
+
+    def __init__(self, scope: cdk.Construct, id: str, stream_prefix: str,
+                       log_group: logs.ILogGroup = None,
+                       log_retention: logs.RetentionDays = logs.RetentionDays.ONE_MONTH):
+        super().__init__(scope, id)
+        self.stream_prefix = stream_prefix
+        self.log_group = log_group
+        self.log_retention = log_retention
+        self._firelens_log_group = None
+
+
+    @property
+    def firelens_log_group(self) -> logs.ILogGroup:
+        if self.log_group:
+            return self.log_group
+        if self._firelens_log_group is None:
+            self._firelens_log_group = logs.LogGroup(self, 'FireLensLogGroup',
+                retention = self.log_retention
+            )
+        return self._firelens_log_group
+
+
+    def driver(self, task_definition: ecs.TaskDefinition, config: LoggingConfig) -> ecs.LogDriver:
+        if config.firelens:
+            return self.firelens_driver(task_definition, config)
+
+        props = dict(
+            stream_prefix = self.stream_prefix,
+            log_group = self.log_group,
+            log_retention = None if self.log_group else self.log_retention,
+            mode = config.mode,
+            multiline_pattern = config.multiline_pattern
+        )
+        # max-buffer-size only applies to non-blocking mode
+        if config.mode == ecs.AwsLogDriverMode.NON_BLOCKING:
+            return BufferedAwsLogDriver(config.max_buffer_size_mib, **props)
+        return ecs.AwsLogDriver(**props)
+
+
+    def firelens_driver(self, task_definition: ecs.TaskDefinition, config: LoggingConfig) -> ecs.LogDriver:
+        # The CDK adds the Fluent Bit log router container to the task definition (after the
+        #   others, so it never becomes the default container) for any container using
+        #   this driver.  Fluent Bit reads from the container over a socket and sends
+        #   batches with the cloudwatch_logs output, so the container never waits on it
+        #   see: https://docs.aws.amazon.com/AmazonECS/latest/developerguide/using_firelens.html
+        #   see: https://docs.fluentbit.io/manual/pipeline/outputs/cloudwatch
+        log_group = self.firelens_log_group
+        log_group.grant_write(task_definition.task_role)
+        return ecs.LogDrivers.firelens(options = {
+            'Name': 'cloudwatch_logs',
+            'region': cdk.Stack.of(self).region,
+            'log_group_name': log_group.log_group_name,
+            'log_stream_prefix': f'{self.stream_prefix}/',
+            'auto_create_group': 'false',
+            'log-driver-buffer-limit': str(config.max_buffer_size_mib * MIB)
+        })
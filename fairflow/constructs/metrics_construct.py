@@ -0,0 +1,154 @@
+import json
+from typing import List
+
+from aws_cdk import (
+    core as cdk,
+    aws_ecs as ecs,
+    aws_cloudwatch as cw
+)
+
+from fairflow.config import (
+    METRICS_CONFIG,
+    STATSD_SIDECAR_CONFIG
+)
+from fairflow.constructs.logging_construct import LoggingConstruct
+
+class MetricsConstruct(cdk.Construct):
+    def __init__(self, scope: cdk.Construct, id: str, namespace: str = METRICS_CONFIG.namespace):
+        super().__init__(scope, id)
+        self.namespace = namespace
+
+        # The CloudWatch agent listens for StatsD on localhost (containers in a Fargate
+        #   task share the network namespace), aggregates, and publishes to CloudWatch
+        #   see: https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch-Agent-custom-metrics-statsd.html
+        self.agent_config = json.dumps({
+            'agent': {
+                'omit_hostname': True
+            },
+            'metrics': {
+                'namespace': self.namespace,
+                'metrics_collected': {
+                    'statsd': {
+                        'service_address': f':{STATSD_SIDECAR_CONFIG.container_port}',
+                        'metrics_collection_interval': 60,
+                        'metrics_aggregation_interval': 60
+                    }
+                }
+            }
+        })
+
+        # Airflow (and our own fairflow_ext code through airflow.stats.Stats) sends StatsD
+        #   to the sidecar in the same task
+        #   see: https://airflow.apache.org/docs/apache-airflow/stable/logging-monitoring/metrics.html
+        self.env_vars = {
+            'AIRFLOW__METRICS__STATSD_ON': 'true',
+            'AIRFLOW__METRICS__STATSD_HOST': 'localhost',
+            'AIRFLOW__METRICS__STATSD_PORT': str(STATSD_SIDECAR_CONFIG.container_port),
+            'AIRFLOW__METRICS__STATSD_PREFIX': METRICS_CONFIG.statsd_prefix
+        }
+
+        self.dashboard = self.create_dashboard()
+        self.create_alarms()
+
+
+    def add_statsd_sidecar(self, task_definition: ecs.TaskDefinition, logging: LoggingConstruct) -> None:
+        # Not essential, losing metrics shouldn't take the Airflow service down with it
+        task_definition.add_container(STATSD_SIDECAR_CONFIG.name,
+            container_name = STATSD_SIDECAR_CONFIG.name,
+            image = ecs.ContainerImage.from_registry(name = METRICS_CONFIG.agent_image),
+            logging = logging.driver(task_definition, STATSD_SIDECAR_CONFIG.logging),
+            essential = False,
+            memory_reservation_mib = 64,
+            environment = {'CW_CONFIG_CONTENT': self.agent_config},
+            port_mappings = [ecs.PortMapping(
+                container_port = STATSD_SIDECAR_CONFIG.container_port,
+                protocol = ecs.Protocol.UDP
+            )]
+        )
+
+
+    def metric(self, name: str, metric_type: str, statistic: str = 'Average') -> cw.Metric:
+        # The agent adds the StatsD type (counter, gauge, timing) as a dimension
+        return cw.Metric(
+            namespace = self.namespace,
+            metric_name = f'{METRICS_CONFIG.statsd_prefix}.{name}',
+            dimensions = {'metric_type': metric_type},
+            statistic = statistic,
+            period = cdk.Duration.minutes(1),
+            label = f'{name} ({statistic})'
+        )
+
+
+    def create_dashboard(self) -> cw.Dashboard:
+        widgets: List[List[cw.IWidget]] = [
+            [
+                cw.GraphWidget(title = 'Scheduler loop duration (ms)', width = 12, left = [
+                    self.metric('scheduler.scheduler_loop_duration', 'timing', 'p50'),
+                    self.metric('scheduler.scheduler_loop_duration', 'timing', 'p99'),
+                    self.metric('scheduler.critical_section_duration', 'timing', 'p99'),
+                ]),
+                cw.GraphWidget(title = 'DAG parsing', width = 12, left = [
+                    self.metric('dag_processing.total_parse_time', 'gauge', 'Maximum'),
+                ], right = [
+                    self.metric('dag_processing.import_errors', 'gauge', 'Maximum'),
+                ]),
+            ],
+            [
+                cw.GraphWidget(title = 'Executor slots', width = 12, left = [
+                    self.metric('executor.open_slots', 'gauge'),
+                    self.metric('executor.queued_tasks', 'gauge'),
+                    self.metric('executor.running_tasks', 'gauge'),
+                ]),
+                # Tasks waiting on a slot / pool, i.e. queued -> running latency building up
+                cw.GraphWidget(title = 'Scheduled tasks', width = 12, left = [
+                    self.metric('scheduler.tasks.executable', 'gauge'),
+                    self.metric('scheduler.tasks.starving', 'gauge'),
+                    self.metric('pool.queued_slots.default_pool', 'gauge'),
+                    self.metric('pool.open_slots.default_pool', 'gauge'),
+                ]),
+            ],
+            [
+                cw.GraphWidget(title = 'Task throughput (per minute)', width = 12, left = [
+                    self.metric('ti_successes', 'counter', 'Sum'),
+                    self.metric('ti_failures', 'counter', 'Sum'),
+                ], right = [
+                    self.metric('scheduler_heartbeat', 'counter', 'Sum'),
+                ]),
+                cw.GraphWidget(title = 'Secrets cache', width = 12, left = [
+                    self.metric('fairflow.secrets_cache.hit', 'counter', 'Sum'),
+                    self.metric('fairflow.secrets_cache.negative_hit', 'counter', 'Sum'),
+                    self.metric('fairflow.secrets_cache.miss', 'counter', 'Sum'),
+                ]),
+            ],
+        ]
+
+        dashboard = cw.Dashboard(self, 'FairflowDashboard',
+            dashboard_name = f'Fairflow-{cdk.Stack.of(self).stack_name}'
+        )
+        for row in widgets:
+            dashboard.add_widgets(*row)
+        return dashboard
+
+
+    def create_alarms(self) -> None:
+        # Fewer heartbeats than expected (or none at all) means the scheduler loop is
+        #   lagging or the scheduler is down
+        self.metric('scheduler_heartbeat', 'counter', 'Sum') \
+            .with_(period = cdk.Duration.minutes(5)) \
+            .create_alarm(self, 'SchedulerHeartbeatAlarm',
+                alarm_description = 'Airflow scheduler is heartbeating less than expected',
+                threshold = METRICS_CONFIG.min_scheduler_heartbeats,
+                comparison_operator = cw.ComparisonOperator.LESS_THAN_THRESHOLD,
+                evaluation_periods = 1,
+                treat_missing_data = cw.TreatMissingData.BREACHING
+            )
+
+        self.metric('scheduler.scheduler_loop_duration', 'timing', 'p99') \
+            .with_(period = cdk.Duration.minutes(5)) \
+            .create_alarm(self, 'SchedulerLoopDurationAlarm',
+                alarm_description = 'Airflow scheduler loop is slow',
+                threshold = METRICS_CONFIG.max_scheduler_loop_duration_ms,
+                comparison_operator = cw.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                evaluation_periods = 3,
+                treat_missing_data = cw.TreatMissingData.NOT_BREACHING
+            )
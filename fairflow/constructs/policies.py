@@ -8,13 +8,17 @@ from aws_cdk import (
 class PolicyConstruct(cdk.Construct):
 
     def __init__(self, scope: cdk.Construct, id: str,
-                       efs_arn: str, s3_logs_bucket_arn: str,
+                       efs_arn: str, s3_logs_bucket_arn: str, s3_xcom_bucket_arn: str,
+                       metrics_namespace: str,
                        rds_secret_arn: str, cluster_arn: str,
-                       external_task_arns: List[str], external_tasks_log_group_arn: str):
+                       external_task_arns: List[str], external_tasks_log_group_arn: str,
+                       secret_name_pattern: str = 'airflow-*', secret_arns: List[str] = (),
+                       external_task_efs_arn: str = None):
         super().__init__(scope, id)
 
+        # A tenant only reads its own secrets ({tenant}/*), plus secret_arns
         stack = cdk.Stack.of(self)
-        secrets_wildcard_arn = f'arn:aws:secretsmanager:{stack.region}:{stack.account}:secret:airflow-*'
+        secrets_wildcard_arn = f'arn:aws:secretsmanager:{stack.region}:{stack.account}:secret:{secret_name_pattern}'
 
         # Example
         self.managed_policies: List[iam.IManagedPolicy] = [
@@ -22,7 +26,8 @@ class PolicyConstruct(cdk.Construct):
         ]
 
         self.policy_statements: List[iam.PolicyStatement] = [
-            # Permission to mount our EFS on an access point
+            # Permission to mount our EFS on an access point, and the External Tasks' one when
+            #   it's a file system of its own (see SHARED_STORAGE_CONFIG)
             iam.PolicyStatement(
                 actions = ["elasticfilesystem:ClientMount",
                            "elasticfilesystem:ClientWrite",
@@ -30,7 +35,7 @@ class PolicyConstruct(cdk.Construct):
                            'elasticfilesystem:DescribeFileSystems',
                            'elasticfilesystem:DescribeAccessPoints'],
                 effect = iam.Effect.ALLOW,
-                resources = [efs_arn]
+                resources = list(dict.fromkeys(arn for arn in [efs_arn, external_task_efs_arn] if arn))
             ),
             # Permission to log to our S3 bucket
             iam.PolicyStatement(
@@ -43,6 +48,19 @@ class PolicyConstruct(cdk.Construct):
                 effect = iam.Effect.ALLOW,
                 resources = [f'{s3_logs_bucket_arn}']
             ),
+            # Permission to read / write offloaded XCom values
+            iam.PolicyStatement(
+                actions = ["s3:GetObject",
+                           "s3:PutObject",
+                           "s3:DeleteObject"],
+                effect = iam.Effect.ALLOW,
+                resources = [f'{s3_xcom_bucket_arn}/*']
+            ),
+            iam.PolicyStatement(
+                actions = ["s3:ListBucket"],
+                effect = iam.Effect.ALLOW,
+                resources = [f'{s3_xcom_bucket_arn}']
+            ),
             # Secrets access
             iam.PolicyStatement(
                 actions = ["secretsmanager:GetResourcePolicy",
@@ -51,7 +69,8 @@ class PolicyConstruct(cdk.Construct):
                            "secretsmanager:ListSecretVersionIds"],
                 effect = iam.Effect.ALLOW,
                 resources = [rds_secret_arn,
-                             secrets_wildcard_arn]
+                             secrets_wildcard_arn,
+                             *secret_arns]
             ),
             iam.PolicyStatement(
                 actions = ["secretsmanager:ListSecrets"],
@@ -87,6 +106,13 @@ class PolicyConstruct(cdk.Construct):
                         }
                     }
             ),
+            # The StatsD sidecars publish Airflow metrics, only to our namespace
+            iam.PolicyStatement(
+                actions = ["cloudwatch:PutMetricData"],
+                effect = iam.Effect.ALLOW,
+                resources = ["*"],
+                conditions = {"StringEquals": {"cloudwatch:namespace": metrics_namespace}}
+            ),
             # The ECS Operator also needs to interact with the Cloud Watch logs
             iam.PolicyStatement(
                 actions = ["logs:Describe*",
@@ -0,0 +1,70 @@
+from aws_cdk import (
+    core as cdk,
+    aws_ec2 as ec2,
+    aws_ecs as ecs,
+    aws_events as events,
+    aws_events_targets as targets,
+    aws_iam as iam
+)
+
+from fairflow.constructs.contruct_properties import FairflowChildConstructProps
+from fairflow.config import (
+    PRESCALING_CONFIG,
+    PRESCALING_CONTAINER_CONFIG,
+    PRESCALING_TASK_CONFIG
+)
+
+class PreScalerConstruct(cdk.Construct):
+    def __init__(self, scope: cdk.Construct, id: str, props: FairflowChildConstructProps,
+                       worker_service: ecs.FargateService, min_workers: int, max_workers: int):
+        super().__init__(scope, id)
+
+        # Target tracking only scales out once the Workers are already busy, a few minutes
+        #   into a big scheduled batch.  This forecasts the slots the scheduled DAG runs will
+        #   need (see fairflow_ext.prescaler) and raises the scaling minimum before they
+        #   fire.  Not the desired count, CloudFormation owns that and every deploy would
+        #   reset it
+        if not props.enable_autoscaling:
+            raise ValueError('PRESCALING_CONFIG needs enable_autoscaling, it sets the Workers\' scaling minimum')
+
+        self.prescaler_task = ecs.FargateTaskDefinition(self, 'PreScalerTask',
+            cpu = PRESCALING_TASK_CONFIG.cpu,
+            memory_limit_mib = PRESCALING_TASK_CONFIG.memory_limit_mib,
+            family = f'FairflowPreScaler-{cdk.Stack.of(self).stack_name}'
+        )
+        # RDS secret access
+        props.policies.attach_policies(self.prescaler_task.task_role)
+        # Application Auto Scaling has no resource level permissions
+        self.prescaler_task.add_to_task_role_policy(iam.PolicyStatement(
+            actions = ['application-autoscaling:DescribeScalableTargets',
+                       'application-autoscaling:RegisterScalableTarget'],
+            effect = iam.Effect.ALLOW,
+            resources = ['*']
+        ))
+
+        self.prescaler_task.add_container(PRESCALING_CONTAINER_CONFIG.name,
+            container_name = PRESCALING_CONTAINER_CONFIG.name,
+            image = ecs.ContainerImage.from_docker_image_asset(props.airflow_image),
+            logging = props.logging.driver(self.prescaler_task, PRESCALING_CONTAINER_CONFIG.logging),
+            environment = props.env_vars,
+            secrets = props.secret_env_vars,
+            entry_point = PRESCALING_CONTAINER_CONFIG.entry_point,
+            command = PRESCALING_CONTAINER_CONFIG.command + [
+                '--cluster', props.cluster.cluster_name,
+                '--service', worker_service.service_name,
+                '--min-workers', str(min_workers),
+                '--max-workers', str(max_workers)
+            ]
+        )
+
+        self.schedule = events.Rule(self, 'PreScalerSchedule',
+            description = 'Scale the Fairflow Workers ahead of the scheduled DAG runs',
+            schedule = PRESCALING_CONFIG.schedule,
+            targets = [targets.EcsTask(
+                cluster = props.cluster,
+                task_definition = self.prescaler_task,
+                platform_version = ecs.FargatePlatformVersion.VERSION1_4,
+                security_groups = [props.vpc_props.default_vpc_security_group],
+                subnet_selection = ec2.SubnetSelection(subnets = props.vpc_props.vpc.private_subnets)
+            )]
+        )
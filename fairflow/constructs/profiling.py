@@ -0,0 +1,28 @@
+from typing import Mapping, Optional
+
+from aws_cdk import (
+    core as cdk,
+    aws_ecs as ecs
+)
+
+from fairflow.config import PROFILING_CONFIG
+
+# Shared by the Scheduler and Worker constructs, see airflow/fairflow_ext/profiling.py
+
+def profiling_env_vars(service: str) -> Mapping[str, str]:
+    return {
+        'FAIRFLOW_SERVICE': service,
+        'FAIRFLOW_CONTINUOUS_PROFILING': str(PROFILING_CONFIG.continuous).lower(),
+        'FAIRFLOW_PROFILING_RATE_HZ': str(PROFILING_CONFIG.continuous_rate_hz),
+        'FAIRFLOW_PROFILING_DURATION_SECONDS': str(PROFILING_CONFIG.continuous_window_seconds)
+    }
+
+
+def profiling_linux_parameters(scope: cdk.Construct, id: str) -> Optional[ecs.LinuxParameters]:
+    # py-spy needs ptrace to read the Airflow process' memory, SYS_PTRACE is the
+    #   one capability Fargate lets us add
+    if not (PROFILING_CONFIG.enable_execute_command or PROFILING_CONFIG.continuous):
+        return None
+    linux_parameters = ecs.LinuxParameters(scope, id)
+    linux_parameters.add_capabilities(ecs.Capability.SYS_PTRACE)
+    return linux_parameters
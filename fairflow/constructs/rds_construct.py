@@ -7,9 +7,13 @@ from aws_cdk import (
     aws_secretsmanager as secrets
 )
 
-from fairflow.config import DEFAULT_DB_CONFIG
+from fairflow.config import DEFAULT_DB_CONFIG, DbSizingProfile
 from fairflow.constructs.contruct_properties import VpcProps
 
+# Aurora takes these in the cluster parameter group, the rest of the profile's parameters
+#   go in the instances' DB parameter group
+AURORA_CLUSTER_PARAMETERS = {'innodb_flush_log_at_trx_commit', 'innodb_trx_commit_allow_data_loss'}
+
 class RDSConstruct(cdk.Construct):
 
     def __init__(self, scope: cdk.Construct, id: str,
@@ -34,25 +38,74 @@ class RDSConstruct(cdk.Construct):
                 )
         )
 
+        # Sized by DB_SIZING_PROFILE in the config
+        sizing = DEFAULT_DB_CONFIG.sizing
+        # Reader host, Aurora's reader endpoint or the read replica's if there is one
+        self.reader_host = None
+        if sizing.engine == 'aurora-mysql':
+            self.database = self._aurora_cluster(vpc_props, highly_available, sizing)
+            endpoint = self.database.cluster_endpoint.hostname
+            self.reader_host = self.database.cluster_read_endpoint.hostname
+        else:
+            self.database = self._mysql_instance(vpc_props, highly_available, sizing)
+            endpoint = self.database.db_instance_endpoint_address
+            if sizing.read_replica:
+                self.reader_host = self._read_replica(self.database, vpc_props, sizing) \
+                    .db_instance_endpoint_address
+
+        self.database.connections.allow_default_port_from(
+            other = vpc_props.default_vpc_security_group,
+            description = 'RDS Ingress'
+        )
+
+        cdk.CfnOutput(self, 'MySQL Endpoint',
+            value = endpoint,
+            description = "MySQL Endpoint"
+        )
+        if self.reader_host:
+            cdk.CfnOutput(self, 'MySQL Reader Endpoint',
+                value = self.reader_host,
+                description = "MySQL Reader Endpoint"
+            )
+
+
+    def _parameter_group(self, id: str, engine: rds.IEngine, parameters: dict) -> rds.ParameterGroup:
+        if not parameters:
+            return None
+        return rds.ParameterGroup(self, id,
+            engine = engine,
+            description = 'Airflow metadata DB parameters',
+            parameters = parameters
+        )
+
+
+    def _mysql_instance(self, vpc_props: VpcProps, highly_available: bool,
+                              sizing: DbSizingProfile) -> rds.DatabaseInstance:
+        engine = rds.DatabaseInstanceEngine.mysql(
+            version = rds.MysqlEngineVersion.VER_8_0_25
+        )
+        # Shared with the read replica, if there is one
+        self.instance_parameter_group = self._parameter_group('DBParameterGroup', engine, sizing.parameters)
         # We need to use MySQL 8+ (or Postgres 9.6+) to take advantage of Airflow 2's
         #   Scheduler high availability feature.  If the highly_available bool is True
         #   we'll enable Multi-AZ which will create a read-only replica for failover.
         #   see: https://airflow.apache.org/docs/apache-airflow/stable/concepts/scheduler.html#database-requirements
-        self.rds_instance = rds.DatabaseInstance(self, 'RDSInstance',
+        instance = rds.DatabaseInstance(self, 'RDSInstance',
             instance_identifier = DEFAULT_DB_CONFIG.instance_name,
             database_name = DEFAULT_DB_CONFIG.db_name,
             credentials = rds.Credentials.from_secret(self.backend_secret),
-            engine = rds.DatabaseInstanceEngine.mysql(
-                version = rds.MysqlEngineVersion.VER_8_0_25
-            ),
+            engine = engine,
             vpc = vpc_props.vpc,
             publicly_accessible = False,
             vpc_subnets = ec2.SubnetSelection(subnets=vpc_props.vpc.private_subnets),
             security_groups = [vpc_props.default_vpc_security_group],
             port = DEFAULT_DB_CONFIG.port,
-            instance_type = DEFAULT_DB_CONFIG.instance_type,
-            allocated_storage = DEFAULT_DB_CONFIG.allocated_storage_in_gb,
-            storage_type= rds.StorageType.GP2,
+            instance_type = sizing.instance_type,
+            allocated_storage = sizing.allocated_storage_in_gb,
+            storage_type = rds.StorageType.IO1 if sizing.storage_type == 'io1' else rds.StorageType.GP2,
+            iops = sizing.iops if sizing.storage_type == 'io1' else None,
+            parameter_group = self.instance_parameter_group,
+            enable_performance_insights = sizing.performance_insights or None,
             storage_encrypted = True,
             multi_az = highly_available,
             delete_automated_backups = True,
@@ -60,13 +113,86 @@ class RDSConstruct(cdk.Construct):
             backup_retention = DEFAULT_DB_CONFIG.backup_retention_in_days,
             deletion_protection = False
         )
+        self._gp3_storage(instance, sizing)
+        return instance
 
-        self.rds_instance.connections.allow_default_port_from(
-            other = vpc_props.default_vpc_security_group,
-            description = 'RDS Ingress'
+
+    def _read_replica(self, source: rds.DatabaseInstance, vpc_props: VpcProps,
+                            sizing: DbSizingProfile) -> rds.DatabaseInstanceReadReplica:
+        # Asynchronous MySQL replication from the instance, it takes the source's storage
+        #   size and engine.  Reads only, not a failover target (that's multi_az)
+        #   see: https://docs.aws.amazon.com/AmazonRDS/latest/UserGuide/USER_ReadRepl.html
+        replica = rds.DatabaseInstanceReadReplica(self, 'RDSReadReplica',
+            source_database_instance = source,
+            instance_identifier = f'{DEFAULT_DB_CONFIG.instance_name}-reader',
+            instance_type = sizing.instance_type,
+            vpc = vpc_props.vpc,
+            publicly_accessible = False,
+            vpc_subnets = ec2.SubnetSelection(subnets=vpc_props.vpc.private_subnets),
+            security_groups = [vpc_props.default_vpc_security_group],
+            port = DEFAULT_DB_CONFIG.port,
+            storage_type = rds.StorageType.IO1 if sizing.storage_type == 'io1' else rds.StorageType.GP2,
+            iops = sizing.iops if sizing.storage_type == 'io1' else None,
+            enable_performance_insights = sizing.performance_insights or None,
+            storage_encrypted = True,
+            delete_automated_backups = True,
+            auto_minor_version_upgrade = False,
+            deletion_protection = False
         )
+        if self.instance_parameter_group:
+            # The same parameters as the source, this CDK version's read replica doesn't
+            #   take a parameter group, so set it on the CloudFormation resource
+            cfn_replica: rds.CfnDBInstance = replica.node.default_child
+            cfn_replica.db_parameter_group_name = \
+                self.instance_parameter_group.bind_to_instance().parameter_group_name
+        self._gp3_storage(replica, sizing)
+        return replica
 
-        cdk.CfnOutput(self, 'MySQL Endpoint',
-            value = self.rds_instance.db_instance_endpoint_address,
-            description = "MySQL Endpoint"
+
+    def _gp3_storage(self, instance: rds.DatabaseInstanceBase, sizing: DbSizingProfile) -> None:
+        if sizing.storage_type == 'gp3':
+            # This CDK version predates gp3 for RDS, so set it on the CloudFormation resource
+            #   see: https://docs.aws.amazon.com/cdk/latest/guide/cfn_layer.html
+            cfn_instance: rds.CfnDBInstance = instance.node.default_child
+            cfn_instance.storage_type = 'gp3'
+            if sizing.iops:
+                cfn_instance.iops = sizing.iops
+            if sizing.storage_throughput_mibps:
+                cfn_instance.add_property_override('StorageThroughput', sizing.storage_throughput_mibps)
+
+
+    def _aurora_cluster(self, vpc_props: VpcProps, highly_available: bool,
+                              sizing: DbSizingProfile) -> rds.DatabaseCluster:
+        # Aurora MySQL 3 is MySQL 8 compatible
+        engine = rds.DatabaseClusterEngine.aurora_mysql(
+            version = rds.AuroraMysqlEngineVersion.of('8.0.mysql_aurora.3.04.0', '8.0')
+        )
+        parameters = sizing.parameters or {}
+        # Readers are spread across the AZs and one is promoted if the writer fails
+        readers = max(sizing.aurora_readers, 1 if highly_available else 0)
+        return rds.DatabaseCluster(self, 'RDSCluster',
+            cluster_identifier = DEFAULT_DB_CONFIG.instance_name,
+            default_database_name = DEFAULT_DB_CONFIG.db_name,
+            credentials = rds.Credentials.from_secret(self.backend_secret),
+            engine = engine,
+            instances = 1 + readers,
+            instance_props = rds.InstanceProps(
+                vpc = vpc_props.vpc,
+                publicly_accessible = False,
+                vpc_subnets = ec2.SubnetSelection(subnets=vpc_props.vpc.private_subnets),
+                security_groups = [vpc_props.default_vpc_security_group],
+                instance_type = sizing.instance_type,
+                parameter_group = self._parameter_group('DBParameterGroup', engine,
+                    {name: value for name, value in parameters.items()
+                     if name not in AURORA_CLUSTER_PARAMETERS}),
+                enable_performance_insights = sizing.performance_insights or None,
+                auto_minor_version_upgrade = False
+            ),
+            parameter_group = self._parameter_group('DBClusterParameterGroup', engine,
+                {name: value for name, value in parameters.items()
+                 if name in AURORA_CLUSTER_PARAMETERS}),
+            port = DEFAULT_DB_CONFIG.port,
+            storage_encrypted = True,
+            backup = rds.BackupProps(retention = DEFAULT_DB_CONFIG.backup_retention_in_days),
+            deletion_protection = False
         )
@@ -1,3 +1,5 @@
+from typing import List
+
 from aws_cdk import (
     core as cdk,
     aws_ecs as ecs,
@@ -8,10 +10,23 @@ from aws_cdk import (
 
 from fairflow.config import (
     REDIS_CONFIG,
-    REDIS_TASK_CONFIG
+    REDIS_BROKER_CONFIG,
+    RedisBrokerConfig
 )
 from fairflow.constructs.contruct_properties import RedisConstructProps
 
+def redis_server_args(config: RedisBrokerConfig) -> List[str]:
+    """ redis-server arguments (the redis.conf directives) for the Fargate Redis """
+    return [
+        'redis-server',
+        '--maxmemory', f'{config.maxmemory_mib}mb',
+        '--maxmemory-policy', config.maxmemory_policy,
+        '--appendonly', 'yes' if config.appendonly else 'no',
+        # An empty save turns RDB snapshots off
+        '--save', '3600 1 300 100 60 10000' if config.snapshots else '',
+        '--io-threads', str(config.io_threads)
+    ]
+
 class RedisConstruct(cdk.Construct):
     def __init__(self, scope: cdk.Construct, id: str, props: RedisConstructProps):
         super().__init__(scope, id)
@@ -37,8 +52,19 @@ class RedisConstruct(cdk.Construct):
             cache_subnet_group_name = 'redis-elasticache-subnet-group'
         )
 
-        # Celery does not support Redis clusters, so it's important to set
-        #   the cache_parameter_group_name as below (excluding .cluster.on)
+        # Based on default.redis6.x, which evicts with volatile-lru
+        #   see: https://docs.aws.amazon.com/AmazonElastiCache/latest/red-ug/ParameterGroups.Redis.html
+        redis_parameter_group = ecache.CfnParameterGroup(self, 'RedisParameterGroup',
+            cache_parameter_group_family = 'redis6.x',
+            description = 'Redis Celery broker parameters',
+            properties = {
+                'maxmemory-policy': REDIS_BROKER_CONFIG.maxmemory_policy,
+                'reserved-memory-percent': str(REDIS_BROKER_CONFIG.reserved_memory_percent)
+            }
+        )
+
+        # Celery does not support Redis clusters, so it's important to use
+        #   a parameter group family as above (excluding .cluster.on)
         #   node groups has to be one in a non-cluster environment as well
         #   Essentially we're creating a normal deployment and a read-only replica
         #   in another AZ for failover
@@ -46,12 +72,12 @@ class RedisConstruct(cdk.Construct):
         self.redis_replication_group = ecache.CfnReplicationGroup(self, 'RedisReplicationGroup',
             engine = 'redis',
             engine_version = '6.x',
-            cache_parameter_group_name = 'default.redis6.x',
+            cache_parameter_group_name = redis_parameter_group.ref,
             num_node_groups = 1,
             replicas_per_node_group = 1,
             automatic_failover_enabled = True,
             auto_minor_version_upgrade = False,
-            cache_node_type = 'cache.t3.micro',
+            cache_node_type = REDIS_BROKER_CONFIG.node_type,
             port = REDIS_CONFIG.container_port,
             multi_az_enabled = True,
             security_group_ids = [props.vpc_props.default_vpc_security_group.security_group_id],
@@ -66,17 +92,18 @@ class RedisConstruct(cdk.Construct):
 
     def setup_fargate_redis_service(self, props: RedisConstructProps) -> str:
         redis_task = ecs.FargateTaskDefinition(self, 'RedisTask',
-            cpu = REDIS_TASK_CONFIG.cpu,
-            memory_limit_mib = REDIS_TASK_CONFIG.memory_limit_mib
+            cpu = REDIS_BROKER_CONFIG.task.cpu,
+            memory_limit_mib = REDIS_BROKER_CONFIG.task.memory_limit_mib
         )
 
-        # redis has no environment, secrets, entrypoint or command
-        #   it's also using standard registry docker pull, not the airflow
-        #   image the other services use
+        # redis has no environment, secrets or entrypoint, the command passes the
+        #   REDIS_BROKER_CONFIG settings.  It's also using standard registry docker
+        #   pull, not the airflow image the other services use
         redis_container = redis_task.add_container(REDIS_CONFIG.name,
             container_name = REDIS_CONFIG.name,
             image = ecs.ContainerImage.from_registry(name = 'redis:6.2.5'),
-            logging = props.logging,
+            command = redis_server_args(REDIS_BROKER_CONFIG),
+            logging = props.logging.driver(redis_task, REDIS_CONFIG.logging),
             health_check = REDIS_CONFIG.health_check
         )
         redis_container.add_port_mappings(ecs.PortMapping(
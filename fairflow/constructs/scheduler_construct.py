@@ -4,7 +4,12 @@ from aws_cdk import (
 )
 
 from fairflow.constructs.contruct_properties import FairflowChildConstructProps
+from fairflow.constructs.profiling import (
+    profiling_env_vars,
+    profiling_linux_parameters
+)
 from fairflow.config import (
+    PROFILING_CONFIG,
     SCHEDULER_TASK_CONFIG,
     SCHEDULER_CONFIG
 )
@@ -23,14 +28,18 @@ class SchedulerConstruct(cdk.Construct):
         scheduler_task.add_container(SCHEDULER_CONFIG.name,
             container_name = SCHEDULER_CONFIG.name,
             image = ecs.ContainerImage.from_docker_image_asset(props.airflow_image),
-            logging = props.logging,
-            environment = props.env_vars,
+            logging = props.logging.driver(scheduler_task, SCHEDULER_CONFIG.logging),
+            environment = {**props.env_vars, **profiling_env_vars('scheduler')},
             secrets = props.secret_env_vars,
+            linux_parameters = profiling_linux_parameters(self, 'SchedulerLinuxParameters'),
             entry_point = SCHEDULER_CONFIG.entry_point,
             command = SCHEDULER_CONFIG.command,
             port_mappings = [ecs.PortMapping(container_port = SCHEDULER_CONFIG.container_port)]
         ).add_mount_points(props.mounting_point)
 
+        # Added last so the Airflow container stays the task's default container
+        props.metrics.add_statsd_sidecar(scheduler_task, props.logging)
+
         desired_count = 2 if props.highly_available else 1
 
         self.scheduler_service = ecs.FargateService(self, 'SchedulerService',
@@ -38,5 +47,7 @@ class SchedulerConstruct(cdk.Construct):
             task_definition = scheduler_task,
             security_group = props.vpc_props.default_vpc_security_group,
             platform_version = ecs.FargatePlatformVersion.VERSION1_4,
-            desired_count = desired_count
+            desired_count = desired_count,
+            # For on-demand py-spy profiles, see README -> Scheduler Construct
+            enable_execute_command = PROFILING_CONFIG.enable_execute_command
         )
@@ -1,9 +1,18 @@
 from aws_cdk import (
     core as cdk,
-    aws_ecs as ecs,
-    aws_ecr_assets as ecr_assets
+    aws_ecs as ecs
+)
+from fairflow.config import (
+    EXTERNAL_TASK_LOGGING_CONFIG,
+    LAZY_LOADING_CONFIG
 )
 from fairflow.constructs.contruct_properties import ExternalTaskProps
+from fairflow.constructs.image_assets import docker_image_asset
+from fairflow.constructs.lazy_loading import mark_for_soci_index
+
+# see: https://docs.aws.amazon.com/AmazonECS/latest/developerguide/fargate-task-storage.html
+FARGATE_MIN_EPHEMERAL_STORAGE_GIB = 21
+FARGATE_MAX_EPHEMERAL_STORAGE_GIB = 200
 
 class ExternalTaskDefinition(cdk.Construct):
     def __init__(self, scope: cdk.Construct, task_name: str, props: ExternalTaskProps):
@@ -16,11 +25,39 @@ class ExternalTaskDefinition(cdk.Construct):
             volumes = [props.shared_volume]
         )
 
-        worker_image_asset = ecr_assets.DockerImageAsset(self, f'{props.container_info.name}-BuildImage',
-            directory = props.container_info.asset_dir
+        if props.ephemeral_storage_gib:
+            if not FARGATE_MIN_EPHEMERAL_STORAGE_GIB <= props.ephemeral_storage_gib \
+                    <= FARGATE_MAX_EPHEMERAL_STORAGE_GIB:
+                raise ValueError(f'{task_name} ephemeral storage must be between '
+                                 f'{FARGATE_MIN_EPHEMERAL_STORAGE_GIB} and '
+                                 f'{FARGATE_MAX_EPHEMERAL_STORAGE_GIB} GiB')
+            # Not exposed on FargateTaskDefinition in this CDK version
+            self.worker_task.node.default_child.ephemeral_storage = \
+                ecs.CfnTaskDefinition.EphemeralStorageProperty(
+                    size_in_gib = props.ephemeral_storage_gib
+                )
+
+        # Tasks with the same image share its asset
+        worker_image_asset = docker_image_asset(self,
+            directory = props.container_info.asset_dir,
+            file = props.container_info.dockerfile
         )
+        if LAZY_LOADING_CONFIG.external_tasks:
+            mark_for_soci_index(worker_image_asset)
 
-        self.worker_task.add_container(props.container_info.name,
+        self.container = self.worker_task.add_container(props.container_info.name,
             image = ecs.ContainerImage.from_docker_image_asset(worker_image_asset),
-            logging = props.logging
-        ).add_mount_points(props.mounting_point)
+            logging = props.logging.driver(self.worker_task, EXTERNAL_TASK_LOGGING_CONFIG),
+            environment = {'FAIRFLOW_SCRATCH_DIR': props.scratch_path} if props.scratch_path else None
+        )
+        self.container.add_mount_points(props.mounting_point)
+
+        # A Fargate volume with no EFS configuration is a bind mount on the task's
+        #   ephemeral storage, i.e. local disk instead of NFS for intermediate data
+        if props.scratch_path:
+            self.worker_task.add_volume(name = 'scratch')
+            self.container.add_mount_points(ecs.MountPoint(
+                container_path = props.scratch_path,
+                read_only = False,
+                source_volume = 'scratch'
+            ))
@@ -0,0 +1,52 @@
+from aws_cdk import (
+    core as cdk,
+    aws_ec2 as ec2
+)
+
+from fairflow.config import VPC_ENDPOINTS_CONFIG
+from fairflow.constructs.contruct_properties import VpcProps
+
+class VpcEndpointsConstruct(cdk.Construct):
+    def __init__(self, scope: cdk.Construct, id: str, vpc_props: VpcProps):
+        super().__init__(scope, id)
+
+        private_subnets = ec2.SubnetSelection(subnet_type = ec2.SubnetType.PRIVATE)
+
+        # Gateway endpoints are free, and ECR image layers, the worker logs and the XComs
+        #   all come from S3.  This adds a route to the private subnets' route tables
+        if VPC_ENDPOINTS_CONFIG.s3_gateway:
+            vpc_props.vpc.add_gateway_endpoint('S3GatewayEndpoint',
+                service = ec2.GatewayVpcEndpointAwsService.S3,
+                subnets = [private_subnets]
+            )
+
+        if not VPC_ENDPOINTS_CONFIG.interface_endpoints:
+            return
+
+        # Everything the Fargate tasks in the private subnets call on AWS, otherwise it
+        #   all goes out through the NAT gateways
+        #   see: https://docs.aws.amazon.com/AmazonECR/latest/userguide/vpc-endpoints.html
+        interface_services = {
+            'EcrApi': ec2.InterfaceVpcEndpointAwsService.ECR,
+            'EcrDocker': ec2.InterfaceVpcEndpointAwsService.ECR_DOCKER,
+            'CloudWatchLogs': ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH_LOGS,
+            'CloudWatch': ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH,
+            'SecretsManager': ec2.InterfaceVpcEndpointAwsService.SECRETS_MANAGER,
+            'Ecs': ec2.InterfaceVpcEndpointAwsService.ECS,
+            'Sts': ec2.InterfaceVpcEndpointAwsService.STS,
+        }
+        for name, service in interface_services.items():
+            vpc_props.vpc.add_interface_endpoint(f'{name}InterfaceEndpoint',
+                service = service,
+                subnets = private_subnets,
+                security_groups = [vpc_props.default_vpc_security_group],
+                private_dns_enabled = True,
+                # Only reachable from the shared security group, not the whole VPC
+                open = False
+            )
+
+        vpc_props.default_vpc_security_group.connections.allow_from(
+            other = vpc_props.default_vpc_security_group,
+            port_range = ec2.Port.tcp(443),
+            description = 'VPC Interface Endpoints'
+        )
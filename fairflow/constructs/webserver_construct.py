@@ -27,7 +27,7 @@ class WebserverConstruct(cdk.Construct):
         webserver_task.add_container(WEBSERVER_CONFIG.name,
             container_name = WEBSERVER_CONFIG.name,
             image = ecs.ContainerImage.from_docker_image_asset(props.airflow_image),
-            logging = props.logging,
+            logging = props.logging.driver(webserver_task, WEBSERVER_CONFIG.logging),
             environment = props.env_vars,
             secrets = props.secret_env_vars,
             entry_point = WEBSERVER_CONFIG.entry_point,
@@ -39,7 +39,7 @@ class WebserverConstruct(cdk.Construct):
         webserver_task.add_container(FLOWER_CONFIG.name,
             container_name = FLOWER_CONFIG.name,
             image = ecs.ContainerImage.from_docker_image_asset(props.airflow_image),
-            logging = props.logging,
+            logging = props.logging.driver(webserver_task, FLOWER_CONFIG.logging),
             environment = {**props.env_vars},
             secrets = props.secret_env_vars,
             entry_point = FLOWER_CONFIG.entry_point,
@@ -47,6 +47,9 @@ class WebserverConstruct(cdk.Construct):
             port_mappings = [ecs.PortMapping(container_port = FLOWER_CONFIG.container_port)]
         )
 
+        # Added last so the Airflow container stays the task's default container
+        props.metrics.add_statsd_sidecar(webserver_task, props.logging)
+
         # I'm not making the webserver(s) highly available, just the scheduler /
         #   celery backend.  If the AZ goes down, fargate should be able to
         #   pop another one up quickly in one of the other available AZs.
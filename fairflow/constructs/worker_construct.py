@@ -5,12 +5,36 @@ from aws_cdk import (
 )
 
 from fairflow.constructs.contruct_properties import FairflowChildConstructProps
+from fairflow.constructs.profiling import (
+    profiling_env_vars,
+    profiling_linux_parameters
+)
 from fairflow.config import (
+    CELERY_WORKER_CONFIG,
+    CeleryWorkerConfig,
+    MULTI_TENANCY_CONFIG,
+    PROFILING_CONFIG,
     WORKER_AUTOSCALING_CONFIG,
     WORKER_CONFIG,
+    WORKER_LIFECYCLE_CONFIG,
     WORKER_TASK_CONFIG
 )
 
+def celery_worker_env_vars(config: CeleryWorkerConfig) -> dict:
+    """ Airflow [celery] options, plus fairflow_ext.celery_config for the rest """
+    env_vars = {
+        'AIRFLOW__CELERY__WORKER_CONCURRENCY': str(config.concurrency),
+        'AIRFLOW__CELERY__WORKER_PREFETCH_MULTIPLIER': str(config.prefetch_multiplier),
+        'AIRFLOW__CELERY__POOL': config.pool,
+        'AIRFLOW__CELERY__CELERY_CONFIG_OPTIONS': 'fairflow_ext.celery_config.CELERY_CONFIG',
+        'FAIRFLOW_CELERY_ACKS_LATE': str(config.acks_late).lower()
+    }
+    if config.autoscale_min is not None:
+        env_vars['AIRFLOW__CELERY__WORKER_AUTOSCALE'] = f'{config.concurrency},{config.autoscale_min}'
+    if config.max_tasks_per_child:
+        env_vars['FAIRFLOW_CELERY_MAX_TASKS_PER_CHILD'] = str(config.max_tasks_per_child)
+    return env_vars
+
 class WorkerConstruct(cdk.Construct):
     def __init__(self, scope: cdk.Construct, id: str, props: FairflowChildConstructProps):
         super().__init__(scope, id)
@@ -21,26 +45,72 @@ class WorkerConstruct(cdk.Construct):
             volumes = [props.shared_volume]
         )
         props.policies.attach_policies(worker_task.task_role)
+        if WORKER_LIFECYCLE_CONFIG.scale_in_protection:
+            # fairflow_ext.worker_lifecycle sets it through the ECS agent, as the task role
+            stack = cdk.Stack.of(self)
+            worker_task.add_to_task_role_policy(iam.PolicyStatement(
+                actions = ['ecs:GetTaskProtection',
+                           'ecs:UpdateTaskProtection'],
+                effect = iam.Effect.ALLOW,
+                resources = [f'arn:aws:ecs:{stack.region}:{stack.account}:task/{props.cluster.cluster_name}/*']
+            ))
 
         worker_task.add_container(WORKER_CONFIG.name,
             container_name = WORKER_CONFIG.name,
             image = ecs.ContainerImage.from_docker_image_asset(props.airflow_image),
-            logging = props.logging,
-            environment = props.env_vars,
+            logging = props.logging.driver(worker_task, WORKER_CONFIG.logging),
+            environment = {
+                **props.env_vars,
+                **profiling_env_vars('worker'),
+                **celery_worker_env_vars(CELERY_WORKER_CONFIG),
+                'FAIRFLOW_WORKER_SCALE_IN_PROTECTION': str(WORKER_LIFECYCLE_CONFIG.scale_in_protection).lower(),
+                'FAIRFLOW_WORKER_PROTECTION_EXPIRES_MINUTES': str(WORKER_LIFECYCLE_CONFIG.protection_expires_in_minutes),
+                'FAIRFLOW_WORKER_PROTECTION_POLL_SECONDS': str(WORKER_LIFECYCLE_CONFIG.protection_poll_seconds)
+            },
             secrets = props.secret_env_vars,
+            linux_parameters = profiling_linux_parameters(self, 'WorkerLinuxParameters'),
             entry_point = WORKER_CONFIG.entry_point,
             command = WORKER_CONFIG.command,
+            # Celery's warm shutdown gets this long to finish the running tasks (see the
+            #   run_celery_worker in default_entrypoint.sh)
+            stop_timeout = cdk.Duration.seconds(WORKER_LIFECYCLE_CONFIG.stop_timeout_seconds),
             port_mappings = [ecs.PortMapping(container_port = WORKER_CONFIG.container_port)]
         ).add_mount_points(props.mounting_point)
 
-        desired_count = 2 if props.highly_available else 1
+        # Added last so the Airflow container stays the task's default container
+        props.metrics.add_statsd_sidecar(worker_task, props.logging)
+
+        # A tenant's Workers stay within its budget of the shared capacity
+        self.max_workers = props.tenant.max_workers if props.tenant \
+                           else WORKER_AUTOSCALING_CONFIG.max_task_count
+        self.desired_count = min(2 if props.highly_available else 1, self.max_workers)
 
         self.worker_service = ecs.FargateService(self, 'WorkerService',
             cluster = props.cluster,
             task_definition = worker_task,
             security_group = props.vpc_props.default_vpc_security_group,
             platform_version = ecs.FargatePlatformVersion.VERSION1_4,
-            desired_count = desired_count
+            desired_count = self.desired_count,
+            min_healthy_percent = WORKER_LIFECYCLE_CONFIG.min_healthy_percent,
+            max_healthy_percent = WORKER_LIFECYCLE_CONFIG.max_healthy_percent,
+            circuit_breaker = ecs.DeploymentCircuitBreaker(
+                rollback = WORKER_LIFECYCLE_CONFIG.circuit_breaker_rollback
+            ),
+            # For on-demand py-spy profiles, see README -> Scheduler Construct
+            enable_execute_command = PROFILING_CONFIG.enable_execute_command,
+            # Past the on-demand base, on the cluster's (shared) Spot capacity
+            #   see: https://docs.aws.amazon.com/AmazonECS/latest/developerguide/fargate-capacity-providers.html
+            capacity_provider_strategies = [
+                ecs.CapacityProviderStrategy(
+                    capacity_provider = 'FARGATE',
+                    base = MULTI_TENANCY_CONFIG.worker_on_demand_base,
+                    weight = 0
+                ),
+                ecs.CapacityProviderStrategy(
+                    capacity_provider = 'FARGATE_SPOT',
+                    weight = 1
+                )
+            ] if MULTI_TENANCY_CONFIG.spot_workers else None
         )
 
         if props.enable_autoscaling:
@@ -49,8 +119,8 @@ class WorkerConstruct(cdk.Construct):
 
     def configure_auto_scaling(self) -> None:
         scaling = self.worker_service.auto_scale_task_count(
-            max_capacity = WORKER_AUTOSCALING_CONFIG.max_task_count,
-            min_capacity = WORKER_AUTOSCALING_CONFIG.min_task_count
+            max_capacity = self.max_workers,
+            min_capacity = min(WORKER_AUTOSCALING_CONFIG.min_task_count, self.max_workers)
         )
 
         if WORKER_AUTOSCALING_CONFIG.cpu_usage_percent:
@@ -1,3 +1,5 @@
+from dataclasses import replace
+
 from aws_cdk import (
     core as cdk,
     aws_ec2 as ec2,
@@ -5,24 +7,54 @@ from aws_cdk import (
     aws_elasticache as ecache
 )
 
+from fairflow.config import MULTI_TENANCY_CONFIG
 from fairflow.constructs.fairflow_construct import FairflowConstruct
+from fairflow.constructs.data_construct import FairflowDataConstruct
+from fairflow.constructs.vpc_endpoints_construct import VpcEndpointsConstruct
 from fairflow.constructs.contruct_properties import (
     VpcProps,
     FairflowConstructProps
 )
 
-class FairflowStack(cdk.Stack):
+# The three stacks are deployed in this order, and torn down in reverse.  Each one tags
+#   its resources with its own name e.g. FairflowStack (should be useful for filtering billing)
+#   see: https://docs.aws.amazon.com/cdk/latest/guide/resources.html#resource_stack
+#        about how references between them become CloudFormation exports / imports
+
+def with_imported_security_group(stack: cdk.Stack, props: FairflowConstructProps) -> FairflowConstructProps:
+    """
+    The shared Security Group, imported into stack.  Ingress / egress rules added to it
+    are then created in that stack, the network stack can't have rules that reference
+    e.g. the load balancer's Security Group in the compute stack (a cyclic reference)
+    """
+    security_group = ec2.SecurityGroup.from_security_group_id(stack, 'FairflowSecurityGroup',
+        props.vpc_props.default_vpc_security_group.security_group_id
+    )
+    return replace(props, vpc_props = replace(props.vpc_props, default_vpc_security_group = security_group))
+
+
+class FairflowNetworkStack(cdk.Stack):
+    """ VPC, ECS Cluster, Security Group (shared by assets), VPC endpoints and the Bastion """
 
     def __init__(self, scope: cdk.Construct, construct_id: str, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
-        # Tag everything with the name of the stack e.g. FairflowStack
-        #   (should be useful for filtering billing)
-        cdk.Tags.of(scope).add('Stack', construct_id)
-        # Create VPC, ECS Cluster, Security Group (shared by assets)
+        cdk.Tags.of(self).add('Stack', construct_id)
         vpc = ec2.Vpc(self, 'FairflowVpc', max_azs=2)
-        cluster = ecs.Cluster(self, 'FairflowECSCluster', vpc=vpc)
+        # Container Insights gives us per service / task family CPU and memory usage,
+        #   see helpers/rightsizing.py.  FARGATE / FARGATE_SPOT capacity providers for the
+        #   Spot Workers (see MULTI_TENANCY_CONFIG)
+        self.cluster = ecs.Cluster(self, 'FairflowECSCluster', vpc=vpc, container_insights=True,
+            enable_fargate_capacity_providers = MULTI_TENANCY_CONFIG.spot_workers
+        )
         default_vpc_security_group = ec2.SecurityGroup(self, 'FairflowSecurityGroup', vpc = vpc)
+        self.vpc_props = VpcProps(
+            vpc = vpc,
+            default_vpc_security_group = default_vpc_security_group
+        )
+
+        # S3 gateway / AWS service interface endpoints (see VPC_ENDPOINTS_CONFIG in the config)
+        VpcEndpointsConstruct(self, 'FairflowVpcEndpoints', vpc_props = self.vpc_props)
 
         # Create a Bastion Host so we can inspect the airflow metadb / look at EFS
         # You can comment this out if you don't want it
@@ -31,15 +63,30 @@ class FairflowStack(cdk.Stack):
             security_group = default_vpc_security_group,
         )
 
-        # Create Webserver(s), Scheduler(s), Worker(s), Redis
-        FairflowConstruct(self, 'FairflowConstruct',
-            FairflowConstructProps(
-                vpc_props = VpcProps(
-                    vpc = vpc,
-                    default_vpc_security_group = default_vpc_security_group
-                ),
-                cluster = cluster,
-                highly_available = False,
-                enable_autoscaling = False
-            )
-        )
+
+class FairflowDataStack(cdk.Stack):
+    """ S3 buckets, EFS, the metadata DB, Redis and secrets (see FairflowDataConstruct) """
+
+    def __init__(self, scope: cdk.Construct, construct_id: str,
+                       props: FairflowConstructProps, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        cdk.Tags.of(self).add('Stack', construct_id)
+        self.data = FairflowDataConstruct(self, 'FairflowConstruct',
+            with_imported_security_group(self, props))
+
+
+class FairflowStack(cdk.Stack):
+    """
+    Webserver(s), Scheduler(s), Worker(s) and the External Tasks.  Keeps the name of the
+    single stack this used to be, the task families (e.g. BigGuys-FairflowStack) the
+    DAGs launch are named after it
+    """
+
+    def __init__(self, scope: cdk.Construct, construct_id: str,
+                       props: FairflowConstructProps, data: FairflowDataConstruct, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        cdk.Tags.of(self).add('Stack', construct_id)
+        # Create Webserver(s), Scheduler(s), Worker(s)
+        FairflowConstruct(self, 'FairflowConstruct', with_imported_security_group(self, props), data)
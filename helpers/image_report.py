@@ -0,0 +1,95 @@
+"""
+Build an image directory at the working tree and at a git ref, and report the size and
+estimated pull time difference (needs docker).  Run on synth with
+
+    cdk synth -c image_report=true [-c image_report_baseline=<git ref>]
+
+or directly with
+
+    python helpers/image_report.py ./airflow [--baseline-ref HEAD~1]
+
+The baseline defaults to where the branch forked from the main one (its merge-base), so
+the branch's committed changes are in the report too, not only the uncommitted ones
+"""
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import zlib
+from argparse import ArgumentParser
+from typing import Tuple
+
+# What we typically see pulling from ECR on Fargate, override with --bandwidth-mb-s
+DEFAULT_BANDWIDTH_MB_S = 50
+# The main branch, the first of these that exists
+MAIN_BRANCHES = ['origin/HEAD', 'origin/main', 'main', 'origin/master', 'master']
+
+
+def build(context: str, tag: str) -> None:
+    subprocess.run(['docker', 'build', '--quiet', '-t', tag, context],
+                   check = True, stdout = subprocess.DEVNULL)
+
+
+def sizes(tag: str) -> Tuple[int, int]:
+    """ (uncompressed, gzip compressed) size in bytes, the registry stores layers gzipped """
+    uncompressed = int(subprocess.run(['docker', 'image', 'inspect', '--format', '{{.Size}}', tag],
+                                      check = True, capture_output = True, text = True).stdout)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    compressed = 0
+    with subprocess.Popen(['docker', 'save', tag], stdout = subprocess.PIPE) as save:
+        for chunk in iter(lambda: save.stdout.read(1024 * 1024), b''):
+            compressed += len(compressor.compress(chunk))
+    compressed += len(compressor.flush())
+    return uncompressed, compressed
+
+
+def default_baseline() -> str:
+    for branch in MAIN_BRANCHES:
+        merge_base = subprocess.run(['git', 'merge-base', 'HEAD', branch], capture_output = True, text = True)
+        if merge_base.returncode == 0:
+            return merge_base.stdout.strip()
+    raise SystemExit(f'None of {", ".join(MAIN_BRANCHES)} to compare against, pass a baseline ref')
+
+
+def checkout(ref: str, directory: str, dest: str) -> str:
+    archive = subprocess.run(['git', 'archive', '--format=tar', ref, directory],
+                             check = True, capture_output = True).stdout
+    tar_path = os.path.join(dest, 'context.tar')
+    with open(tar_path, 'wb') as f:
+        f.write(archive)
+    with tarfile.open(tar_path) as tar:
+        tar.extractall(dest)
+    return os.path.join(dest, directory)
+
+
+def report(directory: str, baseline_ref: str = None,
+           bandwidth_mb_s: float = DEFAULT_BANDWIDTH_MB_S) -> None:
+    baseline_ref = baseline_ref or default_baseline()
+    directory = os.path.normpath(directory)
+    name = os.path.basename(directory)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, context in [(baseline_ref, checkout(baseline_ref, directory, tmp)),
+                               ('working tree', directory)]:
+            tag = f'fairflow-image-report/{name}:{"baseline" if context.startswith(tmp) else "current"}'
+            build(context, tag)
+            results[label] = sizes(tag)
+
+    mb = 1000 * 1000
+    print(f'\nImage report for {directory} (pull time at {bandwidth_mb_s} MB/s)', file = sys.stderr)
+    for label, (uncompressed, compressed) in results.items():
+        print(f'  {label:>14}: {uncompressed / mb:8.1f} MB uncompressed, {compressed / mb:8.1f} MB '
+              f'compressed, ~{compressed / mb / bandwidth_mb_s:5.1f}s pull', file = sys.stderr)
+    (_, before), (_, after) = results.values()
+    print(f'  {"difference":>14}: {(after - before) / mb:+8.1f} MB compressed, '
+          f'{(after - before) / mb / bandwidth_mb_s:+5.1f}s pull\n', file = sys.stderr)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'Compare image size / pull time against a git ref')
+    parser.add_argument('directory', help = 'docker build context, e.g. ./airflow')
+    parser.add_argument('--baseline-ref', help = 'default: the merge-base with the main branch')
+    parser.add_argument('--bandwidth-mb-s', type = float, default = DEFAULT_BANDWIDTH_MB_S)
+    args = parser.parse_args()
+    report(args.directory, args.baseline_ref, args.bandwidth_mb_s)
@@ -0,0 +1,154 @@
+"""
+Enqueue / dequeue throughput of the Redis Celery broker for a RedisBrokerConfig (see
+REDIS_BROKER_CONFIG in fairflow/config.py), against a local redis:6.2.5 container started
+with the same settings and task size.  Needs docker, and celery[redis] installed locally
+
+    python helpers/redis_broker_benchmark.py --messages 100000 --maxmemory-mib 768 \
+        [--cpus 0.5 --memory-mib 1024] [--appendonly] [--snapshots] [--io-threads 1]
+
+Messages are shaped like the CeleryExecutor's (an execute_command task with an `airflow
+tasks run` command) and published to the default queue, then drained by a consumer that
+acks each one the way a Worker does.  With noeviction, a backlog that outgrows maxmemory
+has its publishes refused rather than queued messages dropped, reported as rejected
+"""
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from typing import List
+
+from celery import Celery
+from kombu import Connection, Consumer, Exchange, Queue
+from redis import Redis
+from redis.exceptions import ConnectionError
+
+# Keep in sync with redis_server_args in fairflow/constructs/redis_construct.py
+REDIS_IMAGE = 'redis:6.2.5'
+SNAPSHOTS = '3600 1 300 100 60 10000'
+
+CONTAINER = 'fairflow-redis-benchmark'
+PORT = 6390
+# Airflow's [celery] default_queue
+QUEUE = 'default'
+TASK_NAME = 'airflow.executors.celery_executor.execute_command'
+
+
+def start_redis(maxmemory_mib: int, maxmemory_policy: str, appendonly: bool, snapshots: bool,
+                io_threads: int, cpus: float, memory_mib: int) -> Redis:
+    subprocess.run(['docker', 'run', '--detach', '--rm', '--name', CONTAINER, '-p', f'{PORT}:6379',
+                    '--cpus', str(cpus), '--memory', f'{memory_mib}m', REDIS_IMAGE,
+                    'redis-server',
+                    '--maxmemory', f'{maxmemory_mib}mb',
+                    '--maxmemory-policy', maxmemory_policy,
+                    '--appendonly', 'yes' if appendonly else 'no',
+                    '--save', SNAPSHOTS if snapshots else '',
+                    '--io-threads', str(io_threads)],
+                   check = True, stdout = subprocess.DEVNULL)
+    redis = Redis(port = PORT)
+    for _ in range(50):
+        try:
+            redis.ping()
+            return redis
+        except ConnectionError:
+            time.sleep(0.2)
+    raise RuntimeError(f'{CONTAINER} did not come up')
+
+
+def command(i: int, payload_bytes: int) -> List[str]:
+    # Padded out with the --subdir path, to about the size of your real commands
+    command = ['airflow', 'tasks', 'run', 'benchmark_dag', f'task_{i}',
+               '2021-08-01T00:00:00+00:00', '--local', '--pool', 'default_pool', '--subdir']
+    return command + ['/shared-dags/' + 'x' * max(0, payload_bytes - len(' '.join(command)))]
+
+
+def enqueue(url: str, messages: int, payload_bytes: int) -> dict:
+    app = Celery('fairflow_benchmark', broker = url)
+    sent = 0
+    rejected = 0
+    start = time.monotonic()
+    with app.producer_or_acquire() as producer:
+        for i in range(messages):
+            try:
+                app.send_task(TASK_NAME, args = [command(i, payload_bytes)], queue = QUEUE,
+                              producer = producer)
+                sent += 1
+            except Exception as error:
+                if 'OOM' not in str(error):
+                    raise
+                # Full, everything from here on would be refused too
+                rejected = messages - i
+                break
+    return {'sent': sent, 'rejected': rejected, 'seconds': time.monotonic() - start}
+
+
+def dequeue(url: str, expected: int, prefetch: int) -> dict:
+    received = 0
+
+    def on_message(body, message):
+        nonlocal received
+        message.ack()
+        received += 1
+
+    queue = Queue(QUEUE, Exchange(QUEUE), routing_key = QUEUE)
+    start = time.monotonic()
+    with Connection(url) as connection:
+        with Consumer(connection, queues = [queue], callbacks = [on_message], accept = ['json']) as consumer:
+            consumer.qos(prefetch_count = prefetch)
+            while received < expected:
+                connection.drain_events(timeout = 10)
+    return {'received': received, 'seconds': time.monotonic() - start}
+
+
+def benchmark(messages: int, payload_bytes: int, runs: int, prefetch: int, **redis_settings) -> None:
+    redis = start_redis(**redis_settings)
+    url = f'redis://localhost:{PORT}/0'
+    results = {'enqueue': [], 'dequeue': []}
+    try:
+        for _ in range(runs):
+            redis.flushall()
+            redis.config_resetstat()
+            used_before = redis.info('memory')['used_memory']
+            sent = enqueue(url, messages, payload_bytes)
+            memory = redis.info('memory')
+            received = dequeue(url, sent['sent'], prefetch)
+            results['enqueue'].append(sent['sent'] / sent['seconds'])
+            results['dequeue'].append(received['received'] / received['seconds'])
+            print(f'  sent {sent["sent"]} ({sent["rejected"]} rejected), '
+                  f'{(memory["used_memory"] - used_before) / max(sent["sent"], 1):.0f} bytes/message queued, '
+                  f'peak {memory["used_memory_peak_human"]}', file = sys.stderr)
+    finally:
+        subprocess.run(['docker', 'stop', CONTAINER], stdout = subprocess.DEVNULL)
+
+    print(f'\nBroker throughput, {messages} messages of ~{payload_bytes} bytes ({runs} runs) with '
+          + ', '.join(f'{name} {value}' for name, value in redis_settings.items()), file = sys.stderr)
+    for label, rates in results.items():
+        print(f'  {label:>8}: median {statistics.median(rates):9.0f} msg/s, '
+              f'min {min(rates):9.0f}, max {max(rates):9.0f}', file = sys.stderr)
+    # Locally there's no network between the Scheduler / Workers and Redis, so compare
+    #   configs with this, not absolute numbers
+    print('  (one local producer / consumer, expect lower rates per client over the VPC)\n',
+          file = sys.stderr)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'Celery broker enqueue / dequeue throughput for a Redis config')
+    parser.add_argument('--messages', type = int, default = 20000)
+    parser.add_argument('--payload-bytes', type = int, default = 300,
+                        help = 'size of the airflow tasks run command in each message')
+    parser.add_argument('--runs', type = int, default = 3)
+    parser.add_argument('--prefetch', type = int, default = 4,
+                        help = 'consumer prefetch, Celery worker_prefetch_multiplier x concurrency')
+    # RedisBrokerConfig
+    parser.add_argument('--maxmemory-mib', type = int, default = 768)
+    parser.add_argument('--maxmemory-policy', default = 'noeviction')
+    parser.add_argument('--appendonly', action = 'store_true')
+    parser.add_argument('--snapshots', action = 'store_true')
+    parser.add_argument('--io-threads', type = int, default = 1)
+    parser.add_argument('--cpus', type = float, default = 0.5, help = 'task cpu / 1024')
+    parser.add_argument('--memory-mib', type = int, default = 1024, help = 'task memory_limit_mib')
+    args = parser.parse_args()
+    benchmark(args.messages, args.payload_bytes, args.runs, args.prefetch,
+              maxmemory_mib = args.maxmemory_mib, maxmemory_policy = args.maxmemory_policy,
+              appendonly = args.appendonly, snapshots = args.snapshots, io_threads = args.io_threads,
+              cpus = args.cpus, memory_mib = args.memory_mib)
@@ -0,0 +1,120 @@
+"""
+Right-sizing recommendations for the Fargate task configs, from Container Insights data.
+
+Export the task level performance events of the cluster with a CloudWatch Logs Insights
+query on /aws/ecs/containerinsights/{cluster}/performance (Export results -> CSV)
+
+    fields @timestamp, ServiceName, TaskDefinitionFamily,
+           CpuUtilized, CpuReserved, MemoryUtilized, MemoryReserved
+    | filter Type = "Task"
+
+then run
+
+    python helpers/rightsizing.py insights.csv
+
+Services are grouped by ServiceName, External Tasks (which have no service) by their
+TaskDefinitionFamily.  For each group we take the p95 / p99 CPU and memory used, size
+CPU so p95 sits at --cpu-target utilization and memory so p99 has --memory-headroom to
+spare, and pick the cheapest valid Fargate cpu / memory combination that fits
+"""
+import csv
+import math
+from argparse import ArgumentParser
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Valid Fargate cpu (units) -> memory (MiB) combinations
+#   see: https://docs.aws.amazon.com/AmazonECS/latest/developerguide/task-cpu-memory-error.html
+FARGATE_COMBINATIONS: Dict[int, List[int]] = {
+    256: [512, 1024, 2048],
+    512: list(range(1024, 4096 + 1, 1024)),
+    1024: list(range(2048, 8192 + 1, 1024)),
+    2048: list(range(4096, 16384 + 1, 1024)),
+    4096: list(range(8192, 30720 + 1, 1024)),
+    8192: list(range(16384, 61440 + 1, 4096)),
+    16384: list(range(32768, 122880 + 1, 8192)),
+}
+
+# us-east-1 Linux/x86 on-demand prices
+VCPU_HOUR_USD = 0.04048
+GB_HOUR_USD = 0.004445
+HOURS_PER_MONTH = 730
+
+
+def percentile(values: List[float], pct: float) -> float:
+    # nearest-rank
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def monthly_cost(cpu: int, memory_mib: int) -> float:
+    return (cpu / 1024 * VCPU_HOUR_USD + memory_mib / 1024 * GB_HOUR_USD) * HOURS_PER_MONTH
+
+
+def fit(cpu_needed: float, memory_needed: float) -> Tuple[int, int]:
+    candidates = [(cpu, memory) for cpu, memories in FARGATE_COMBINATIONS.items()
+                  for memory in memories if cpu >= cpu_needed and memory >= memory_needed]
+    if not candidates:
+        raise ValueError(f'No Fargate size fits {cpu_needed:.0f} cpu / {memory_needed:.0f} MiB')
+    return min(candidates, key = lambda size: monthly_cost(*size))
+
+
+def load(path: str) -> Dict[str, Dict[str, List[float]]]:
+    series = defaultdict(lambda: defaultdict(list))
+    with open(path, newline = '') as f:
+        for row in csv.DictReader(f):
+            name = row.get('ServiceName') or row.get('TaskDefinitionFamily')
+            if not name:
+                continue
+            for metric in ('CpuUtilized', 'CpuReserved', 'MemoryUtilized', 'MemoryReserved'):
+                if row.get(metric):
+                    series[name][metric].append(float(row[metric]))
+    return series
+
+
+def recommend(series: Dict[str, Dict[str, List[float]]],
+              cpu_target: float, memory_headroom: float) -> List[dict]:
+    recommendations = []
+    for name, metrics in sorted(series.items()):
+        if not metrics['CpuUtilized'] or not metrics['MemoryUtilized']:
+            continue
+        cpu_p95 = percentile(metrics['CpuUtilized'], 95)
+        cpu_p99 = percentile(metrics['CpuUtilized'], 99)
+        memory_p95 = percentile(metrics['MemoryUtilized'], 95)
+        memory_p99 = percentile(metrics['MemoryUtilized'], 99)
+        current = (int(max(metrics['CpuReserved'])), int(max(metrics['MemoryReserved']))) \
+            if metrics['CpuReserved'] and metrics['MemoryReserved'] else None
+        cpu, memory = fit(cpu_p95 / cpu_target, memory_p99 * (1 + memory_headroom))
+        recommendations.append({
+            'name': name,
+            'samples': len(metrics['CpuUtilized']),
+            'cpu_p95': cpu_p95, 'cpu_p99': cpu_p99,
+            'memory_p95': memory_p95, 'memory_p99': memory_p99,
+            'current': current,
+            'recommended': (cpu, memory),
+            'monthly_delta_usd': monthly_cost(cpu, memory) - monthly_cost(*current) if current else None,
+        })
+    return recommendations
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'Recommend Fargate TaskConfig values from Container Insights data')
+    parser.add_argument('path', help = 'CSV export of the Container Insights task performance events')
+    parser.add_argument('--cpu-target', type = float, default = 0.7,
+                        help = 'p95 CPU utilization to size for (default 0.7)')
+    parser.add_argument('--memory-headroom', type = float, default = 0.2,
+                        help = 'headroom over p99 memory (default 0.2)')
+    args = parser.parse_args()
+
+    total_delta = 0.0
+    for r in recommend(load(args.path), args.cpu_target, args.memory_headroom):
+        cpu, memory = r['recommended']
+        print(f"# {r['name']} ({r['samples']} samples)")
+        print(f"#   cpu units p95/p99: {r['cpu_p95']:.0f}/{r['cpu_p99']:.0f}, "
+              f"memory MiB p95/p99: {r['memory_p95']:.0f}/{r['memory_p99']:.0f}")
+        if r['current']:
+            print(f"#   current: cpu = {r['current'][0]}, memory_limit_mib = {r['current'][1]}, "
+                  f"projected change: {r['monthly_delta_usd']:+.2f} USD/month per task")
+            total_delta += r['monthly_delta_usd']
+        print(f"TaskConfig(\n    cpu = {cpu},\n    memory_limit_mib = {memory}\n)\n")
+    print(f"# Projected change: {total_delta:+.2f} USD/month (one task of each, running all month)")
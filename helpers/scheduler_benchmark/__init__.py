@@ -0,0 +1,22 @@
+"""
+Scheduler throughput benchmark, to see what a tuning change (parallelism, number of
+Schedulers / Workers, Celery or broker settings, DB size) does before deploying it.  Needs
+docker, run from the repo root in the CDK virtualenv (the stand-in mirrors fairflow/config.py)
+
+    python -m helpers.scheduler_benchmark run --dags 50 --tasks 20 --shape diamond \\
+        [--task-seconds 0] [--schedulers 1] [--workers 2] \\
+        [--env AIRFLOW__CORE__PARALLELISM=32] [--output result.json] \\
+        [--baseline baseline.json --max-regression-percent 10]
+
+Generates --dags synthetic DAGs of --tasks no-op PythonOperators each (see dag_generator),
+starts a local stand-in of the stack on a docker network (stack.py): MySQL 8.0 with the DB
+sizing profile's parameters, Redis with REDIS_BROKER_CONFIG, and Scheduler / Worker
+containers of the Airflow image, sized like their task configs, with the same Airflow and
+CELERY_WORKER_CONFIG settings.  Once every DAG is parsed they're all unpaused at once, and
+when their runs are done the report (report.py) is printed: tasks / second, scheduling and
+pickup latency percentiles and the DB queries per task.  With --baseline (a previous
+--output), it exits 1 when a number regressed by more than --max-regression-percent, to
+gate a tuning PR on.  To only write the DAGs somewhere, e.g. to run them on a deployed stack
+
+    python -m helpers.scheduler_benchmark generate --dags 50 --tasks 20 --dag-folder ./bench
+"""
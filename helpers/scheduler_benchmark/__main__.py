@@ -0,0 +1,132 @@
+import json
+import os
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import datetime
+
+from helpers.scheduler_benchmark import dag_generator, report, stack
+
+POLL_SECONDS = 5
+
+
+def global_status() -> dict:
+    names = ', '.join(f"'{counter}'" for counter in report.QUERY_COUNTERS)
+    return {name: int(value) for name, value in stack.sql(f'SHOW GLOBAL STATUS WHERE Variable_name IN ({names})')}
+
+
+def benchmark_dags(condition: str) -> int:
+    return int(stack.sql(f"SELECT COUNT(*) FROM dag WHERE dag_id LIKE '{dag_generator.DAG_ID_PREFIX}%' "
+                         f'AND {condition}')[0][0])
+
+
+def finished_runs() -> int:
+    return int(stack.sql(f"SELECT COUNT(*) FROM dag_run WHERE dag_id LIKE '{dag_generator.DAG_ID_PREFIX}%' "
+                         "AND state IN ('success', 'failed')")[0][0])
+
+
+def run(args) -> int:
+    dag_folder = os.path.abspath(args.dag_folder or tempfile.mkdtemp(prefix = 'fairflow-benchmark-'))
+    manifest = dag_generator.generate(dag_folder, args.dags, args.tasks, args.shape, args.task_seconds)
+    env = dict(setting.split('=', 1) for setting in args.env)
+    image = args.image or stack.build_image()
+
+    stack.stop()
+    try:
+        print(f'Starting {args.schedulers} Scheduler(s) and {args.workers} Worker(s)', file = sys.stderr)
+        stack.start(dag_folder, image, args.schedulers, args.workers, args.db_cpus, args.db_memory_mib, env)
+        # Parsed (next run known), so they're all ready to go at the same moment
+        stack.wait_for(f'{args.dags} DAGs to be parsed',
+                       lambda: benchmark_dags('next_dagrun_create_after IS NOT NULL') == args.dags,
+                       timeout_seconds = 600, poll_seconds = POLL_SECONDS)
+
+        stack.sql('TRUNCATE performance_schema.events_statements_summary_by_digest')
+        status_before = global_status()
+        unpaused_at = datetime.fromisoformat(stack.sql('SELECT UTC_TIMESTAMP(6)')[0][0])
+        stack.sql(f"UPDATE dag SET is_paused = 0 WHERE dag_id LIKE '{dag_generator.DAG_ID_PREFIX}%'")
+        print(f'Unpaused {args.dags} DAGs of {args.tasks} {args.shape} tasks', file = sys.stderr)
+
+        deadline = time.monotonic() + args.timeout_minutes * 60
+        while finished_runs() < args.dags and time.monotonic() < deadline:
+            time.sleep(POLL_SECONDS)
+        status_after = global_status()
+
+        prefix = dag_generator.DAG_ID_PREFIX
+        runs = stack.sql(f"SELECT dag_id, state, start_date FROM dag_run WHERE dag_id LIKE '{prefix}%'")
+        tis = stack.sql('SELECT dag_id, task_id, state, queued_dttm, start_date, end_date '
+                        f"FROM task_instance WHERE dag_id LIKE '{prefix}%'")
+        digests = stack.sql('SELECT COUNT_STAR, DIGEST_TEXT FROM performance_schema.events_statements_summary_by_digest '
+                            "WHERE SCHEMA_NAME = 'airflow' ORDER BY COUNT_STAR DESC LIMIT 10")
+    finally:
+        if not args.keep:
+            stack.stop()
+
+    result = report.summarize(manifest, unpaused_at, runs, tis, status_before, status_after, digests)
+    result['timed_out'] = result['dag_runs_finished'] < args.dags
+    result['settings'] = {'shape': args.shape, 'task_seconds': args.task_seconds,
+                          'schedulers': args.schedulers, 'workers': args.workers,
+                          'db_cpus': args.db_cpus, 'db_memory_mib': args.db_memory_mib, 'env': env}
+    output = json.dumps(result, indent = 2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+    print(f'\n{result["tasks_succeeded"]}/{result["tasks"]} tasks in {result["seconds"]}s, '
+          f'{result["tasks_per_second"]} tasks/s, {result["queries_per_task"]} queries/task '
+          f'(the polling here adds a few)', file = sys.stderr)
+    for name in ('scheduling_seconds', 'pickup_seconds', 'end_to_end_seconds'):
+        print(f'  {name:>20}: {result[name]}', file = sys.stderr)
+    if result['timed_out']:
+        print(f'  Timed out after {args.timeout_minutes} minutes', file = sys.stderr)
+        return 1
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            found = report.regressions(result, json.load(baseline_file), args.max_regression_percent)
+        for regression in found:
+            print(f'  Regressed {regression}', file = sys.stderr)
+        return 1 if found else 0
+    return 0
+
+
+def add_dag_args(parser: ArgumentParser) -> None:
+    parser.add_argument('--dags', type = int, default = 50)
+    parser.add_argument('--tasks', type = int, default = 20, help = 'per DAG')
+    parser.add_argument('--shape', choices = sorted(dag_generator.SHAPES), default = 'diamond')
+    parser.add_argument('--task-seconds', type = float, default = 0, help = 'how long each no-op sleeps')
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(prog = 'python -m helpers.scheduler_benchmark',
+                            description = 'Scheduler throughput benchmark against a local stand-in stack')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+
+    generate_parser = commands.add_parser('generate', help = 'only write the synthetic DAGs')
+    add_dag_args(generate_parser)
+    generate_parser.add_argument('--dag-folder', required = True)
+
+    run_parser = commands.add_parser('run', help = 'generate, run and report')
+    add_dag_args(run_parser)
+    run_parser.add_argument('--dag-folder', help = 'where to write the DAGs, a temp dir by default')
+    run_parser.add_argument('--schedulers', type = int, default = 1)
+    run_parser.add_argument('--workers', type = int, default = 1)
+    run_parser.add_argument('--db-cpus', type = float, default = 1, help = 'db.t2.small by default')
+    run_parser.add_argument('--db-memory-mib', type = int, default = 2048)
+    run_parser.add_argument('--env', action = 'append', default = [], metavar = 'NAME=VALUE',
+                            help = 'Airflow setting to try, e.g. AIRFLOW__CORE__PARALLELISM=32')
+    run_parser.add_argument('--image', help = 'an Airflow image to use instead of building ./airflow')
+    run_parser.add_argument('--timeout-minutes', type = float, default = 30)
+    run_parser.add_argument('--keep', action = 'store_true', help = 'leave the containers running')
+    run_parser.add_argument('--output', help = 'write the JSON result here, e.g. for --baseline')
+    run_parser.add_argument('--baseline', help = 'a previous --output to gate on')
+    run_parser.add_argument('--max-regression-percent', type = float, default = 10)
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        dag_generator.generate(args.dag_folder, args.dags, args.tasks, args.shape, args.task_seconds)
+        print(f'Wrote {args.dags} DAGs to {args.dag_folder}', file = sys.stderr)
+    else:
+        sys.exit(run(args))
@@ -0,0 +1,76 @@
+"""
+Synthetic benchmark DAGs: --dags files of --tasks no-op tasks in a given shape, plus a
+manifest of every DAG's task dependencies for the report
+"""
+import json
+import os
+from typing import Dict, List
+
+DAG_ID_PREFIX = 'bench_'
+MANIFEST = 'benchmark_manifest.json'
+
+# task_id -> upstream task_ids, for a DAG of n tasks
+SHAPES = {
+    # All independent, only the Scheduler's / Workers' limits matter
+    'parallel': lambda n: {f't{i:03d}': [] for i in range(n)},
+    # One after the other, every task waits on a scheduling loop
+    'linear': lambda n: {f't{i:03d}': [f't{i - 1:03d}'] if i else [] for i in range(n)},
+    'fan_out': lambda n: {f't{i:03d}': ['t000'] if i else [] for i in range(n)},
+    'fan_in': lambda n: {f't{i:03d}': [f't{j:03d}' for j in range(n - 1)] if i == n - 1 else []
+                         for i in range(n)},
+    # One root, n - 2 in parallel, one sink
+    'diamond': lambda n: {f't{i:03d}': (['t000'] if 0 < i < n - 1 else
+                                        [f't{j:03d}' for j in range(1, n - 1)] if i else [])
+                          for i in range(n)}
+}
+
+TEMPLATE = '''# Generated by helpers/scheduler_benchmark, don't edit
+import time
+from datetime import datetime
+
+from airflow import DAG
+from airflow.operators.python import PythonOperator
+
+UPSTREAM = {upstream!r}
+
+
+def noop():
+    time.sleep({task_seconds!r})
+
+
+# Paused until the benchmark unpauses every DAG at once, then runs once
+with DAG({dag_id!r},
+         start_date = datetime(2021, 8, 1),
+         schedule_interval = '@once',
+         is_paused_upon_creation = True,
+         catchup = False,
+         tags = ['benchmark']) as dag:
+
+    tasks = {{task_id: PythonOperator(task_id = task_id, python_callable = noop)
+             for task_id in UPSTREAM}}
+    for task_id, upstream in UPSTREAM.items():
+        for upstream_id in upstream:
+            tasks[upstream_id] >> tasks[task_id]
+'''
+
+
+def generate(dag_folder: str, dags: int, tasks: int, shape: str, task_seconds: float) -> Dict[str, Dict[str, List[str]]]:
+    if tasks < 3 and shape in ('fan_in', 'diamond'):
+        raise ValueError(f'A {shape} DAG needs at least 3 tasks')
+    os.makedirs(dag_folder, exist_ok = True)
+    # The containers run as airflow (uid 50000), which has to read the bind mount
+    os.chmod(dag_folder, 0o755)
+    manifest = {}
+    for index in range(dags):
+        dag_id = f'{DAG_ID_PREFIX}{shape}_{index:04d}'
+        upstream = SHAPES[shape](tasks)
+        path = os.path.join(dag_folder, f'{dag_id}.py')
+        with open(path, 'w') as dag_file:
+            dag_file.write(TEMPLATE.format(dag_id = dag_id, upstream = upstream,
+                                           task_seconds = task_seconds))
+        os.chmod(path, 0o644)
+        manifest[dag_id] = upstream
+    # Not a .py file, so the Scheduler doesn't parse it
+    with open(os.path.join(dag_folder, MANIFEST), 'w') as manifest_file:
+        json.dump(manifest, manifest_file)
+    return manifest
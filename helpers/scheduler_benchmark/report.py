@@ -0,0 +1,102 @@
+"""
+Throughput, latency and DB query numbers of a benchmark run, from the metadata DB, and the
+comparison against a baseline
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Summed into queries, from SHOW GLOBAL STATUS
+QUERY_COUNTERS = ('Questions', 'Com_select', 'Com_insert', 'Com_update', 'Com_delete')
+# metric -> True when higher is better, the numbers --baseline compares
+GATED_METRICS = {
+    'tasks_per_second': True,
+    'end_to_end_seconds.p95': False,
+    'queries_per_task': False
+}
+
+
+def timestamp(value: str) -> Optional[datetime]:
+    return None if value == 'NULL' else datetime.fromisoformat(value)
+
+
+def percentiles(values: List[float]) -> Optional[dict]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+    return {'p50': round(pick(50), 3), 'p95': round(pick(95), 3),
+            'p99': round(pick(99), 3), 'max': round(ordered[-1], 3)}
+
+
+def summarize(manifest: Dict[str, Dict[str, List[str]]], unpaused_at: datetime,
+              runs: List[List[str]], tis: List[List[str]],
+              status_before: Dict[str, int], status_after: Dict[str, int],
+              digests: List[List[str]]) -> dict:
+    """
+    runs are (dag_id, state, start_date) rows, tis (dag_id, task_id, state, queued_dttm,
+    start_date, end_date) and digests (count, statement) of the DAG runs
+    """
+    run_start = {dag_id: timestamp(start) for dag_id, _, start in runs}
+    by_task = {(dag_id, task_id): (state, timestamp(queued), timestamp(start), timestamp(end))
+               for dag_id, task_id, state, queued, start, end in tis}
+
+    scheduling, pickup, end_to_end = [], [], []
+    for (dag_id, task_id), (state, queued, start, end) in by_task.items():
+        upstream = manifest.get(dag_id, {}).get(task_id, [])
+        upstream_ends = [by_task.get((dag_id, upstream_id), (None,) * 4)[3] for upstream_id in upstream]
+        # Ready to run: when its DAG run started, or its last upstream task finished
+        if not upstream:
+            ready = run_start.get(dag_id)
+        elif all(upstream_ends):
+            ready = max(upstream_ends)
+        else:
+            ready = None
+        if ready and queued:
+            scheduling.append((queued - ready).total_seconds())
+        if queued and start:
+            pickup.append((start - queued).total_seconds())
+        if ready and start:
+            end_to_end.append((start - ready).total_seconds())
+
+    done = [task for task in by_task.values() if task[0] == 'success']
+    last_end = max((end for _, _, _, end in by_task.values() if end), default = None)
+    seconds = (last_end - unpaused_at).total_seconds() if last_end else None
+    queries = status_after['Questions'] - status_before['Questions']
+    return {
+        'dags': len(manifest),
+        'tasks': sum(len(tasks) for tasks in manifest.values()),
+        'tasks_succeeded': len(done),
+        'tasks_failed': len([task for task in by_task.values() if task[0] in ('failed', 'upstream_failed')]),
+        'dag_runs_finished': len([run for run in runs if run[1] in ('success', 'failed')]),
+        'seconds': round(seconds, 1) if seconds else None,
+        'tasks_per_second': round(len(done) / seconds, 3) if seconds else None,
+        # DAG run started -> queued, or upstream done -> queued
+        'scheduling_seconds': percentiles(scheduling),
+        # queued -> running on a Worker (broker, Celery, the task process starting)
+        'pickup_seconds': percentiles(pickup),
+        'end_to_end_seconds': percentiles(end_to_end),
+        'dag_run_created_seconds': percentiles([(start - unpaused_at).total_seconds()
+                                                for start in run_start.values() if start]),
+        'queries': {counter: status_after[counter] - status_before[counter] for counter in QUERY_COUNTERS},
+        'queries_per_task': round(queries / len(done), 1) if done else None,
+        'top_statements': [{'count': int(count), 'statement': statement[:200]} for count, statement in digests]
+    }
+
+
+def metric(result: dict, name: str) -> Optional[float]:
+    value = result
+    for key in name.split('.'):
+        value = (value or {}).get(key)
+    return value
+
+
+def regressions(result: dict, baseline: dict, max_regression_percent: float) -> List[str]:
+    found = []
+    for name, higher_is_better in GATED_METRICS.items():
+        value, base = metric(result, name), metric(baseline, name)
+        if value is None or not base:
+            continue
+        change = (value - base) / base * 100
+        if (-change if higher_is_better else change) > max_regression_percent:
+            found.append(f'{name}: {base} -> {value} ({change:+.1f}%)')
+    return found
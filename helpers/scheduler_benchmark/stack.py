@@ -0,0 +1,134 @@
+"""
+A local stand-in of the Fairflow stack on a docker network: MySQL, Redis and the
+Scheduler / Worker containers of the Airflow image, configured from fairflow/config.py
+"""
+import re
+import subprocess
+import time
+from typing import Dict, List
+
+from fairflow.config import (
+    CELERY_WORKER_CONFIG,
+    DEFAULT_DB_CONFIG,
+    REDIS_BROKER_CONFIG,
+    SCHEDULER_TASK_CONFIG,
+    WORKER_TASK_CONFIG
+)
+from fairflow.constructs.redis_construct import redis_server_args
+from fairflow.constructs.worker_construct import celery_worker_env_vars
+
+NETWORK = 'fairflow-benchmark'
+MYSQL = 'fairflow-benchmark-mysql'
+REDIS = 'fairflow-benchmark-redis'
+# Keep in sync with the engine versions in fairflow/constructs/rds_construct.py and
+#   redis_construct.py
+MYSQL_IMAGE = 'mysql:8.0.25'
+REDIS_IMAGE = 'redis:6.2.5'
+AIRFLOW_IMAGE = 'fairflow-benchmark-airflow'
+DB_URI = f'mysql+mysqldb://airflow:airflow@{MYSQL}:3306/airflow'
+
+# Keep in sync with ENV_VAR in fairflow/constructs/fairflow_construct.py (the settings that
+#   change how the Scheduler and Workers behave, not the AWS integrations)
+AIRFLOW_ENV_VARS = {
+    'AIRFLOW__CORE__EXECUTOR': 'CeleryExecutor',
+    'AIRFLOW__CORE__SQL_ALCHEMY_CONN': DB_URI,
+    'AIRFLOW__CORE__SQL_ENGINE_COLLATION_FOR_IDS': 'utf8mb3_general_ci',
+    'AIRFLOW__CORE__PARALLELISM': '16',
+    'AIRFLOW__CORE__DAG_CONCURRENCY': '4',
+    'AIRFLOW__CORE__MAX_ACTIVE_RUNS_PER_DAG': '1',
+    'AIRFLOW__CORE__LOAD_DEFAULT_CONNECTIONS': 'false',
+    'AIRFLOW__CORE__LOAD_EXAMPLES': 'false',
+    'AIRFLOW__CELERY__BROKER_URL': f'redis://:@{REDIS}:6379/0',
+    'AIRFLOW__CELERY__RESULT_BACKEND': f'db+{DB_URI}',
+    'AIRFLOW__CELERY_BROKER_TRANSPORT_OPTIONS__VISIBILITY_TIMEOUT': '1800',
+    'AIRFLOW__SCHEDULER__CATCHUP_BY_DEFAULT': 'false'
+}
+
+
+def docker(*args: str, capture: bool = False) -> str:
+    result = subprocess.run(['docker', *args], check = True, text = True,
+                            stdout = subprocess.PIPE if capture else subprocess.DEVNULL)
+    return result.stdout if capture else ''
+
+
+def mysql_args(parameters: Dict[str, str], memory_mib: int) -> List[str]:
+    """ The DB parameter group as mysqld options, RDS formulas worked out for memory_mib """
+    args = []
+    for name, value in (parameters or {}).items():
+        formula = re.fullmatch(r'\{DBInstanceClassMemory\*(\d+)/(\d+)\}', str(value))
+        if formula:
+            value = memory_mib * 1024 * 1024 * int(formula.group(1)) // int(formula.group(2))
+        args.append(f'--{name.replace("_", "-")}={value}')
+    return args
+
+
+def sql(query: str) -> List[List[str]]:
+    """ Rows (tab separated columns, NULL as 'NULL') of a query on the benchmark DB """
+    output = docker('exec', '-e', 'MYSQL_PWD=airflow', MYSQL, 'mysql', '-uairflow', '-h127.0.0.1',
+                    '--batch', '--skip-column-names', 'airflow', '-e', query, capture = True)
+    return [line.split('\t') for line in output.splitlines()]
+
+
+def wait_for(description: str, ready, timeout_seconds: float, poll_seconds: float = 2) -> None:
+    deadline = time.monotonic() + timeout_seconds
+    while time.monotonic() < deadline:
+        try:
+            if ready():
+                return
+        except subprocess.CalledProcessError:
+            pass
+        time.sleep(poll_seconds)
+    raise TimeoutError(f'Timed out waiting for {description}')
+
+
+def build_image() -> str:
+    docker('build', '--tag', AIRFLOW_IMAGE, './airflow')
+    return AIRFLOW_IMAGE
+
+
+def start(dag_folder: str, image: str, schedulers: int, workers: int,
+          db_cpus: float, db_memory_mib: int, env: Dict[str, str]) -> None:
+    docker('network', 'create', NETWORK)
+    docker('run', '--detach', '--rm', '--name', MYSQL, '--network', NETWORK,
+           '--cpus', str(db_cpus), '--memory', f'{db_memory_mib}m',
+           '-e', 'MYSQL_ROOT_PASSWORD=airflow', '-e', 'MYSQL_DATABASE=airflow',
+           '-e', 'MYSQL_USER=airflow', '-e', 'MYSQL_PASSWORD=airflow',
+           MYSQL_IMAGE, *mysql_args(DEFAULT_DB_CONFIG.sizing.parameters, db_memory_mib))
+    docker('run', '--detach', '--rm', '--name', REDIS, '--network', NETWORK,
+           '--cpus', '0.5', '--memory', '1024m', REDIS_IMAGE, *redis_server_args(REDIS_BROKER_CONFIG))
+    # The init server MySQL starts first only listens on the socket
+    wait_for('MySQL', lambda: sql('SELECT 1'), timeout_seconds = 180)
+    # For the global status counters and the statement digests in the report
+    docker('exec', '-e', 'MYSQL_PWD=airflow', MYSQL, 'mysql', '-uroot', '-h127.0.0.1', '-e',
+           "GRANT SELECT, DROP ON performance_schema.* TO 'airflow'@'%'")
+
+    airflow_env = {**AIRFLOW_ENV_VARS, **env}
+    docker('run', '--rm', '--network', NETWORK, *env_args(airflow_env), image, 'db', 'upgrade')
+
+    mount = ['--volume', f'{dag_folder}:/opt/airflow/dags:ro']
+    for index in range(schedulers):
+        docker('run', '--detach', '--rm', '--name', f'fairflow-benchmark-scheduler-{index}',
+               '--network', NETWORK, *mount, *task_size(SCHEDULER_TASK_CONFIG),
+               *env_args(airflow_env), image, 'scheduler')
+    # Explicit --env overrides win over CELERY_WORKER_CONFIG too
+    worker_env = {**AIRFLOW_ENV_VARS, **celery_worker_env_vars(CELERY_WORKER_CONFIG), **env}
+    for index in range(workers):
+        docker('run', '--detach', '--rm', '--name', f'fairflow-benchmark-worker-{index}',
+               '--hostname', f'worker-{index}', '--network', NETWORK, *mount,
+               *task_size(WORKER_TASK_CONFIG), *env_args(worker_env), image, 'celery', 'worker')
+
+
+def env_args(env: Dict[str, str]) -> List[str]:
+    return [arg for name, value in env.items() for arg in ('-e', f'{name}={value}')]
+
+
+def task_size(config) -> List[str]:
+    return ['--cpus', str(config.cpu / 1024), '--memory', f'{config.memory_limit_mib}m']
+
+
+def stop() -> None:
+    names = docker('ps', '--all', '--quiet', '--filter', f'name={NETWORK}', capture = True).split()
+    if names:
+        subprocess.run(['docker', 'rm', '--force', *names], stdout = subprocess.DEVNULL)
+    subprocess.run(['docker', 'network', 'rm', NETWORK],
+                   stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
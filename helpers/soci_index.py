@@ -0,0 +1,166 @@
+"""
+SOCI (Seekable OCI) indexes for the image assets marked in fairflow/config.py
+LAZY_LOADING_CONFIG, so Fargate starts their containers while the layers stream in instead
+of after the whole image is pulled.  Needs containerd with nerdctl and the soci CLI
+(see: https://github.com/awslabs/soci-snapshotter), e.g. on a build host or in CI.
+
+After cdk deploy (the assets have to be published to ECR first), from the same cloud
+assembly
+
+    python helpers/soci_index.py index [--cdk-out cdk.out]
+
+Tasks launched before the index exists just pull the whole image, so it's safe to run
+this after the deployment.  To see what it buys you without AWS, compare time to first
+log line with and without the index against a local registry:2 stand-in for ECR (needs
+docker too, and soci-snapshotter-grpc running for containerd)
+
+    python helpers/soci_index.py benchmark ./tasks --dockerfile big_task/Dockerfile
+"""
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from typing import Dict, List, Optional, Tuple
+
+# Keep in sync with fairflow/constructs/lazy_loading.py
+SOCI_INDEX_METADATA = 'fairflow:soci-index'
+MIB = 1024 * 1024
+
+LOCAL_REGISTRY = 'localhost:5000'
+LOCAL_REGISTRY_CONTAINER = 'fairflow-soci-registry'
+
+
+def run(*args: str, **kwargs) -> subprocess.CompletedProcess:
+    return subprocess.run(list(args), check = True, **kwargs)
+
+
+def marked_images(cdk_out: str) -> List[Dict]:
+    """ Image assets marked for indexing in the cloud assembly, with their ECR repository """
+    images = []
+    with open(os.path.join(cdk_out, 'manifest.json')) as f:
+        manifest = json.load(f)
+    for artifact in manifest.get('artifacts', {}).values():
+        metadata = artifact.get('metadata', {})
+        assets = {entry['data']['id']: entry['data'] for entries in metadata.values()
+                  for entry in entries if entry['type'] == 'aws:cdk:asset'}
+        for construct_path, entries in metadata.items():
+            for entry in entries:
+                if entry['type'] != SOCI_INDEX_METADATA:
+                    continue
+                asset = assets[entry['data']['imageTag']]
+                images.append({
+                    'construct': construct_path,
+                    'repository': asset['repositoryName'],
+                    'tag': asset['imageTag'],
+                    'min_layer_size_mib': entry['data']['minLayerSizeMiB']
+                })
+    return images
+
+
+def ecr_login(region: Optional[str]) -> Tuple[str, str]:
+    import boto3
+    auth = boto3.client('ecr', region_name = region).get_authorization_token()['authorizationData'][0]
+    password = base64.b64decode(auth['authorizationToken']).decode().split(':', 1)[1]
+    return auth['proxyEndpoint'].replace('https://', ''), password
+
+
+def create_and_push(ref: str, min_layer_size_mib: int, user: Optional[str] = None,
+                    plain_http: bool = False) -> None:
+    auth = ['--user', user] if user else []
+    http = ['--insecure-registry'] if plain_http else []
+    run('nerdctl', *http, 'pull', '--quiet', *auth, ref)
+    run('soci', 'create', '--min-layer-size', str(min_layer_size_mib * MIB), ref)
+    run('soci', 'push', *(['--plain-http'] if plain_http else []), *auth, ref)
+
+
+def index(cdk_out: str, region: Optional[str]) -> None:
+    images = marked_images(cdk_out)
+    if not images:
+        print(f'No images marked for SOCI indexing in {cdk_out}', file = sys.stderr)
+        return
+    registry, password = ecr_login(region)
+    for image in images:
+        ref = f'{registry}/{image["repository"]}:{image["tag"]}'
+        print(f'Indexing {image["construct"]} ({ref})', file = sys.stderr)
+        create_and_push(ref, image['min_layer_size_mib'], user = f'AWS:{password}')
+
+
+def time_to_first_log(ref: str, command: List[str], snapshotter: str) -> float:
+    # Start from an empty local store every time, so we measure the pull too
+    subprocess.run(['nerdctl', '--snapshotter', snapshotter, 'rmi', '--force', ref],
+                   stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+    start = time.monotonic()
+    with subprocess.Popen(['nerdctl', '--snapshotter', snapshotter, '--insecure-registry',
+                           'run', '--rm', '--quiet', ref, *command],
+                          stdout = subprocess.PIPE, text = True) as container:
+        for line in container.stdout:
+            if line.strip():
+                elapsed = time.monotonic() - start
+                break
+        else:
+            raise RuntimeError(f'{ref} exited without logging anything')
+        container.kill()
+    return elapsed
+
+
+def benchmark(context: str, dockerfile: Optional[str], command: List[str], runs: int,
+              min_layer_size_mib: int) -> None:
+    name = (dockerfile and os.path.dirname(dockerfile)) or os.path.basename(os.path.normpath(context))
+    plain_ref = f'{LOCAL_REGISTRY}/fairflow-soci/{name}:plain'
+    indexed_ref = f'{LOCAL_REGISTRY}/fairflow-soci/{name}:indexed'
+
+    run('docker', 'run', '--detach', '--rm', '--name', LOCAL_REGISTRY_CONTAINER,
+        '-p', '5000:5000', 'registry:2', stdout = subprocess.DEVNULL)
+    try:
+        run('docker', 'build', '--quiet', '-t', plain_ref,
+            *(['-f', os.path.join(context, dockerfile)] if dockerfile else []), context,
+            stdout = subprocess.DEVNULL)
+        run('docker', 'tag', plain_ref, indexed_ref)
+        for ref in (plain_ref, indexed_ref):
+            run('docker', 'push', '--quiet', ref, stdout = subprocess.DEVNULL)
+        create_and_push(indexed_ref, min_layer_size_mib, plain_http = True)
+
+        results = {'overlayfs (no index)': [], 'soci (indexed)': []}
+        # Interleaved, so drift on the host hits both the same
+        for _ in range(runs):
+            results['overlayfs (no index)'].append(time_to_first_log(plain_ref, command, 'overlayfs'))
+            results['soci (indexed)'].append(time_to_first_log(indexed_ref, command, 'soci'))
+    finally:
+        subprocess.run(['docker', 'stop', LOCAL_REGISTRY_CONTAINER], stdout = subprocess.DEVNULL)
+
+    print(f'\nTime to first log line for {context} {dockerfile or ""} ({runs} runs)', file = sys.stderr)
+    for label, seconds in results.items():
+        print(f'  {label:>22}: median {statistics.median(seconds):6.2f}s, '
+              f'min {min(seconds):6.2f}s, max {max(seconds):6.2f}s', file = sys.stderr)
+    # A local registry pulls far faster than ECR over a NAT gateway, so the gap on
+    #   Fargate is bigger than this for the same image
+    print('  (local registry, expect a bigger difference pulling from ECR)\n', file = sys.stderr)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'SOCI indexes for lazy loading the Fairflow images')
+    subparsers = parser.add_subparsers(dest = 'mode', required = True)
+
+    index_parser = subparsers.add_parser('index', help = 'index the marked image assets in ECR')
+    index_parser.add_argument('--cdk-out', default = 'cdk.out')
+    index_parser.add_argument('--region', default = os.getenv('CDK_DEFAULT_REGION'))
+
+    benchmark_parser = subparsers.add_parser('benchmark',
+                                             help = 'indexed vs plain time to first log, locally')
+    benchmark_parser.add_argument('context', help = 'docker build context, e.g. ./tasks')
+    benchmark_parser.add_argument('--dockerfile', help = 'relative to the context, e.g. big_task/Dockerfile')
+    benchmark_parser.add_argument('--runs', type = int, default = 5)
+    benchmark_parser.add_argument('--min-layer-size-mib', type = int, default = 10)
+    benchmark_parser.add_argument('command', nargs = '*',
+                                  default = ['python', '-c', 'print("started", flush = True)'],
+                                  help = 'what to run in the container, first line of output stops the clock')
+    args = parser.parse_args()
+
+    if args.mode == 'index':
+        index(args.cdk_out, args.region)
+    else:
+        benchmark(args.context, args.dockerfile, args.command, args.runs, args.min_layer_size_mib)
@@ -0,0 +1,115 @@
+"""
+cdk synth time and template size as the External Task catalog grows.  Run from the repo
+root, in the CDK virtualenv with the same environment variables as cdk synth (it doesn't
+build or deploy anything)
+
+    python -m helpers.synth_benchmark [--task-counts 0 10 25 50] [--output synth.json]
+
+For each count, the app is synthesized with that many extra External Task definitions,
+alternating between the existing task images the way a catalog of commands would, so
+their assets should be shared rather than hashed and staged again (see
+fairflow/constructs/image_assets.py).  Reported per count: seconds to build the construct
+tree (where the assets are fingerprinted) and to synthesize, the compute stack's
+(FairflowStack) template size and resources, and its image assets.  Compare before /
+after a change with --output, the template has a 1 MB CloudFormation limit
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from typing import List
+
+from aws_cdk import core as cdk
+
+from fairflow.constructs.contruct_properties import ContainerInfo, ExternalTaskProps, FairflowConstructProps
+from fairflow.constructs.dag_tasks import ExternalDagTasks
+from fairflow.constructs.task_construct import ExternalTaskDefinition
+from fairflow.fairflow_stack import FairflowNetworkStack, FairflowDataStack, FairflowStack
+
+CATALOG_DOCKERFILES = ['little_task/Dockerfile', 'big_task/Dockerfile']
+# CloudFormation's template body limit (from S3)
+#   see: https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/cloudformation-limits.html
+TEMPLATE_LIMIT_BYTES = 1024 * 1024
+
+
+def add_catalog(stack: cdk.Stack, tasks: int) -> None:
+    external_dag_tasks = next(construct for construct in stack.node.find_all()
+                              if isinstance(construct, ExternalDagTasks))
+    for index in range(tasks):
+        ExternalTaskDefinition(external_dag_tasks, f'FairflowCatalogTask{index}',
+            ExternalTaskProps(
+                container_info = ContainerInfo(
+                    asset_dir = './tasks',
+                    dockerfile = CATALOG_DOCKERFILES[index % len(CATALOG_DOCKERFILES)],
+                    name = f'CatalogTask{index}Container'
+                ),
+                cpu = 256,
+                memory_limit_mib = 512,
+                task_family_name = f'Catalog{index}-{stack.stack_name}',
+                logging = external_dag_tasks.container_logging,
+                shared_volume = external_dag_tasks.shared_volume,
+                mounting_point = external_dag_tasks.mounting_point
+            )
+        )
+
+
+def synth(tasks: int) -> dict:
+    with tempfile.TemporaryDirectory() as outdir:
+        start = time.monotonic()
+        app = cdk.App(outdir = outdir)
+        # Keep in sync with app.py, the catalog (and its template) is in the compute stack
+        env = cdk.Environment(account = os.getenv('CDK_DEFAULT_ACCOUNT'), region = os.getenv('CDK_DEFAULT_REGION'))
+        network_stack = FairflowNetworkStack(app, 'FairflowNetworkStack', env = env)
+        props = FairflowConstructProps(
+            vpc_props = network_stack.vpc_props,
+            cluster = network_stack.cluster,
+            highly_available = False,
+            enable_autoscaling = False
+        )
+        data_stack = FairflowDataStack(app, 'FairflowDataStack', props, env = env)
+        stack = FairflowStack(app, 'FairflowStack', props, data_stack.data, env = env)
+        add_catalog(stack, tasks)
+        constructed = time.monotonic()
+        assembly = app.synth()
+        synthesized = time.monotonic()
+
+        template_path = os.path.join(outdir, assembly.get_stack_by_name(stack.stack_name).template_file)
+        with open(template_path) as template_file:
+            template = json.load(template_file)
+        with open(os.path.join(outdir, 'manifest.json')) as manifest_file:
+            metadata = json.load(manifest_file)['artifacts'][stack.artifact_id].get('metadata', {})
+        image_assets = {entry['data']['id'] for entries in metadata.values() for entry in entries
+                        if entry['type'] == 'aws:cdk:asset' and entry['data'].get('packaging') == 'container-image'}
+        return {
+            'catalog_tasks': tasks,
+            'construct_seconds': round(constructed - start, 2),
+            'synth_seconds': round(synthesized - constructed, 2),
+            'template_bytes': os.path.getsize(template_path),
+            'resources': len(template['Resources']),
+            'image_assets': len(image_assets)
+        }
+
+
+def benchmark(task_counts: List[int]) -> List[dict]:
+    results = []
+    for tasks in task_counts:
+        result = synth(tasks)
+        results.append(result)
+        print(f'  {tasks:4d} catalog tasks: construct {result["construct_seconds"]:6.2f}s, '
+              f'synth {result["synth_seconds"]:6.2f}s, template {result["template_bytes"] / 1024:7.1f} KiB '
+              f'({result["template_bytes"] / TEMPLATE_LIMIT_BYTES:.0%} of the limit), '
+              f'{result["resources"]} resources, {result["image_assets"]} image assets', file = sys.stderr)
+    return results
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'cdk synth time and template size by External Task count')
+    parser.add_argument('--task-counts', type = int, nargs = '+', default = [0, 10, 25, 50])
+    parser.add_argument('--output', help = 'write the results here as JSON')
+    args = parser.parse_args()
+    results = benchmark(args.task_counts)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent = 2)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The helpers are run from the repo root (python helpers/... or python -m helpers....)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
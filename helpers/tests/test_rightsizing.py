@@ -0,0 +1,78 @@
+"""
+rightsizing on a small Container Insights export
+
+    python -m pytest helpers/tests
+"""
+import csv
+
+import pytest
+
+from helpers.rightsizing import FARGATE_COMBINATIONS, fit, load, percentile, recommend
+
+FIELDS = ['@timestamp', 'ServiceName', 'TaskDefinitionFamily',
+          'CpuUtilized', 'CpuReserved', 'MemoryUtilized', 'MemoryReserved']
+
+
+@pytest.fixture
+def insights_csv(tmp_path):
+    rows = []
+    for i in range(1, 101):
+        # Oversized: uses up to 100 of 1024 cpu units and 1000 of 4096 MiB
+        rows.append(['2021-08-01 00:00:00', 'FairflowStack-Worker', 'WorkerTask',
+                     i, 1024, i * 10, 4096])
+        # Undersized: runs close to its 1024 cpu units
+        rows.append(['2021-08-01 00:00:00', 'FairflowStack-Scheduler', 'SchedulerTask',
+                     900 + i, 1024, 1500, 2048])
+        # Barely used External Task, no service and no reservation reported
+        rows.append(['2021-08-01 00:00:00', '', 'LittleGuys-FairflowStack', 1, '', 10, ''])
+    rows.append(['2021-08-01 00:00:00', '', '', 5000, 1024, 5000, 2048])
+    path = tmp_path / 'insights.csv'
+    with open(path, 'w', newline = '') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_percentile_nearest_rank():
+    values = list(range(100, 0, -1))
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([7.0], 99) == 7.0
+
+
+def test_recommendations(insights_csv):
+    series = load(insights_csv)
+    # Rows without a service or family are dropped
+    assert sorted(series) == ['FairflowStack-Scheduler', 'FairflowStack-Worker', 'LittleGuys-FairflowStack']
+
+    by_name = {r['name']: r for r in recommend(series, cpu_target = 0.7, memory_headroom = 0.2)}
+    worker = by_name['FairflowStack-Worker']
+    assert (worker['samples'], worker['cpu_p95'], worker['cpu_p99']) == (100, 95, 99)
+    assert (worker['memory_p95'], worker['memory_p99']) == (950, 990)
+    assert worker['current'] == (1024, 4096)
+
+    for r in by_name.values():
+        cpu, memory = r['recommended']
+        assert memory in FARGATE_COMBINATIONS[cpu]
+        assert cpu >= r['cpu_p95'] / 0.7 and memory >= r['memory_p99'] * 1.2
+
+    # 95 / 0.7 cpu units and 990 * 1.2 MiB fit the smallest cpu
+    assert worker['recommended'] == (256, 2048)
+    assert worker['monthly_delta_usd'] < 0
+    # 995 / 0.7 cpu units needs the next size up
+    assert by_name['FairflowStack-Scheduler']['recommended'] == (2048, 4096)
+    assert by_name['FairflowStack-Scheduler']['monthly_delta_usd'] > 0
+    # The smallest Fargate size, and nothing to compare it to
+    little = by_name['LittleGuys-FairflowStack']
+    assert little['recommended'] == (256, 512)
+    assert little['current'] is None and little['monthly_delta_usd'] is None
+
+
+def test_fit_limits():
+    assert fit(0, 0) == (256, 512)
+    assert fit(16384, 122880) == (16384, 122880)
+    with pytest.raises(ValueError):
+        fit(16385, 1024)
+    with pytest.raises(ValueError):
+        fit(256, 122881)
@@ -0,0 +1,82 @@
+"""
+The scheduler benchmark report on hand-built metadata DB rows
+
+    python -m pytest helpers/tests
+"""
+from datetime import datetime
+
+from helpers.scheduler_benchmark.report import QUERY_COUNTERS, regressions, summarize
+
+UNPAUSED_AT = datetime(2021, 8, 1)
+
+
+def at(seconds: int) -> str:
+    # As the mysql client prints them
+    return datetime(2021, 8, 1, 0, 0, seconds).isoformat(sep = ' ')
+
+
+def status(questions: int) -> dict:
+    return {counter: questions if counter == 'Questions' else 0 for counter in QUERY_COUNTERS}
+
+
+def test_summarize():
+    manifest = {
+        'bench_0': {'a': [], 'b': ['a'], 'c': ['a', 'b']},
+        'bench_1': {'a': [], 'b': ['a']},
+    }
+    runs = [['bench_0', 'success', at(2)], ['bench_1', 'failed', at(4)]]
+    tis = [
+        # dag_id, task_id, state, queued_dttm, start_date, end_date
+        ['bench_0', 'a', 'success', at(3), at(4), at(5)],
+        ['bench_0', 'b', 'success', at(7), at(8), at(10)],
+        # Ready when the later of its upstream tasks (b) finished
+        ['bench_0', 'c', 'success', at(12), at(13), at(14)],
+        ['bench_1', 'a', 'failed', at(5), at(6), 'NULL'],
+        # Never ready, its upstream task didn't finish
+        ['bench_1', 'b', 'upstream_failed', 'NULL', 'NULL', 'NULL'],
+    ]
+    result = summarize(manifest, UNPAUSED_AT, runs, tis, status(100), status(400),
+                       [['12', 'SELECT dag_run.state FROM dag_run']])
+
+    assert {key: result[key] for key in ('dags', 'tasks', 'tasks_succeeded', 'tasks_failed',
+                                         'dag_runs_finished', 'seconds', 'tasks_per_second')} == \
+        {'dags': 2, 'tasks': 5, 'tasks_succeeded': 3, 'tasks_failed': 2,
+         'dag_runs_finished': 2, 'seconds': 14.0, 'tasks_per_second': 0.214}
+    # ready -> queued of a, b, c and bench_1's a: 1, 2, 2, 1 (c from b's end, not a's)
+    assert result['scheduling_seconds'] == {'p50': 2.0, 'p95': 2.0, 'p99': 2.0, 'max': 2.0}
+    assert result['pickup_seconds'] == {'p50': 1.0, 'p95': 1.0, 'p99': 1.0, 'max': 1.0}
+    # ready -> running: 2, 3, 3, 2
+    assert result['end_to_end_seconds'] == {'p50': 3.0, 'p95': 3.0, 'p99': 3.0, 'max': 3.0}
+    assert result['dag_run_created_seconds'] == {'p50': 4.0, 'p95': 4.0, 'p99': 4.0, 'max': 4.0}
+    assert result['queries']['Questions'] == 300
+    assert result['queries_per_task'] == 100.0
+    assert result['top_statements'] == [{'count': 12, 'statement': 'SELECT dag_run.state FROM dag_run'}]
+
+
+def test_summarize_without_finished_tasks():
+    result = summarize({'bench_0': {'a': []}}, UNPAUSED_AT, [['bench_0', 'running', 'NULL']],
+                       [['bench_0', 'a', 'queued', at(3), 'NULL', 'NULL']], status(100), status(150), [])
+    assert result['tasks_per_second'] is None
+    assert result['queries_per_task'] is None
+    assert result['end_to_end_seconds'] is None
+
+
+def test_regressions_by_direction():
+    baseline = {'tasks_per_second': 10.0, 'end_to_end_seconds': {'p95': 2.0}, 'queries_per_task': 100.0}
+    better = {'tasks_per_second': 12.0, 'end_to_end_seconds': {'p95': 1.0}, 'queries_per_task': 95.0}
+    worse = {'tasks_per_second': 8.0, 'end_to_end_seconds': {'p95': 3.0}, 'queries_per_task': 105.0}
+
+    assert regressions(better, baseline, max_regression_percent = 10) == []
+    assert regressions(worse, baseline, max_regression_percent = 10) == [
+        'tasks_per_second: 10.0 -> 8.0 (-20.0%)',
+        'end_to_end_seconds.p95: 2.0 -> 3.0 (+50.0%)',
+    ]
+
+
+def test_regressions_skip_missing_baselines():
+    worse = {'tasks_per_second': 1.0, 'end_to_end_seconds': {'p95': 30.0}, 'queries_per_task': 500.0}
+    baseline = {'tasks_per_second': None, 'end_to_end_seconds': {'p95': 0}}
+    assert regressions(worse, baseline, max_regression_percent = 10) == []
+    # Nor when this run has no number
+    assert regressions({'end_to_end_seconds': None}, {'tasks_per_second': 10.0, 'queries_per_task': 1.0},
+                       max_regression_percent = 10) == []
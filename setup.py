@@ -27,6 +27,9 @@ setuptools.setup(
         "aws-cdk.aws_ecr_assets==1.115.0",
         "aws-cdk.aws_secretsmanager==1.115.0",
         "aws_cdk.aws_rds==1.115.0",
+        "aws-cdk.aws_events==1.115.0",
+        "aws-cdk.aws_events_targets==1.115.0",
+        "aws-cdk.aws_cloudwatch==1.115.0",
         "cryptography==3.4.7", # for fernet key gen
     ],
 
@@ -1,5 +1,7 @@
 from argparse import ArgumentParser
 
+from fairflow_io import RunScope
+
 parser = ArgumentParser(description='Airflow Fargate Example')
 parser.add_argument('number', help='number', type=int)
 
@@ -7,10 +9,12 @@ if __name__ == '__main__':
     args = parser.parse_args()
     number = args.number
 
+    # Outputs go to /shared-volume/runs/{dag_id}/{run_id}/{task_id}/even.txt
+    scope = RunScope()
+
     print("Printing Even numbers in given range")
-    f = open("/shared-volume/even.txt", "a")
-    for i in range(int(number)):
-        if(i % 2 == 0):
-            f.write(str(i))
-            print(i)
-    f.close()
\ No newline at end of file
+    with scope.open_output("even.txt") as f:
+        for i in range(int(number)):
+            if(i % 2 == 0):
+                f.write(str(i))
+                print(i)
@@ -0,0 +1,60 @@
+from argparse import ArgumentParser
+import os
+import shutil
+import time
+
+from fairflow_io import MANIFEST_NAME, RUNS_DIR, SHARED_VOLUME
+
+parser = ArgumentParser(description='Remove expired External Task run outputs from the shared volume')
+parser.add_argument('--retention-days', help='keep runs newer than this many days',
+                    type=float, default=float(os.getenv('RETENTION_DAYS', '7')))
+parser.add_argument('--dry-run', help='only print what would be removed', action='store_true')
+
+
+def last_activity(run_dir: str) -> float:
+    # A run is as old as the last file any of its tasks committed (the manifests are
+    #   rewritten on every commit), falling back to the directory itself
+    latest = os.path.getmtime(run_dir)
+    for task_id in os.listdir(run_dir):
+        manifest = os.path.join(run_dir, task_id, MANIFEST_NAME)
+        if os.path.exists(manifest):
+            latest = max(latest, os.path.getmtime(manifest))
+    return latest
+
+
+def clean(runs_root: str, cutoff: float, dry_run: bool = False) -> tuple:
+    """ Remove the run directories with no activity since cutoff, returns (removed, kept) """
+    removed = kept = 0
+    for dag_id in os.listdir(runs_root):
+        dag_dir = os.path.join(runs_root, dag_id)
+        # Only the run directories, whatever else was put there
+        if not os.path.isdir(dag_dir):
+            continue
+        for run_id in os.listdir(dag_dir):
+            run_dir = os.path.join(dag_dir, run_id)
+            if not os.path.isdir(run_dir):
+                continue
+            if last_activity(run_dir) >= cutoff:
+                kept += 1
+                continue
+            print(f"{'Would remove' if dry_run else 'Removing'} {run_dir}")
+            if not dry_run:
+                shutil.rmtree(run_dir, ignore_errors=True)
+            removed += 1
+
+        if not dry_run and not os.listdir(dag_dir):
+            os.rmdir(dag_dir)
+    return removed, kept
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    runs_root = os.path.join(SHARED_VOLUME, RUNS_DIR)
+    cutoff = time.time() - args.retention_days * 24 * 60 * 60
+
+    if not os.path.isdir(runs_root):
+        print(f"Nothing to clean up, {runs_root} does not exist")
+        raise SystemExit(0)
+
+    removed, kept = clean(runs_root, cutoff, args.dry_run)
+    print(f"Removed {removed} run(s), kept {kept} run(s) newer than {args.retention_days} day(s)")
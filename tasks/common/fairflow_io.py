@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+# Root of the fairflow-external EFS access point inside the External Task containers
+#   (see EfsConstruct.external_task_mounting_point)
+SHARED_VOLUME = os.path.abspath(os.getenv('FAIRFLOW_SHARED_VOLUME', '/shared-volume'))
+# Every run writes under {SHARED_VOLUME}/runs/{dag_id}/{run_id}/{task_id}, so concurrent
+#   or retried DAG runs never touch each other's files
+RUNS_DIR = 'runs'
+MANIFEST_NAME = '_MANIFEST.json'
+TEMP_PREFIX = '.tmp-'
+
+
+def _safe(part: str) -> str:
+    # run_ids look like scheduled__2021-08-01T00:00:00+00:00, keep them readable
+    #   but make sure nothing can escape the run directory
+    safe = re.sub(r'[^A-Za-z0-9_.:+=-]', '_', part)
+    if safe in ('', '.', '..'):
+        raise ValueError(f'{part!r} is not a valid dag_id / run_id / task_id')
+    return safe
+
+
+def _from_context(variable: str) -> str:
+    # No shared fallback, every run would write to (and clean up) the same directory
+    if not os.getenv(variable):
+        raise ValueError(f'{variable} is not set, launch the task with FairflowECSOperator '
+                         '(or pass it in the ECS Operator overrides) or give RunScope the ids')
+    return os.environ[variable]
+
+
+def _default_run_id() -> str:
+    # Every task of a run has to agree on it, so it can't be e.g. the time a task started.
+    #   Without the run_id, the execution date ({{ ts }}) identifies the run too
+    if os.getenv('AIRFLOW_CTX_EXECUTION_DATE') and not os.getenv('AIRFLOW_CTX_DAG_RUN_ID'):
+        return f"manual__{os.environ['AIRFLOW_CTX_EXECUTION_DATE']}"
+    return _from_context('AIRFLOW_CTX_DAG_RUN_ID')
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RunScope:
+    """
+    Run-scoped output directory for an External Task on the shared volume.
+
+    The dag_id / run_id / task_id default to the AIRFLOW_CTX_* variables, which
+    FairflowECSOperator passes into the container (see README -> External Tasks),
+    and it raises a ValueError without them.  Outputs are written to a temp file and renamed into place, so
+    readers only ever see complete files, and every committed file is recorded in a
+    manifest alongside its size and checksum.
+    """
+
+    def __init__(self, dag_id: str = None, run_id: str = None, task_id: str = None,
+                       root: str = SHARED_VOLUME):
+        self.dag_id = _safe(dag_id or _from_context('AIRFLOW_CTX_DAG_ID'))
+        self.run_id = _safe(run_id or _default_run_id())
+        self.task_id = _safe(task_id or _from_context('AIRFLOW_CTX_TASK_ID'))
+        self.root = os.path.abspath(root)
+        self.run_dir = os.path.join(self.root, RUNS_DIR, self.dag_id, self.run_id)
+        self.task_dir = os.path.join(self.run_dir, self.task_id)
+        self._files = {}
+
+        os.makedirs(self.task_dir, exist_ok=True)
+        # A previous (failed) attempt of this task may have left partial temp files
+        for name in os.listdir(self.task_dir):
+            if name.startswith(TEMP_PREFIX):
+                os.remove(os.path.join(self.task_dir, name))
+
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.task_dir, name)
+
+
+    def input_path(self, task_id: str, name: str) -> str:
+        """ Committed output of another task in the same DAG run """
+        path = os.path.join(self.run_dir, _safe(task_id), name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'{name} has not been committed by {task_id} in {self.run_dir}')
+        return path
+
+
+    @contextmanager
+    def open_output(self, name: str, mode: str = 'w'):
+        """
+        Write an output file atomically.  The file only appears under its final
+        name once the block exits without an error
+        """
+        fd, tmp_path = tempfile.mkstemp(prefix=f'{TEMP_PREFIX}{name}-', dir=self.task_dir)
+        try:
+            with os.fdopen(fd, mode) as f:
+                yield f
+                f.flush()
+                os.fsync(f.fileno())
+            self.commit(tmp_path, name)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+    def commit(self, src_path: str, name: str) -> str:
+        """
+        Move a finished local file into the task directory.  Files from another file
+        system (e.g. local scratch) are copied next to the target first, so the final
+        rename is always atomic on EFS
+        """
+        final_path = self.path(name)
+        staged = None
+        try:
+            if os.path.dirname(os.path.abspath(src_path)) != self.task_dir:
+                staged = os.path.join(self.task_dir, f'{TEMP_PREFIX}{name}-{uuid.uuid4().hex}')
+                shutil.copyfile(src_path, staged)
+                src_path = staged
+            os.replace(src_path, final_path)
+        finally:
+            # Renamed into place unless the copy or the rename failed
+            if staged and os.path.exists(staged):
+                os.remove(staged)
+        self._files[name] = {
+            'size_bytes': os.path.getsize(final_path),
+            'sha256': _sha256(final_path),
+            'committed_at': time.time(),
+        }
+        self.write_manifest()
+        return final_path
+
+
+    def write_manifest(self) -> str:
+        manifest = {
+            'dag_id': self.dag_id,
+            'run_id': self.run_id,
+            'task_id': self.task_id,
+            'files': self._files,
+        }
+        fd, tmp_path = tempfile.mkstemp(prefix=f'{TEMP_PREFIX}manifest-', dir=self.task_dir)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        manifest_path = self.path(MANIFEST_NAME)
+        os.replace(tmp_path, manifest_path)
+        return manifest_path
+
+
+def read_manifest(task_dir: str) -> dict:
+    with open(os.path.join(task_dir, MANIFEST_NAME)) as f:
+        return json.load(f)
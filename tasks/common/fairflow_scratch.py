@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List
+from urllib.parse import urlparse
+
+from fairflow_io import RunScope
+
+# Set by ExternalTaskDefinition when the task has a scratch_path, which is a bind mount
+#   backed by the task's (local, NVMe) ephemeral storage rather than EFS
+SCRATCH_DIR = os.getenv('FAIRFLOW_SCRATCH_DIR', tempfile.gettempdir())
+
+
+def _s3_client():
+    # boto3 isn't in the slim task images by default, only tasks that stage from S3 need it
+    try:
+        import boto3
+    except ImportError as e:
+        raise ImportError('boto3 is required to stage s3:// inputs, add it to the task image') from e
+    return boto3.client('s3')
+
+
+def _expand(sources: Iterable[str], s3) -> List[str]:
+    # s3://bucket/prefix/ and EFS directories expand to every object / file underneath
+    expanded = []
+    for source in sources:
+        if source.startswith('s3://') and source.endswith('/'):
+            url = urlparse(source)
+            paginator = s3.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=url.netloc, Prefix=url.path.lstrip('/')):
+                expanded.extend(f's3://{url.netloc}/{obj["Key"]}' for obj in page.get('Contents', [])
+                                if not obj['Key'].endswith('/'))
+        elif os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                expanded.extend(os.path.join(root, name) for name in files)
+        else:
+            expanded.append(source)
+    return expanded
+
+
+def _copy_one(source: str, dest_dir: str, s3) -> str:
+    if source.startswith('s3://'):
+        url = urlparse(source)
+        local_path = os.path.join(dest_dir, url.netloc, url.path.lstrip('/'))
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        s3.download_file(url.netloc, url.path.lstrip('/'), local_path)
+    else:
+        local_path = os.path.join(dest_dir, source.lstrip('/'))
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        shutil.copyfile(source, local_path)
+    return local_path
+
+
+def stage_in(sources: Iterable[str], dest_dir: str = None, max_workers: int = 16) -> List[str]:
+    """
+    Copy inputs (EFS paths / directories or s3:// objects / prefixes) to local scratch in
+    parallel, so the task does its temp-heavy work on local disk instead of over NFS.
+    Returns the local paths in the same order as the expanded sources
+    """
+    dest_dir = dest_dir or os.path.join(SCRATCH_DIR, 'inputs')
+    os.makedirs(dest_dir, exist_ok=True)
+    sources = list(sources)
+    # One client shared by the threads (a client is thread safe, creating them from the
+    #   default session isn't), only when there's something to get from S3
+    s3 = _s3_client() if any(source.startswith('s3://') for source in sources) else None
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda source: _copy_one(source, dest_dir, s3), _expand(sources, s3)))
+
+
+def publish(scope: RunScope, local_path: str, name: str = None) -> str:
+    """ Commit a final output from scratch into the task's run directory on the shared volume """
+    return scope.commit(local_path, name or os.path.basename(local_path))
+
+
+def publish_s3(local_path: str, s3_uri: str) -> str:
+    url = urlparse(s3_uri)
+    _s3_client().upload_file(local_path, url.netloc, url.path.lstrip('/'))
+    return s3_uri
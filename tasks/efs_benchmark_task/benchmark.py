@@ -0,0 +1,139 @@
+from argparse import ArgumentParser
+import json
+import os
+import random
+import shutil
+import time
+import uuid
+
+from fairflow_io import RunScope, SHARED_VOLUME
+
+parser = ArgumentParser(description='Benchmark the shared EFS mount')
+parser.add_argument('--path', help='directory on the mount to benchmark in',
+                    default=os.path.join(SHARED_VOLUME, 'benchmarks'))
+parser.add_argument('--file-size-mib', help='size of the sequential test file', type=int, default=512)
+parser.add_argument('--block-size-kib', help='block size for sequential io', type=int, default=1024)
+parser.add_argument('--random-ops', help='number of random 4 KiB reads / writes', type=int, default=2000)
+parser.add_argument('--metadata-files', help='number of small files for metadata ops', type=int, default=1000)
+
+RANDOM_BLOCK = 4096
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def drop_cache(path: str) -> None:
+    # Ask the NFS client to forget what it cached so reads actually go to EFS
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def sequential_write(path: str, size: int, block: bytes) -> None:
+    with open(path, 'wb', buffering=0) as f:
+        for _ in range(size // len(block)):
+            f.write(block)
+        os.fsync(f.fileno())
+
+
+def sequential_read(path: str, block_size: int) -> None:
+    with open(path, 'rb', buffering=0) as f:
+        while f.read(block_size):
+            pass
+
+
+def random_write(path: str, size: int, ops: int) -> None:
+    block = os.urandom(RANDOM_BLOCK)
+    with open(path, 'r+b', buffering=0) as f:
+        for _ in range(ops):
+            f.seek(random.randrange(0, size - RANDOM_BLOCK, RANDOM_BLOCK))
+            f.write(block)
+        os.fsync(f.fileno())
+
+
+def random_read(path: str, size: int, ops: int) -> None:
+    with open(path, 'rb', buffering=0) as f:
+        for _ in range(ops):
+            f.seek(random.randrange(0, size - RANDOM_BLOCK, RANDOM_BLOCK))
+            f.read(RANDOM_BLOCK)
+
+
+def create_files(directory: str, count: int) -> None:
+    for i in range(count):
+        with open(os.path.join(directory, f'f{i}'), 'w') as f:
+            f.write('x')
+
+
+def stat_files(directory: str, count: int) -> None:
+    for i in range(count):
+        os.stat(os.path.join(directory, f'f{i}'))
+
+
+def list_files(directory: str, _count: int) -> None:
+    os.listdir(directory)
+
+
+def delete_files(directory: str, count: int) -> None:
+    for i in range(count):
+        os.remove(os.path.join(directory, f'f{i}'))
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    work_dir = os.path.join(args.path, uuid.uuid4().hex)
+    os.makedirs(work_dir)
+
+    size = args.file_size_mib * 1024 * 1024
+    block = os.urandom(args.block_size_kib * 1024)
+    data_file = os.path.join(work_dir, 'data.bin')
+    metadata_dir = os.path.join(work_dir, 'metadata')
+    os.makedirs(metadata_dir)
+    mib = size / (1024 * 1024)
+    results = {}
+
+    try:
+        print(f"Benchmarking {work_dir}")
+        elapsed = timed(sequential_write, data_file, size, block)
+        results['sequential_write_mib_per_second'] = mib / elapsed
+
+        drop_cache(data_file)
+        elapsed = timed(sequential_read, data_file, len(block))
+        results['sequential_read_mib_per_second'] = mib / elapsed
+
+        elapsed = timed(random_write, data_file, size, args.random_ops)
+        results['random_write_iops'] = args.random_ops / elapsed
+
+        drop_cache(data_file)
+        elapsed = timed(random_read, data_file, size, args.random_ops)
+        results['random_read_iops'] = args.random_ops / elapsed
+
+        for name, op in [('create', create_files), ('stat', stat_files),
+                         ('list', list_files), ('delete', delete_files)]:
+            elapsed = timed(op, metadata_dir, args.metadata_files)
+            if name == 'list':
+                results['list_ms'] = elapsed * 1000
+            else:
+                results[f'{name}_ops_per_second'] = args.metadata_files / elapsed
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'path': args.path,
+        'file_size_mib': args.file_size_mib,
+        'block_size_kib': args.block_size_kib,
+        'random_ops': args.random_ops,
+        'metadata_files': args.metadata_files,
+        'results': {k: round(v, 2) for k, v in results.items()},
+    }
+    for k, v in report['results'].items():
+        print(f"{k}: {v}")
+
+    scope = RunScope()
+    with scope.open_output('efs_benchmark.json') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {scope.path('efs_benchmark.json')}")
@@ -1,47 +1,38 @@
 from argparse import ArgumentParser
-import os
+
+from fairflow_io import RunScope
 
 parser = ArgumentParser(description='Airflow Fargate Example')
 parser.add_argument('number', help='number', type=int)
-
-def delete_file(file_path):
-    try:
-        os.remove(file_path)
-        print("Successfully deleted file: " + file_path)
-    except OSError:
-        print("File not found: " + file_path)
-        pass
+parser.add_argument('--even-task-id', help='task that committed even.txt in this run',
+                    default='even_numbers')
+parser.add_argument('--odd-task-id', help='task that committed odd.txt in this run',
+                    default='odd_numbers')
 
 
 if __name__ == '__main__':
     args = parser.parse_args()
     number = args.number
     print("Printing all numbers in given range")
-    f_numbers = open("/shared-volume/numbers.txt", "a")
 
-    # Copy from even.txt to numbers.txt
-    f_even = open("/shared-volume/even.txt", "r")
-    for line in f_even:
-        f_numbers.write(line)
-    f_even.close()
+    # Inputs are read from the upstream tasks of the same DAG run, so a concurrent
+    #   or retried run can never mix its numbers into ours.  Old runs are removed
+    #   by the scheduled cleanup task instead of deleting files here
+    scope = RunScope()
 
-    # Copy from odd.txt to numbers.txt
-    f_odd = open("/shared-volume/odd.txt", "r")
-    for line in f_odd:
-        f_numbers.write(line)
-    f_odd.close()
+    with scope.open_output("numbers.txt") as f_numbers:
+        # Copy from even.txt to numbers.txt
+        with open(scope.input_path(args.even_task_id, "even.txt"), "r") as f_even:
+            for line in f_even:
+                f_numbers.write(line)
 
-    f_numbers.close()
+        # Copy from odd.txt to numbers.txt
+        with open(scope.input_path(args.odd_task_id, "odd.txt"), "r") as f_odd:
+            for line in f_odd:
+                f_numbers.write(line)
 
     # Print contents of numbers.txt
-    f_numbers = open("/shared-volume/numbers.txt", "r")
-    for line in f_numbers:
-        print(line)
-        print("\n")
-    f_numbers.close()
-
-    # Deleting all files, to avoid EFS cost
-    delete_file("/shared-volume/even.txt")
-    delete_file("/shared-volume/odd.txt")
-    delete_file("/shared-volume/numbers.txt")
-    delete_file("/shared-volume/numbers.txt") # Will result in File not found message
+    with open(scope.path("numbers.txt"), "r") as f_numbers:
+        for line in f_numbers:
+            print(line)
+            print("\n")
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The images put ./tasks/common on the PYTHONPATH and run from the task's own folder
+TASKS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(TASKS, 'common'))
+sys.path.insert(0, os.path.join(TASKS, 'cleanup_task'))
@@ -0,0 +1,57 @@
+"""
+The cleanup task's retention cutoff on a temporary runs directory
+
+    cd tasks && python -m pytest tests
+"""
+import os
+import time
+
+import pytest
+
+from cleanup import clean
+from fairflow_io import RunScope
+
+DAY = 24 * 60 * 60
+NOW = time.time()
+
+
+def make_run(root: str, dag_id: str, run_id: str, days_old: float, manifest_days_old: float = None) -> str:
+    scope = RunScope(dag_id, run_id, 'task', root=root)
+    with scope.open_output('out.txt') as f:
+        f.write('1\n')
+    for path in (scope.path('out.txt'), scope.task_dir, scope.run_dir):
+        os.utime(path, (NOW - days_old * DAY,) * 2)
+    manifest_days_old = days_old if manifest_days_old is None else manifest_days_old
+    os.utime(scope.path('_MANIFEST.json'), (NOW - manifest_days_old * DAY,) * 2)
+    return scope.run_dir
+
+
+@pytest.fixture
+def runs(tmp_path):
+    root = str(tmp_path)
+    return {
+        'old': make_run(root, 'a', 'old', days_old=10),
+        'recent': make_run(root, 'a', 'recent', days_old=1),
+        # Started long ago, but a task committed since
+        'long_running': make_run(root, 'b', 'long_running', days_old=10, manifest_days_old=2),
+        'only_old': make_run(root, 'c', 'only_old', days_old=30),
+    }
+
+
+def test_removes_runs_past_the_retention(tmp_path, runs):
+    runs_root = os.path.join(str(tmp_path), 'runs')
+    # Something that isn't a run directory is left alone
+    open(os.path.join(runs_root, 'README'), 'w').close()
+
+    assert clean(runs_root, NOW - 7 * DAY) == (2, 2)
+    assert not os.path.exists(runs['old'])
+    assert os.path.exists(runs['recent'])
+    assert os.path.exists(runs['long_running'])
+    # A DAG with no runs left goes too
+    assert sorted(os.listdir(runs_root)) == ['README', 'a', 'b']
+
+
+def test_dry_run_removes_nothing(tmp_path, runs):
+    runs_root = os.path.join(str(tmp_path), 'runs')
+    assert clean(runs_root, NOW - 7 * DAY, dry_run=True) == (2, 2)
+    assert all(os.path.exists(run_dir) for run_dir in runs.values())
@@ -0,0 +1,100 @@
+"""
+fairflow_io's run-scoped outputs on a temporary directory standing in for the shared volume
+
+    cd tasks && python -m pytest tests
+"""
+import hashlib
+import os
+
+import pytest
+
+from fairflow_io import MANIFEST_NAME, RUNS_DIR, TEMP_PREFIX, RunScope, read_manifest
+
+
+@pytest.fixture
+def scope(tmp_path):
+    return RunScope('dag', 'scheduled__2021-08-01T00:00:00+00:00', 'even_numbers', root=str(tmp_path))
+
+
+def test_ids_from_the_task_context(tmp_path, monkeypatch):
+    monkeypatch.setenv('AIRFLOW_CTX_DAG_ID', 'dag')
+    monkeypatch.setenv('AIRFLOW_CTX_DAG_RUN_ID', 'manual__2021-08-01T00:00:00+00:00')
+    monkeypatch.setenv('AIRFLOW_CTX_TASK_ID', 'task')
+    scope = RunScope(root=str(tmp_path))
+    assert scope.task_dir == os.path.join(str(tmp_path), RUNS_DIR, 'dag', 'manual__2021-08-01T00:00:00+00:00', 'task')
+
+
+def test_no_shared_run_without_the_task_context(tmp_path, monkeypatch):
+    for name in ('AIRFLOW_CTX_DAG_ID', 'AIRFLOW_CTX_DAG_RUN_ID', 'AIRFLOW_CTX_EXECUTION_DATE', 'AIRFLOW_CTX_TASK_ID'):
+        monkeypatch.delenv(name, raising=False)
+    with pytest.raises(ValueError, match='AIRFLOW_CTX_DAG_ID'):
+        RunScope(root=str(tmp_path))
+    with pytest.raises(ValueError, match='AIRFLOW_CTX_DAG_RUN_ID'):
+        RunScope(dag_id='dag', task_id='task', root=str(tmp_path))
+    with pytest.raises(ValueError):
+        RunScope('..', 'run', 'task', root=str(tmp_path))
+
+
+def test_open_output_only_appears_when_complete(scope):
+    with scope.open_output('even.txt') as f:
+        f.write('2\n4\n')
+        # Readers only see the temp file until the block exits
+        assert not os.path.exists(scope.path('even.txt'))
+        assert [name for name in os.listdir(scope.task_dir) if name.startswith(TEMP_PREFIX)]
+    with open(scope.path('even.txt')) as f:
+        assert f.read() == '2\n4\n'
+
+    with pytest.raises(RuntimeError):
+        with scope.open_output('odd.txt') as f:
+            f.write('1\n')
+            raise RuntimeError('task failed halfway')
+    assert sorted(os.listdir(scope.task_dir)) == [MANIFEST_NAME, 'even.txt']
+
+
+def test_commit_from_another_directory(scope, tmp_path):
+    scratch = tmp_path / 'scratch'
+    scratch.mkdir()
+    (scratch / 'big.bin').write_bytes(b'\x00' * 1024)
+
+    path = scope.commit(str(scratch / 'big.bin'), 'big.bin')
+    assert path == scope.path('big.bin')
+    assert open(path, 'rb').read() == b'\x00' * 1024
+    # The staged copy was renamed into place, the source is left alone
+    assert sorted(os.listdir(scope.task_dir)) == [MANIFEST_NAME, 'big.bin']
+    assert (scratch / 'big.bin').exists()
+
+
+def test_retry_removes_partial_temp_files(scope):
+    with scope.open_output('even.txt') as f:
+        f.write('2\n')
+    # What a killed attempt leaves behind
+    partial = scope.path(f'{TEMP_PREFIX}odd.txt-abc123')
+    open(partial, 'w').write('1\n3')
+
+    retry = RunScope(scope.dag_id, scope.run_id, scope.task_id, root=scope.root)
+    assert not os.path.exists(partial)
+    assert sorted(os.listdir(retry.task_dir)) == [MANIFEST_NAME, 'even.txt']
+
+
+def test_manifest_lists_the_committed_files(scope):
+    with scope.open_output('even.txt') as f:
+        f.write('2\n4\n')
+    with scope.open_output('even.bin', 'wb') as f:
+        f.write(b'\x02\x04')
+
+    manifest = read_manifest(scope.task_dir)
+    assert {key: manifest[key] for key in ('dag_id', 'run_id', 'task_id')} == \
+        {'dag_id': 'dag', 'run_id': 'scheduled__2021-08-01T00:00:00+00:00', 'task_id': 'even_numbers'}
+    assert sorted(manifest['files']) == ['even.bin', 'even.txt']
+    assert manifest['files']['even.txt']['size_bytes'] == 4
+    assert manifest['files']['even.txt']['sha256'] == hashlib.sha256(b'2\n4\n').hexdigest()
+    assert manifest['files']['even.bin']['sha256'] == hashlib.sha256(b'\x02\x04').hexdigest()
+
+
+def test_input_path_of_another_task(scope):
+    with scope.open_output('even.txt') as f:
+        f.write('2\n')
+    downstream = RunScope(scope.dag_id, scope.run_id, 'sum', root=scope.root)
+    assert downstream.input_path('even_numbers', 'even.txt') == scope.path('even.txt')
+    with pytest.raises(FileNotFoundError):
+        downstream.input_path('odd_numbers', 'odd.txt')